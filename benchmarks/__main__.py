@@ -0,0 +1,81 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Runs the benchmarks, optionally writing the results as json and comparing them with an earlier run::
+
+  python -m benchmarks --output before.json
+  python -m benchmarks --output after.json --compare before.json --max-slowdown 1.5
+"""
+import argparse
+import json
+import pkgutil
+import sys
+
+import benchmarks
+import benchmarks.harness as harness
+
+
+def _import_benchmarks():
+  for _, module_name, _ in pkgutil.iter_modules(benchmarks.__path__):
+    if module_name.startswith("bench_"):
+      __import__("benchmarks." + module_name)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Runs zopkio's microbenchmarks")
+  parser.add_argument("filter", nargs="*", help="only run the benchmarks whose name contains one of these")
+  parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+  parser.add_argument("--quick", action="store_true", help="use small inputs, useful to check the benchmarks work")
+  parser.add_argument("--repeat", type=int, default=5, help="number of timed runs of each benchmark")
+  parser.add_argument("--seed", type=int, default=harness.DEFAULT_SEED, help="seed of the synthetic data")
+  parser.add_argument("--output", help="file to write the json results to")
+  parser.add_argument("--compare", help="json results of an earlier run to compare with")
+  parser.add_argument("--max-slowdown", type=float,
+                      help="with --compare, exit with an error if a median is this many times slower")
+  args = parser.parse_args(argv)
+
+  _import_benchmarks()
+  if args.list:
+    for bench in harness.get_benchmarks(args.filter):
+      print "{0:<24} {1}".format(bench.name, bench.description)
+    return 0
+
+  def report(result):
+    print "{0:<24} size={1:<8} median={2:.6f}s min={3:.6f}s stddev={4:.6f}s".format(
+        result["name"], result["size"], result["median"], result["min"], result["stddev"] or 0.0)
+    sys.stdout.flush()
+
+  results = harness.run_all(args.filter, args.quick, args.repeat, args.seed, report)
+  if args.output:
+    with open(args.output, "w") as output_file:
+      json.dump(results, output_file, indent=2)
+
+  status = 0
+  if args.compare:
+    print
+    for name, old, new, ratio in harness.compare(harness.load_results(args.compare), results):
+      slower = args.max_slowdown is not None and ratio > args.max_slowdown
+      print "{0:<24} {1:.6f}s -> {2:.6f}s x{3:.2f}{4}".format(name, old, new, ratio, " SLOWER" if slower else "")
+      if slower:
+        status = 1
+  return status
+
+if __name__ == '__main__':
+  sys.exit(main())
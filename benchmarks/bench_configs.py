@@ -0,0 +1,36 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import benchmarks.datagen as datagen
+from benchmarks.harness import benchmark
+from zopkio import test_runner_helper
+
+
+@benchmark("load_configs", size=200, quick_size=3)
+def load_configs(size, rng, workdir):
+  """test_runner_helper.load_configs_from_directory on size config directories of 20 files with 50 keys each"""
+  config_dir = os.path.join(workdir, "configs")
+  os.mkdir(config_dir)
+  datagen.write_config_tree(config_dir, size, 20, 50, rng)
+
+  def run():
+    test_runner_helper.load_configs_from_directory(config_dir, {"override": True})
+  return run
@@ -0,0 +1,32 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import benchmarks.datagen as datagen
+from benchmarks.harness import benchmark
+from zopkio import test_runner_helper
+
+
+@benchmark("determine_tests", size=50, quick_size=2)
+def determine_tests(size, rng, workdir):
+  """test_runner_helper._determine_tests on size modules of 500 functions"""
+  modules = [datagen.make_test_module("module{0}".format(index), 500, rng) for index in xrange(size)]
+
+  def run():
+    list(test_runner_helper._determine_tests(modules))
+  return run
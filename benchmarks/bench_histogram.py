@@ -0,0 +1,34 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from benchmarks.harness import benchmark
+from zopkio.histogram import Histogram
+
+
+@benchmark("histogram_record", size=1000000, quick_size=1000)
+def histogram_record(size, rng, workdir):
+  """records size exponentially distributed latencies in a Histogram and reads the percentiles"""
+  values = [rng.expovariate(100.0) for _ in xrange(size)]
+
+  def run():
+    histogram = Histogram()
+    for value in values:
+      histogram.record(value)
+    histogram.percentiles()
+  return run
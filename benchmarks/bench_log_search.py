@@ -0,0 +1,41 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import os
+
+import benchmarks.datagen as datagen
+from benchmarks.harness import benchmark
+from zopkio import test_utils
+
+
+@benchmark("log_search", size=200000, quick_size=2000)
+def log_search(size, rng, workdir):
+  """test_utils._search_log_for_datetime on a log of size lines, 20 lookups in each direction"""
+  log_path = os.path.join(workdir, "server.log")
+  end = datagen.write_log(log_path, size, rng)
+  span = (end - datagen.LOG_START).total_seconds()
+  targets = [datagen.LOG_START + datetime.timedelta(seconds=rng.uniform(0, span)) for _ in xrange(20)]
+  word_count = len(datagen.LOG_DATETIME_FORMAT.split())
+
+  def run():
+    for target in targets:
+      test_utils._search_log_for_datetime(log_path, target, word_count)
+      test_utils._search_log_for_datetime(log_path, target, word_count, reverse=True)
+  return run
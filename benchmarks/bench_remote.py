@@ -0,0 +1,51 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+
+from benchmarks.harness import benchmark
+from test.fakessh import FakeCluster, NetworkProfile
+from zopkio.adhoc_deployer import SSHDeployer
+import zopkio.runtime as runtime
+
+# round trip time of the simulated network between the driver and the hosts
+_LATENCY = 0.002
+
+
+@benchmark("ssh_fanout", size=10, quick_size=2)
+def ssh_fanout(size, rng, workdir):
+  """SSHDeployer.install and fetch_logs on size fake hosts with a 2ms round trip"""
+  executable = os.path.join(workdir, "service.sh")
+  with open(executable, "w") as f:
+    f.write("".join("echo {0}\n".format(rng.random()) for _ in xrange(1000)))
+  logs_dir = os.path.join(workdir, "logs")
+  os.mkdir(logs_dir)
+  cluster = FakeCluster(size, profile=NetworkProfile(latency=_LATENCY)).start()
+  deployer = SSHDeployer("service", {
+      "executable": executable,
+      "install_path": "/tmp/zopkio_bench_service",
+      "post_install_cmds": ["sh service.sh > service.log"]})
+
+  def run():
+    with cluster.installed():
+      for name in cluster.names():
+        deployer.install(name, {"hostname": runtime.get_machine(name)})
+      for name in cluster.names():
+        deployer.fetch_logs(name, ["/tmp/zopkio_bench_service/service.log"], logs_dir)
+  return run, cluster.stop
@@ -0,0 +1,65 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import benchmarks.datagen as datagen
+from benchmarks.harness import benchmark
+import zopkio.constants as constants
+from zopkio.configobj import Config
+from zopkio.html_reporter import Reporter
+import zopkio.json_reporter as json_reporter
+import zopkio.runtime as runtime
+
+_CONFIGS = 5
+
+
+def _collect_results(size, rng):
+  runtime.reset_collector()
+  collector = runtime.get_collector()
+  per_config = max(size // _CONFIGS, 1)
+  for index in xrange(_CONFIGS):
+    config = Config("config_{0}".format(index), {"key": index})
+    config.result = constants.PASSED
+    config.start_time = 1420070400 + index
+    config.end_time = config.start_time + 60
+    collector.collect(config, datagen.make_tests(per_config, rng, iterations=5))
+  collector.end_time = collector.start_time + 600
+
+
+@benchmark("html_report", size=1000, quick_size=10)
+def html_report(size, rng, workdir):
+  """html_reporter.Reporter.generate for size tests over 5 configs"""
+  _collect_results(size, rng)
+  output_dir = os.path.join(workdir, "report")
+
+  def run():
+    Reporter("benchmark", output_dir, workdir, workdir).generate()
+  return run
+
+
+@benchmark("json_report", size=1000, quick_size=10)
+def json_report(size, rng, workdir):
+  """json_reporter.Reporter.generate for size tests over 5 configs"""
+  _collect_results(size, rng)
+  output_dir = os.path.join(workdir, "report")
+
+  def run():
+    json_reporter.Reporter("benchmark", output_dir, workdir, workdir).generate()
+  return run
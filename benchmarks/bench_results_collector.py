@@ -0,0 +1,56 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import benchmarks.datagen as datagen
+from benchmarks.harness import benchmark
+import zopkio.constants as constants
+from zopkio.configobj import Config
+from zopkio.results_collector import ResultsCollector
+
+_CONFIGS = 10
+
+
+@benchmark("results_collector", size=10000, quick_size=100)
+def results_collector(size, rng, workdir):
+  """collects size tests over 10 configs and runs the aggregations used by the reports"""
+  tests = datagen.make_tests(size, rng)
+  per_config = max(size // _CONFIGS, 1)
+  configs = []
+  for index in xrange(_CONFIGS):
+    config = Config("config_{0}".format(index), {})
+    config.result = constants.PASSED
+    config.start_time = 1420070400 + index
+    config.end_time = config.start_time + 60
+    configs.append((config, tests[index * per_config:(index + 1) * per_config]))
+
+  def run():
+    collector = ResultsCollector()
+    for config, config_tests in configs:
+      collector.collect(config, config_tests)
+    collector.count_all_tests()
+    for result in [constants.PASSED, constants.FAILED, constants.SKIPPED]:
+      collector.count_all_tests_with_result(result)
+    collector.get_total_config_exec_time()
+    collector.get_regressions()
+    for config_name in collector.get_config_names():
+      for result in [constants.PASSED, constants.FAILED, constants.SKIPPED]:
+        collector.count_tests_with_result(config_name, result)
+      for test_name in collector.get_test_names(config_name):
+        collector.get_test_exec_time(config_name, test_name)
+  return run
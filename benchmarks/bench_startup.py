@@ -0,0 +1,35 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import benchmark
+
+
+@benchmark("cli_import", size=5, quick_size=1)
+def cli_import(size, rng, workdir):
+  """import zopkio.__main__ in size fresh interpreters"""
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+  def run():
+    for _ in xrange(size):
+      subprocess.check_call([sys.executable, "-c", "import zopkio.__main__"], cwd=root)
+  return run
@@ -0,0 +1,123 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Synthetic inputs for the benchmarks. Every generator takes a random.Random so that the data is reproducible.
+"""
+import datetime
+import json
+import os
+import types
+
+import zopkio.constants as constants
+from zopkio.testobj import Test
+
+_LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+_WORDS = ["request", "served", "partition", "leader", "replica", "offset", "commit", "flush", "segment", "client",
+          "timeout", "retry", "connection", "session", "broker", "consumer", "producer", "fetch"]
+
+LOG_START = datetime.datetime(2015, 1, 1, 0, 0, 0)
+LOG_DATETIME_FORMAT = "2015-01-01 00:00:00,000"
+
+
+def write_log(path, lines, rng, start=LOG_START, mean_step=0.05, continuation_probability=0.02):
+  """
+  Writes a log of lines starting with a datetime, with some multi line entries (stack traces) whose continuation lines
+  have no datetime
+
+  :return: the datetime of the last line
+  """
+  current = start
+  with open(path, "w") as log:
+    for index in xrange(lines):
+      current += datetime.timedelta(seconds=rng.expovariate(1.0 / mean_step))
+      message = " ".join(rng.choice(_WORDS) for _ in xrange(rng.randint(4, 14)))
+      log.write("{0},{1:03d} {2} [thread-{3}] {4}\n".format(current.strftime("%Y-%m-%d %H:%M:%S"),
+                                                          current.microsecond // 1000, rng.choice(_LEVELS),
+                                                          rng.randint(1, 32), message))
+      if rng.random() < continuation_probability:
+        for depth in xrange(rng.randint(2, 8)):
+          log.write("\tat org.example.{0}.{1}(Source.java:{2})\n".format(rng.choice(_WORDS), rng.choice(_WORDS),
+                                                                          rng.randint(1, 999)))
+  return current
+
+
+def make_tests(count, rng, iterations=1):
+  """
+  :return: list of Test objects with random results and timings as they look after a run
+  """
+  results = [constants.PASSED] * 8 + [constants.FAILED, constants.SKIPPED]
+  tests = []
+  for index in xrange(count):
+    test = Test("test_{0:06d}".format(index), lambda: None, validate=None, iteration=iterations)
+    test.description = "synthetic test {0}".format(index)
+    test.start_time = 1420070400 + index
+    test.func_start_time = test.start_time + 0.1
+    test.func_end_time = test.func_start_time + rng.expovariate(1.0)
+    test.end_time = test.func_end_time + 0.1
+    test.result = rng.choice(results)
+    if test.result == constants.FAILED:
+      test.message = "Traceback (most recent call last):\n  AssertionError: synthetic failure {0}".format(index)
+    for iteration in xrange(1, iterations + 1):
+      test.iteration_results[iteration] = test.result
+      test.iteration_durations.add(rng.expovariate(10.0), iteration)
+    tests.append(test)
+  return tests
+
+
+def write_config_tree(root, configs, files_per_config, keys_per_file, rng):
+  """
+  Writes a config directory with a master config, default configs at the top level and one subdirectory per config
+  """
+  def write_json(path, prefix):
+    mapping = dict(("{0}_{1}".format(prefix, key), rng.choice([rng.randint(0, 10 ** 6), rng.random(),
+                                                               "value-{0}".format(rng.randint(0, 10 ** 6))]))
+                   for key in xrange(keys_per_file))
+    with open(path, "w") as config_file:
+      json.dump(mapping, config_file)
+
+  with open(os.path.join(root, "master.json"), "w") as master_file:
+    json.dump({"max_suite_failures_before_abort": 3, "OUTPUT_DIRECTORY": "/tmp"}, master_file)
+  write_json(os.path.join(root, "defaults.json"), "default")
+  for config in xrange(configs):
+    config_dir = os.path.join(root, "config_{0:04d}".format(config))
+    os.mkdir(config_dir)
+    for index in xrange(files_per_config):
+      write_json(os.path.join(config_dir, "file_{0:03d}.json".format(index)), "key{0}".format(index))
+
+
+def make_test_module(name, functions, rng):
+  """
+  :return: a module object with test functions, some with a matching validate function, and helpers like a test file
+  """
+  module = types.ModuleType(name)
+  module.test_phase = rng.randint(-1, 3)
+  for index in xrange(functions):
+    kinds = rng.choice([["test"], ["test", "validate"], ["helper"]])
+    for kind in kinds:
+      function_name = "{0}_{1}_{2}".format(kind, name, index)
+
+      def function():
+        pass
+      function.__name__ = function_name
+      function.__doc__ = "{0} number {1}".format(kind, index)
+      setattr(module, function_name, function)
+  for index in xrange(functions // 4):
+    setattr(module, "CONSTANT_{0}".format(index), index)
+  return module
@@ -0,0 +1,163 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Registers, runs and compares benchmarks.
+
+A benchmark is a function decorated with @benchmark taking (size, rng, workdir) that builds its synthetic input and
+returns the function to time, or a (function, teardown) tuple when it holds resources such as servers. Inputs are
+generated from a random.Random seeded with a fixed seed so that every run measures the same work.
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from zopkio.timings import TimingSeries
+
+DEFAULT_SEED = 20150101
+
+_benchmarks = []
+
+
+class Benchmark(object):
+  def __init__(self, name, function, size, quick_size, description):
+    self.name = name
+    self.function = function
+    self.size = size
+    self.quick_size = quick_size
+    self.description = description
+
+
+def benchmark(name, size, quick_size):
+  """
+  Registers a benchmark
+
+  :param name: unique name used in the results and with --filter
+  :param size: the size of the generated input (lines, tests, files...) for a full run
+  :param quick_size: the size used with --quick, small enough for a smoke test
+  """
+  def register(function):
+    _benchmarks.append(Benchmark(name, function, size, quick_size, (function.__doc__ or "").strip()))
+    return function
+  return register
+
+
+def get_benchmarks(names=None):
+  """
+  :param names: substrings of the benchmarks to return, all benchmarks if None or empty
+  """
+  return [bench for bench in _benchmarks if not names or any(name in bench.name for name in names)]
+
+
+def run_benchmark(bench, quick=False, repeat=5, seed=DEFAULT_SEED):
+  """
+  Generates the input of bench, runs it once to warm up and then repeat times
+
+  :return: dict with the name, size, times and summary statistics in seconds
+  """
+  size = bench.quick_size if quick else bench.size
+  workdir = tempfile.mkdtemp(prefix="zopkio_bench_")
+  teardown = None
+  try:
+    run = bench.function(size, random.Random(seed), workdir)
+    if isinstance(run, tuple):
+      run, teardown = run
+    run()
+    times = TimingSeries()
+    for _ in xrange(repeat):
+      start = time.time()
+      run()
+      times.add(time.time() - start)
+  finally:
+    if teardown is not None:
+      teardown()
+    shutil.rmtree(workdir, ignore_errors=True)
+  return {
+      "name": bench.name,
+      "size": size,
+      "repeat": repeat,
+      "min": times.min(),
+      "median": times.percentile(50),
+      "mean": times.mean(),
+      "stddev": times.stddev(),
+      "times": times.values()
+  }
+
+
+def _git_commit():
+  try:
+    with open(os.devnull, "w") as devnull:
+      return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=devnull,
+                                     cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def run_all(names=None, quick=False, repeat=5, seed=DEFAULT_SEED, report=None):
+  """
+  Runs the selected benchmarks
+
+  :param report: function called with each result as it is produced
+  :return: dict with the run metadata and the list of results, ready to be dumped as json
+  """
+  results = []
+  for bench in get_benchmarks(names):
+    result = run_benchmark(bench, quick, repeat, seed)
+    results.append(result)
+    if report is not None:
+      report(result)
+  return {
+      "metadata": {
+          "timestamp": time.time(),
+          "commit": _git_commit(),
+          "python": sys.version.split()[0],
+          "platform": platform.platform(),
+          "seed": seed,
+          "quick": quick
+      },
+      "benchmarks": results
+  }
+
+
+def compare(baseline, current):
+  """
+  :param baseline: results of an earlier run_all
+  :param current: results of this run_all
+  :return: list of (name, baseline median, current median, ratio) for the benchmarks present in both with the same size
+  """
+  baseline_results = dict((result["name"], result) for result in baseline["benchmarks"])
+  comparison = []
+  for result in current["benchmarks"]:
+    old = baseline_results.get(result["name"])
+    if old is None or old["size"] != result["size"]:
+      continue
+    ratio = result["median"] / old["median"] if old["median"] > 0 else float("inf")
+    comparison.append((result["name"], old["median"], result["median"], ratio))
+  return comparison
+
+
+def load_results(path):
+  with open(path) as results_file:
+    return json.load(results_file)
@@ -65,8 +65,7 @@ setup(
       'pytz>=2012c',
       'jinja2>=2.7.3',
       'python-dateutil',
-      'kazoo>=1.1',
-      'junit_xml>=1.6'
+      'kazoo>=1.1'
   ],
   entry_points = {
       'console_scripts': [
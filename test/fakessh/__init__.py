@@ -0,0 +1,30 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+In-process fake SSH/SFTP servers for exercising remote_host_helper and the deployers without sshd.
+
+Each FakeSSHServer listens on a loopback port and plays the part of one host whose filesystem is a temporary
+directory. A FakeCluster starts many of them and maps machine names onto them so that hundreds of hosts can be
+simulated from a single process, optionally with injected latency, bandwidth limits and handshake cost.
+"""
+from .server import FakeSSHServer, NetworkProfile
+from .cluster import FakeCluster
+
+__all__ = ["FakeCluster", "FakeSSHServer", "NetworkProfile"]
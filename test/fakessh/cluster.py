@@ -0,0 +1,110 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Simulates many hosts with one fake SSH server each
+"""
+from contextlib import contextmanager
+
+import zopkio.runtime as runtime
+
+from .server import FakeSSHServer, NetworkProfile
+
+FAKE_USERNAME = "zopkio"
+FAKE_PASSWORD = "fakessh"
+
+
+class FakeCluster(object):
+  """
+  A set of fake hosts, each with its own root directory and loopback port. The machine mapping translates host names
+  to the host:port of the server standing in for it so that deployers can be pointed at the simulated hosts.
+  """
+  def __init__(self, hosts=10, profile=None, name_format="host{0:03d}", mapped_prefixes=("/tmp",)):
+    """
+    :param hosts: the number of hosts or a list of host names
+    :param profile: NetworkProfile applied to every host, see set_profile to vary it per host
+    :param name_format: format of the host names when a number of hosts is given
+    :param mapped_prefixes: absolute paths that are private to each host
+    """
+    if isinstance(hosts, int):
+      hosts = [name_format.format(index) for index in xrange(hosts)]
+    self.servers = dict((name, FakeSSHServer(name, profile=profile or NetworkProfile(),
+                                             mapped_prefixes=mapped_prefixes))
+                        for name in hosts)
+
+  def names(self):
+    return sorted(self.servers.keys())
+
+  def server(self, name):
+    return self.servers[name]
+
+  def set_profile(self, name, profile):
+    """
+    Changes the network profile of one host, applies to the connections made afterwards
+    """
+    self.servers[name].profile = profile
+
+  def machines(self):
+    """
+    :return: dictionary from host name to the address of its fake server, as used by runtime.set_machines
+    """
+    return dict((name, server.address) for name, server in self.servers.iteritems())
+
+  def address(self, name):
+    return self.servers[name].address
+
+  def connections(self):
+    """
+    :return: the total number of SSH connections accepted by the hosts
+    """
+    return sum(server.connections for server in self.servers.itervalues())
+
+  def commands_run(self):
+    return sum(server.commands_run for server in self.servers.itervalues())
+
+  def start(self):
+    for server in self.servers.itervalues():
+      server.start()
+    return self
+
+  def stop(self):
+    for server in self.servers.itervalues():
+      server.stop()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+  @contextmanager
+  def installed(self):
+    """
+    Points the runtime at the cluster: the machine mapping resolves the host names and the credentials are accepted by
+    every fake host. The previous mapping and credentials are restored on exit.
+    """
+    previous_machines = runtime._machine_names
+    previous_user = (runtime.get_username(), runtime.get_password())
+    runtime.set_machines(self.machines())
+    runtime.set_user(FAKE_USERNAME, FAKE_PASSWORD)
+    try:
+      yield self
+    finally:
+      runtime.set_machines(previous_machines)
+      runtime.set_user(*previous_user)
@@ -0,0 +1,359 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+A fake SSH server playing the part of a single host.
+
+Commands are run locally through bash. Paths below the mapped prefixes (by default /tmp) are private to the host:
+they are rewritten into the host's root directory both in commands and over SFTP, so that several fake hosts can
+install into the same install_path without stepping on each other. Every other path is the real filesystem.
+"""
+import logging
+import os
+import Queue
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+import paramiko
+
+from .sftp import FakeSFTPInterface
+
+logger = logging.getLogger(__name__)
+
+_SHELL = "/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh"
+_ACCEPT_TIMEOUT = 0.1
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def get_host_key():
+  """
+  :return: the RSA key shared by all fake servers, generated once per process since it is slow
+  """
+  global _host_key
+  with _host_key_lock:
+    if _host_key is None:
+      _host_key = paramiko.RSAKey.generate(1024)
+    return _host_key
+
+
+class NetworkProfile(object):
+  """
+  Describes the network between the client and a fake host
+  """
+  def __init__(self, latency=0.0, bandwidth=None, handshake=0.0):
+    """
+    :param latency: seconds added to the round trip of every exchange
+    :param bandwidth: bytes per second in each direction for each connection, None means unlimited
+    :param handshake: seconds added to the establishment of each connection
+    """
+    self.latency = latency
+    self.bandwidth = bandwidth
+    self.handshake = handshake
+
+  def is_shaped(self):
+    return self.latency > 0 or self.bandwidth is not None
+
+
+class _ShapedSocket(object):
+  """
+  Wraps the server side of a connection. Outgoing data is delivered by a separate thread `latency` seconds after it
+  was sent, so pipelined exchanges are delayed once rather than once per message, and both directions are paced to
+  the bandwidth.
+  """
+  def __init__(self, sock, profile):
+    self._sock = sock
+    self._profile = profile
+    self._outgoing = Queue.Queue()
+    self._link_free = 0.0
+    self._sender = threading.Thread(target=self._deliver)
+    self._sender.daemon = True
+    self._sender.start()
+
+  def _transfer_time(self, size):
+    if self._profile.bandwidth is None:
+      return 0.0
+    return float(size) / self._profile.bandwidth
+
+  def _deliver(self):
+    while True:
+      item = self._outgoing.get()
+      if item is None:
+        return
+      deliver_at, data = item
+      start = max(deliver_at, self._link_free)
+      self._link_free = start + self._transfer_time(len(data))
+      delay = self._link_free - time.time()
+      if delay > 0:
+        time.sleep(delay)
+      try:
+        self._sock.sendall(data)
+      except socket.error:
+        return
+
+  def send(self, data):
+    self._outgoing.put((time.time() + self._profile.latency, data))
+    return len(data)
+
+  def sendall(self, data):
+    self.send(data)
+
+  def recv(self, size):
+    data = self._sock.recv(size)
+    delay = self._transfer_time(len(data))
+    if delay > 0:
+      time.sleep(delay)
+    return data
+
+  def close(self):
+    self._outgoing.put(None)
+    if threading.current_thread() is not self._sender:
+      self._sender.join(1)
+    self._sock.close()
+
+  def __getattr__(self, name):
+    return getattr(self._sock, name)
+
+
+class _FakeServerInterface(paramiko.ServerInterface):
+  """
+  Accepts any credentials and runs exec and shell requests on the fake host
+  """
+  def __init__(self, host):
+    self.host = host
+
+  def get_allowed_auths(self, username):
+    return "password,publickey"
+
+  def check_auth_password(self, username, password):
+    return paramiko.AUTH_SUCCESSFUL
+
+  def check_auth_publickey(self, username, key):
+    return paramiko.AUTH_SUCCESSFUL
+
+  def check_channel_request(self, kind, chanid):
+    if kind == "session":
+      return paramiko.OPEN_SUCCEEDED
+    return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+  def check_channel_exec_request(self, channel, command):
+    self.host.commands_run += 1
+    self._spawn(self.host.run_command, channel, command)
+    return True
+
+  def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+    return True
+
+  def check_channel_shell_request(self, channel):
+    self._spawn(self.host.run_shell, channel)
+    return True
+
+  @staticmethod
+  def _spawn(function, *args):
+    thread = threading.Thread(target=function, args=args)
+    thread.daemon = True
+    thread.start()
+
+
+class FakeSSHServer(object):
+  """
+  An SSH/SFTP server on a loopback port simulating one host
+  """
+  def __init__(self, name="localhost", root=None, profile=None, mapped_prefixes=("/tmp",)):
+    """
+    :param name: the name of the simulated host, exported to commands as FAKESSH_HOST
+    :param root: directory holding the host's private files, a temporary directory removed on stop by default
+    :param profile: NetworkProfile applied to every connection
+    :param mapped_prefixes: absolute paths that are private to the host
+    """
+    self.name = name
+    self._owns_root = root is None
+    self.root = os.path.realpath(root or tempfile.mkdtemp(prefix="fakessh_"))
+    self.profile = profile or NetworkProfile()
+    self.mapped_prefixes = [prefix.rstrip("/") for prefix in mapped_prefixes]
+    self._prefix_patterns = [re.compile(r"(?<![\w./-])" + re.escape(prefix) + r"(?![\w.-])")
+                             for prefix in self.mapped_prefixes]
+    self.connections = 0
+    self.commands_run = 0
+    self.port = None
+    self._listener = None
+    self._transports = []
+    self._lock = threading.Lock()
+    self._stopped = threading.Event()
+    self._thread = None
+
+  @property
+  def address(self):
+    """
+    :return: host:port to pass to remote_host_helper or use in a machine mapping
+    """
+    return "127.0.0.1:{0}".format(self.port)
+
+  def start(self):
+    for prefix in self.mapped_prefixes:
+      path = self.root + prefix
+      if not os.path.isdir(path):
+        os.makedirs(path)
+    self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._listener.bind(("127.0.0.1", 0))
+    self._listener.listen(128)
+    self._listener.settimeout(_ACCEPT_TIMEOUT)
+    self.port = self._listener.getsockname()[1]
+    self._thread = threading.Thread(target=self._accept_loop, name="fakessh-" + self.name)
+    self._thread.daemon = True
+    self._thread.start()
+    return self
+
+  def stop(self):
+    self._stopped.set()
+    if self._thread is not None:
+      self._thread.join()
+    if self._listener is not None:
+      self._listener.close()
+    with self._lock:
+      transports, self._transports = self._transports, []
+    for transport in transports:
+      transport.close()
+    if self._owns_root:
+      shutil.rmtree(self.root, ignore_errors=True)
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+  def _accept_loop(self):
+    while not self._stopped.is_set():
+      try:
+        sock, _ = self._listener.accept()
+      except socket.timeout:
+        continue
+      except socket.error:
+        break
+      thread = threading.Thread(target=self._serve, args=[sock])
+      thread.daemon = True
+      thread.start()
+
+  def _serve(self, sock):
+    # like sshd, avoid Nagle's algorithm holding back the small packets of an exchange until the client's delayed ack
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with self._lock:
+      self.connections += 1
+    if self.profile.handshake > 0:
+      time.sleep(self.profile.handshake)
+    if self.profile.is_shaped():
+      sock = _ShapedSocket(sock, self.profile)
+    transport = paramiko.Transport(sock)
+    transport.set_log_channel(__name__ + ".transport")
+    transport.add_server_key(get_host_key())
+    transport.set_subsystem_handler("sftp", paramiko.SFTPServer, FakeSFTPInterface, self)
+    with self._lock:
+      self._transports = [t for t in self._transports if t.is_active()]
+      self._transports.append(transport)
+    try:
+      transport.start_server(server=_FakeServerInterface(self))
+    except (paramiko.SSHException, EOFError, socket.error) as e:
+      logger.debug("{0}: connection failed: {1}".format(self.name, e))
+      transport.close()
+
+  def local_path(self, path):
+    """
+    Maps a path on the fake host to the local filesystem: relative paths are resolved against the root directory
+    (the host's home) and absolute paths under a mapped prefix are moved into it
+
+    :param path: the path as seen on the fake host
+    """
+    if not os.path.isabs(path):
+      return os.path.normpath(os.path.join(self.root, path))
+    path = os.path.normpath(path)
+    for prefix in self.mapped_prefixes:
+      if path == prefix or path.startswith(prefix + "/"):
+        return self.root + path
+    return path
+
+  def translate(self, command):
+    """
+    Rewrites the paths under the mapped prefixes in a command
+    """
+    for pattern in self._prefix_patterns:
+      command = pattern.sub(lambda match: self.root + match.group(0), command)
+    return command
+
+  def _popen(self, args, stderr=subprocess.PIPE):
+    env = dict(os.environ)
+    env.update({"HOME": self.root, "FAKESSH_HOST": self.name})
+    return subprocess.Popen([_SHELL] + args, cwd=self.root, env=env, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=stderr, close_fds=True)
+
+  def run_command(self, channel, command):
+    try:
+      process = self._popen(["-c", self.translate(command)])
+      out, err = process.communicate()
+      channel.sendall(out)
+      channel.sendall_stderr(err)
+      channel.send_exit_status(process.returncode)
+    except (socket.error, EOFError, paramiko.SSHException) as e:
+      logger.debug("{0}: failed to return the result of {1}: {2}".format(self.name, command, e))
+    finally:
+      channel.close()
+
+  def run_shell(self, channel):
+    """
+    Runs an interactive shell, commands read from the channel are translated line by line
+    """
+    process = self._popen(["-s"], stderr=subprocess.STDOUT)
+
+    def forward_output():
+      for line in iter(process.stdout.readline, ""):
+        try:
+          channel.sendall(line)
+        except (socket.error, EOFError):
+          break
+
+    output = threading.Thread(target=forward_output)
+    output.daemon = True
+    output.start()
+    pending = ""
+    try:
+      while True:
+        data = channel.recv(4096)
+        if len(data) == 0:
+          break
+        pending += data
+        while "\n" in pending:
+          line, pending = pending.split("\n", 1)
+          process.stdin.write(self.translate(line) + "\n")
+          process.stdin.flush()
+    except (socket.error, EOFError, IOError):
+      pass
+    finally:
+      try:
+        process.stdin.close()
+      except IOError:
+        pass
+      process.wait()
+      output.join(1)
+      channel.close()
@@ -0,0 +1,149 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+SFTP subsystem of the fake SSH server, serving the fake host's view of the filesystem
+"""
+import os
+
+import paramiko
+
+
+class _FakeSFTPHandle(paramiko.SFTPHandle):
+
+  def stat(self):
+    try:
+      return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+    except OSError as e:
+      return paramiko.SFTPServer.convert_errno(e.errno)
+
+  def chattr(self, attr):
+    try:
+      paramiko.SFTPServer.set_file_attr(self.filename, attr)
+      return paramiko.SFTP_OK
+    except OSError as e:
+      return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+def _sftp_errors(function):
+  """
+  Converts OSError raised by a filesystem call into the matching SFTP status code
+  """
+  def wrapper(*args, **kwargs):
+    try:
+      return function(*args, **kwargs)
+    except (OSError, IOError) as e:
+      return paramiko.SFTPServer.convert_errno(e.errno)
+  wrapper.__name__ = function.__name__
+  return wrapper
+
+
+class FakeSFTPInterface(paramiko.SFTPServerInterface):
+  """
+  Maps SFTP requests onto the local filesystem through FakeSSHServer.local_path
+  """
+  def __init__(self, server_interface, host):
+    """
+    :param server_interface: the paramiko.ServerInterface of the connection
+    :param host: the FakeSSHServer the connection belongs to
+    """
+    super(FakeSFTPInterface, self).__init__(server_interface)
+    self.host = host
+
+  def canonicalize(self, path):
+    if not os.path.isabs(path):
+      path = os.path.join(self.host.root, path)
+    return os.path.normpath(path)
+
+  @_sftp_errors
+  def list_folder(self, path):
+    local = self.host.local_path(path)
+    attributes = []
+    for filename in os.listdir(local):
+      attr = paramiko.SFTPAttributes.from_stat(os.lstat(os.path.join(local, filename)))
+      attr.filename = filename
+      attributes.append(attr)
+    return attributes
+
+  @_sftp_errors
+  def stat(self, path):
+    return paramiko.SFTPAttributes.from_stat(os.stat(self.host.local_path(path)))
+
+  @_sftp_errors
+  def lstat(self, path):
+    return paramiko.SFTPAttributes.from_stat(os.lstat(self.host.local_path(path)))
+
+  @_sftp_errors
+  def open(self, path, flags, attr):
+    local = self.host.local_path(path)
+    binary_flag = getattr(os, "O_BINARY", 0)
+    mode = getattr(attr, "st_mode", None) or 0o666
+    fd = os.open(local, flags | binary_flag, mode)
+    if (flags & os.O_CREAT) and attr is not None:
+      attr._flags &= ~attr.FLAG_PERMISSIONS
+      paramiko.SFTPServer.set_file_attr(local, attr)
+    if flags & os.O_WRONLY:
+      fstr = "ab" if flags & os.O_APPEND else "wb"
+    elif flags & os.O_RDWR:
+      fstr = "a+b" if flags & os.O_APPEND else "r+b"
+    else:
+      fstr = "rb"
+    f = os.fdopen(fd, fstr)
+    handle = _FakeSFTPHandle(flags)
+    handle.filename = local
+    handle.readfile = f
+    handle.writefile = f
+    return handle
+
+  @_sftp_errors
+  def remove(self, path):
+    os.remove(self.host.local_path(path))
+    return paramiko.SFTP_OK
+
+  @_sftp_errors
+  def rename(self, oldpath, newpath):
+    os.rename(self.host.local_path(oldpath), self.host.local_path(newpath))
+    return paramiko.SFTP_OK
+
+  @_sftp_errors
+  def mkdir(self, path, attr):
+    local = self.host.local_path(path)
+    os.mkdir(local)
+    if attr is not None:
+      paramiko.SFTPServer.set_file_attr(local, attr)
+    return paramiko.SFTP_OK
+
+  @_sftp_errors
+  def rmdir(self, path):
+    os.rmdir(self.host.local_path(path))
+    return paramiko.SFTP_OK
+
+  @_sftp_errors
+  def chattr(self, path, attr):
+    paramiko.SFTPServer.set_file_attr(self.host.local_path(path), attr)
+    return paramiko.SFTP_OK
+
+  @_sftp_errors
+  def symlink(self, target_path, path):
+    os.symlink(target_path, self.host.local_path(path))
+    return paramiko.SFTP_OK
+
+  @_sftp_errors
+  def readlink(self, path):
+    return os.readlink(self.host.local_path(path))
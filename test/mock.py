@@ -16,8 +16,10 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from zopkio.configobj import Config
 from zopkio.deployer import Deployer, Process
 from zopkio import runtime
+from zopkio.test_runner import TestRunner
 
 class Mock_Deployer(Deployer):
     """
@@ -63,3 +65,19 @@ class Mock_Deployer(Deployer):
 
     def kill_all_process(self):
       pass
+
+
+def in_process_runner(master_mapping=None, deployment_module=None, tests=None):
+  """
+  Creates a TestRunner without a testfile or config directory, for tests calling its test execution methods such as
+  _run_and_verify_test or _execute_single_test directly
+
+  :param master_mapping: the mapping of the master config, no_perf by default
+  :param deployment_module: the deployment module, one without setup or teardown functions by default
+  :param tests: the tests of the runner
+  """
+  runner = TestRunner.__new__(TestRunner)
+  runner.master_config = Config("master", master_mapping if master_mapping is not None else {"no_perf": True})
+  runner.deployment_module = deployment_module if deployment_module is not None else object()
+  runner.tests = tests if tests is not None else []
+  return runner
@@ -0,0 +1,82 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import itertools
+import time
+import unittest
+
+from zopkio.adaptive import StoppingRule
+from zopkio.configobj import Config
+import zopkio.constants as constants
+import zopkio.runtime as runtime
+from zopkio.test_runner import FailureHandler
+from zopkio.testobj import Test
+
+from .mock import in_process_runner
+
+
+class TestAdaptive(unittest.TestCase):
+
+  def setUp(self):
+    self.config = Config("adaptive", {"should_fetch_logs": False})
+    runtime.set_active_config(self.config)
+    self.runner = in_process_runner()
+
+  def _run(self, name, values, stopping_rule, duration=0):
+    values = iter(values)
+
+    def function():
+      time.sleep(duration)
+      runtime.record_iteration_metric(name, "throughput", next(values))
+    test = Test(name, function, validate=None, stopping_rule=stopping_rule)
+    runtime.set_active_tests([test])
+    self.runner._execute_single_test(self.config, FailureHandler(), None, test)
+    return test
+
+  def test_stable_metric_stops_early(self):
+    test = self._run("test_stable", itertools.cycle([100.0, 101.0]),
+                     {"metric": "throughput", "relative_width": 0.05, "min_iterations": 4, "max_iterations": 50})
+    self.assertEqual(test.result, constants.PASSED)
+    self.assertEqual(test.current_iteration, 4)
+    self.assertEqual(test.total_number_iterations, 4)
+    self.assertTrue(test.confidence["converged"])
+    self.assertEqual(test.confidence["stop_reason"], "converged")
+    self.assertAlmostEqual(test.confidence["mean"], 100.5)
+    self.assertTrue(test.confidence["relative_width"] <= 0.05)
+
+  def test_noisy_metric_runs_until_bounds(self):
+    test = self._run("test_noisy", itertools.cycle([1.0, 100.0]),
+                     {"metric": "throughput", "relative_width": 0.01, "max_iterations": 10})
+    self.assertEqual(test.current_iteration, 10)
+    self.assertFalse(test.confidence["converged"])
+    self.assertEqual(test.confidence["stop_reason"], "max_iterations")
+
+    test = self._run("test_budget", itertools.cycle([1.0, 100.0]),
+                     {"metric": "throughput", "relative_width": 0.01, "max_iterations": 1000, "time_budget": 0.1},
+                     duration=0.02)
+    self.assertTrue(test.current_iteration < 1000)
+    self.assertEqual(test.confidence["stop_reason"], "time_budget")
+
+  def test_invalid_rules(self):
+    self.assertRaises(ValueError, StoppingRule, confidence=1.5)
+    self.assertRaises(ValueError, StoppingRule, relative_width=0)
+    self.assertRaises(TypeError, StoppingRule.create, {"relative_widht": 0.1})
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,58 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import benchmarks.__main__ as benchmarks_main
+import benchmarks.harness as harness
+import zopkio.runtime as runtime
+
+
+class TestBenchmarks(unittest.TestCase):
+  """
+  Runs every benchmark on its quick input so that the benchmarks keep working as the code changes
+  """
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.output_dir)
+    runtime.reset_collector()
+
+  def test_quick_run_and_compare(self):
+    output = os.path.join(self.output_dir, "results.json")
+    self.assertEqual(benchmarks_main.main(["--quick", "--repeat", "1", "--output", output]), 0)
+    with open(output) as results_file:
+      results = json.load(results_file)
+    names = [result["name"] for result in results["benchmarks"]]
+    for name in ["log_search", "results_collector", "html_report", "load_configs", "determine_tests", "ssh_fanout",
+                 "json_report"]:
+      self.assertTrue(name in names)
+    self.assertEqual(results["metadata"]["seed"], harness.DEFAULT_SEED)
+    comparison = harness.compare(results, results)
+    self.assertEqual(len(comparison), len(names))
+    self.assertTrue(all(ratio == 1.0 for name, old, new, ratio in comparison))
+
+if __name__ == '__main__':
+  unittest.main()
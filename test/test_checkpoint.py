@@ -0,0 +1,177 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+import zopkio.checkpoint as checkpoint
+import zopkio.constants as constants
+from zopkio.deployer import Process
+from zopkio.histogram import Histogram
+from zopkio.regression import Regression
+import zopkio.runtime as runtime
+from zopkio.test_runner import TestRunner
+from zopkio.testobj import Test
+from zopkio.ztests import ZTest, ZTestSuite
+
+from .fakessh import FakeCluster
+
+
+class _RecordingTest(ZTest):
+  iteration = 2
+
+  def __init__(self, suite, name):
+    self.suite = suite
+    self.name = name
+
+  def test(self):
+    self.suite.calls.append((runtime.get_active_config_name(), self.name))
+
+
+class _RecordingSuite(ZTestSuite):
+
+  def __init__(self, config_dir):
+    self.config_dir = config_dir
+    self.calls = []
+    self.first_test = _RecordingTest(self, "first_test")
+    self.second_test = _RecordingTest(self, "second_test")
+
+
+class TestCheckpoint(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    self.previous_output_dir = runtime.get_output_dir()
+    runtime.set_output_dir(os.path.join(self.output_dir, "output"))
+    runtime.reset_collector()
+    self.config_dir = os.path.join(self.output_dir, "configs")
+    for config_name in ["config_a", "config_b"]:
+      os.makedirs(os.path.join(self.config_dir, config_name))
+      with open(os.path.join(self.config_dir, config_name, "config.json"), "w") as config_file:
+        json.dump({"should_fetch_logs": False}, config_file)
+    with open(os.path.join(self.config_dir, "master.json"), "w") as master_file:
+      json.dump({"no_perf": True, "junit_reporter": True, "checkpoint_interval": 0,
+                 "LOGS_DIRECTORY": os.path.join(self.output_dir, "logs"),
+                 "OUTPUT_DIRECTORY": os.path.join(self.output_dir, "output")}, master_file)
+
+  def tearDown(self):
+    runtime.set_output_dir(self.previous_output_dir)
+    runtime.reset_collector()
+    shutil.rmtree(self.output_dir)
+
+  def test_state_round_trip(self):
+    test = Test("test_state", lambda: None, iteration=3, validate=None)
+    test.result = constants.FAILED
+    test.exception = KeyError("missing")
+    test.current_iteration = 2
+    test.iteration_results.update({1: constants.PASSED, 2: constants.FAILED})
+    test.iteration_durations.add(0.5, 1)
+    test.histograms["latency"] = Histogram()
+    test.histograms["latency"].record(0.25)
+    test.regressions = [Regression("latency.p99", 2.0, 1.0, 0.1, 10.0, 5)]
+    restored = Test("test_state", lambda: None, iteration=3, validate=None)
+    checkpoint.restore_test(restored, json.loads(json.dumps(checkpoint.test_state(test))))
+    self.assertEqual((restored.result, restored.current_iteration), (constants.FAILED, 2))
+    self.assertEqual(restored.iteration_results, {0: constants.SKIPPED, 1: constants.PASSED, 2: constants.FAILED})
+    self.assertEqual(restored.iteration_durations.items(), [(1, 0.5)])
+    self.assertEqual(type(restored.exception).__name__, "KeyError")
+    self.assertTrue(isinstance(restored.exception, checkpoint.RestoredException))
+    self.assertEqual(restored.histograms["latency"].count, 1)
+    self.assertEqual(restored.regressions[0].relative_change, 1.0)
+
+  def test_iterations_are_checkpointed_once_per_interval(self):
+    path = os.path.join(self.output_dir, checkpoint.CHECKPOINT_FILE)
+    saved = checkpoint.Checkpoint(path, "_RecordingSuite", interval=3600)
+    saved.current = {"config": "config_a", "units": [], "tests": {}}
+    test = Test("test_interval", lambda: None, iteration=3, validate=None)
+    test.current_iteration = 1
+    self.assertFalse(saved.iteration_finished(test))
+    self.assertFalse(os.path.exists(path))
+    saved._last_save -= 3600
+    self.assertTrue(saved.iteration_finished(test))
+    test.current_iteration = 2
+    self.assertFalse(saved.iteration_finished(test))
+    loaded = checkpoint.Checkpoint.load(path, "_RecordingSuite")
+    self.assertEqual(loaded.current["tests"]["test_interval"]["current_iteration"], 1)
+
+  def test_resume_skips_finished_work(self):
+    save = checkpoint.Checkpoint.save
+    saves = []
+
+    def dying_save(self):
+      # with no checkpoint interval a config saves when it starts, after each iteration, after each test and when it
+      # finished, so the second config starts at the 9th save and the run dies while saving the second iteration of
+      # its first test
+      saves.append(1)
+      if len(saves) == 11:
+        raise KeyboardInterrupt()
+      save(self)
+    suite = _RecordingSuite(self.config_dir)
+    checkpoint.Checkpoint.save = dying_save
+    try:
+      runner = TestRunner(ztestsuite=suite)
+      self.assertRaises(KeyboardInterrupt, runner.run)
+    finally:
+      checkpoint.Checkpoint.save = save
+    second_config = runner.configs[1].name
+    self.assertEqual(len(suite.calls), 6)
+
+    suite.calls = []
+    runtime.reset_collector()
+    resumed = TestRunner(ztestsuite=suite, resume_dir=runner.directory_info["results_dir"])
+    resumed.run()
+    self.assertEqual(suite.calls, [(second_config, "first_test")] + [(second_config, "second_test")] * 2)
+    self.assertEqual((resumed.success_count(), resumed.fail_count()), (4, 0))
+    collector = runtime.get_collector()
+    self.assertEqual(sorted(collector.get_config_names()), ["config_a", "config_b"])
+    first_test = collector.get_test_result(second_config, "first_test")
+    self.assertEqual(sorted(first_test.iteration_results.items())[1:], [(1, constants.PASSED), (2, constants.PASSED)])
+    self.assertEqual(len(first_test.iteration_durations), 2)
+    path = os.path.join(runner.directory_info["results_dir"], checkpoint.CHECKPOINT_FILE)
+    with open(path) as checkpoint_file:
+      self.assertEqual(json.load(checkpoint_file)["current"], None)
+    # every config was appended once, the resumed run did not record the restored config again
+    with open(os.path.join(runner.directory_info["results_dir"], "checkpoint_configs.jsonl")) as configs_file:
+      self.assertEqual(sorted(json.loads(line)["config"] for line in configs_file), ["config_a", "config_b"])
+    self.assertRaises(checkpoint.CheckpointError, checkpoint.Checkpoint.load, self.output_dir, "_RecordingSuite")
+
+  def test_cleanup_processes(self):
+    orphan = subprocess.Popen(["sleep", "4567.25"])
+    try:
+      with FakeCluster(hosts=1) as cluster:
+        with cluster.installed():
+          process = Process("server1", "sleeper", cluster.address(cluster.names()[0]), "/tmp/sleeper")
+          process.start_command = "sleep"
+          process.args = ["4567.25"]
+          checkpoint.cleanup_processes([checkpoint.process_state(process)])
+      deadline = time.time() + 5
+      while orphan.poll() is None and time.time() < deadline:
+        time.sleep(0.01)
+      self.assertNotEqual(orphan.poll(), None)
+    finally:
+      if orphan.poll() is None:
+        orphan.kill()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,125 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from zopkio.config_matrix import ConfigMatrix
+from zopkio.configobj import Config
+import zopkio.runtime as runtime
+from zopkio.test_runner import TestRunner
+import zopkio.test_runner_helper as test_runner_helper
+from zopkio.ztests import ZTest, ZTestSuite
+
+
+class _ThreadsTest(ZTest):
+
+  def __init__(self, suite):
+    self.suite = suite
+
+  def test(self):
+    self.suite.threads.append(runtime.get_active_config("threads"))
+
+
+class _MatrixSuite(ZTestSuite):
+
+  def __init__(self, config_dir):
+    self.config_dir = config_dir
+    self.threads = []
+    self.threads_test = _ThreadsTest(self)
+
+
+class TestConfigMatrix(unittest.TestCase):
+
+  def setUp(self):
+    self.config_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.config_dir)
+
+  def _write_config(self, path, mapping):
+    with open(os.path.join(self.config_dir, path), "w") as config_file:
+      json.dump(mapping, config_file)
+
+  def test_expands_matrix_from_master_config(self):
+    self._write_config("master.json", {"config_matrix": {
+        "product": {"threads": [1, 4, 16], "payload": [64, 4096]},
+        "zip": {"heap": ["1g", "4g"], "gc": ["parallel", "g1"]},
+        "exclude": [{"threads": 16, "payload": 64}]}})
+    self._write_config("defaults.json", {"threads": 0, "host": "localhost"})
+    master_config, configs = test_runner_helper.load_configs_from_directory(self.config_dir, {"host": "remote"})
+    mappings = [config.mapping for config in configs]
+    self.assertEqual(len(configs), 10)
+    self.assertFalse(any(mapping["threads"] == 16 and mapping["payload"] == 64 for mapping in mappings))
+    self.assertEqual(set((mapping["heap"], mapping["gc"]) for mapping in mappings),
+                     set([("1g", "parallel"), ("4g", "g1")]))
+    self.assertTrue(all(mapping["host"] == "remote" for mapping in mappings))
+
+    names = [config.name for config in configs]
+    self.assertEqual(len(set(names)), 10)
+    self.assertTrue(all(name.startswith("matrix_") for name in names))
+    _, reloaded = test_runner_helper.load_configs_from_directory(self.config_dir, {"host": "remote"})
+    self.assertEqual([config.name for config in reloaded], names)
+
+  def test_filters_and_deduplicates(self):
+    base_configs = [Config("base", {"threads": 1})]
+    matrix = ConfigMatrix({"product": {"threads": [1, 2, 2, 8]}, "filter": lambda parameters: parameters["threads"] < 8},
+                          base_configs)
+    configs = list(matrix)
+    self.assertEqual([config.mapping["threads"] for config in configs], [1, 2])
+    self.assertTrue(all(config.name.startswith("base_") for config in configs))
+    # the base config is not modified by the combinations
+    self.assertEqual(base_configs[0].mapping, {"threads": 1})
+
+  def test_runner_keeps_the_executed_configs(self):
+    output_dir = os.path.join(self.config_dir, "output")
+    previous_output_dir = runtime.get_output_dir()
+    self._write_config("master.json", {"config_matrix": {"product": {"threads": [1, 2, 4]}}, "no_perf": True,
+                                       "junit_reporter": True, "LOGS_DIRECTORY": os.path.join(output_dir, "logs"),
+                                       "OUTPUT_DIRECTORY": output_dir})
+    self._write_config("defaults.json", {"threads": 0, "should_fetch_logs": False})
+    try:
+      runtime.set_output_dir(output_dir)
+      runtime.reset_collector()
+      suite = _MatrixSuite(self.config_dir)
+      runner = TestRunner(ztestsuite=suite)
+      self.assertTrue(isinstance(runner.configs, ConfigMatrix))
+      runner.run()
+    finally:
+      runtime.set_output_dir(previous_output_dir)
+      runtime.reset_collector()
+    self.assertEqual(sorted(suite.threads), [1, 2, 4])
+    # the configs a run diffs and reports are the ones it ran, not regenerated by the matrix
+    self.assertEqual([config.mapping["threads"] for config in runner._executed_configs], suite.threads)
+    self.assertTrue(all(config.start_time is not None for config in runner._executed_configs))
+    with open(os.path.join(runner.directory_info["results_dir"], "events.jsonl")) as events_file:
+      run_started = json.loads(events_file.readline())
+    self.assertEqual((run_started["event"], run_started["config_matrix"]),
+                     ("run_started", {"product": {"threads": [1, 2, 4]}}))
+
+  def test_rejects_invalid_matrix(self):
+    self.assertRaises(ValueError, ConfigMatrix, {"zip": {"a": [1, 2], "b": [1]}}, [])
+    self.assertRaises(ValueError, ConfigMatrix, {"product": {"a": []}}, [])
+    self.assertRaises(ValueError, ConfigMatrix, {"cartesian": {"a": [1]}}, [])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,125 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.constants as constants
+import zopkio.events as events
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+from .mock import in_process_runner
+from .test_tracing import _FakeDeployer
+
+
+class TestEvents(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.output_dir, "results", "events.jsonl")
+    self.stream = events.get_event_stream()
+
+  def tearDown(self):
+    self.stream.close()
+    shutil.rmtree(self.output_dir)
+
+  def _read_events(self):
+    with open(self.path) as events_file:
+      return [json.loads(line) for line in events_file]
+
+  def test_json_lines(self):
+    stream = events.EventStream()
+    stream.emit("ignored")
+    stream.open(self.path)
+    stream.emit("config_started", config="default")
+    stream.emit("custom", value=object())
+    stream.close()
+    stream.emit("ignored")
+    started, custom = self._read_events()
+    self.assertEqual((started["event"], started["config"], started["seq"]), ("config_started", "default", 1))
+    self.assertEqual((custom["event"], custom["seq"]), ("custom", 2))
+    self.assertTrue(custom["value"].startswith("<object"))
+    self.assertTrue(custom["time"] >= started["time"])
+
+  def test_socket_subscribers(self):
+    socket_path = os.path.join(self.output_dir, "events.sock")
+    self.stream.open(self.path, socket_path)
+    self.stream.emit("before_subscribing")
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    client.settimeout(5)
+    # the subscriber is registered by the accepting thread
+    deadline = time.time() + 5
+    while len(self.stream._subscribers) == 0 and time.time() < deadline:
+      time.sleep(0.01)
+    self.stream.emit("after_subscribing", n=1)
+    received = json.loads(client.makefile().readline())
+    self.assertEqual((received["event"], received["n"], received["seq"]), ("after_subscribing", 1, 2))
+    self.stream.close()
+    self.assertFalse(os.path.exists(socket_path))
+    client.close()
+
+  def test_slow_subscriber_is_dropped(self):
+    socket_path = os.path.join(self.output_dir, "events.sock")
+    self.stream.open(self.path, socket_path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    deadline = time.time() + 5
+    while len(self.stream._subscribers) == 0 and time.time() < deadline:
+      time.sleep(0.01)
+    # the client never reads, its socket buffer and then its queue fill up without holding up emit
+    for index in xrange(2 * events._MAX_QUEUED_EVENTS):
+      self.stream.emit("filler", index=index, payload="x" * 10000)
+    self.assertEqual(self.stream._subscribers, [])
+    self.assertEqual(len(self._read_events()), 2 * events._MAX_QUEUED_EVENTS)
+    client.close()
+
+  def test_runner_and_deployer_events(self):
+    self.stream.open(self.path)
+    runtime.set_active_config(Config("events", {"should_fetch_logs": False}))
+
+    def fail():
+      raise AssertionError("boom")
+    runner = in_process_runner()
+    for function in [lambda: None, fail]:
+      test = Test("test_events", function, validate=None, iteration=2)
+      test.current_iteration = 1
+      runner._run_and_verify_test(test)
+
+    deployer = _FakeDeployer()
+    deployer.install("server1", {"hostname": "host1"})
+    self.assertRaises(RuntimeError, deployer.stop, "server1")
+
+    passed, failed, install, stop = self._read_events()
+    self.assertEqual((passed["event"], passed["config"], passed["test"], passed["iteration"], passed["result"]),
+                     ("iteration_finished", "events", "test_events", 1, constants.PASSED))
+    self.assertTrue(passed["duration"] >= 0)
+    self.assertEqual((failed["result"], failed["error"]), (constants.FAILED, "AssertionError"))
+    self.assertEqual((install["event"], install["operation"], install["host"], install["error"]),
+                     ("deploy", "install", "host1", None))
+    self.assertEqual((stop["operation"], stop["error"]), ("stop", "RuntimeError"))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,115 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from zopkio.adhoc_deployer import SSHDeployer
+import zopkio.runtime as runtime
+from zopkio.remote_host_helper import ParamikoError, better_exec_command, get_sftp_client, get_ssh_client,\
+  split_host_port
+
+from .fakessh import FakeCluster, FakeSSHServer, NetworkProfile
+
+USER = "zopkio"
+PASSWORD = "fakessh"
+
+
+class TestFakeSSH(unittest.TestCase):
+
+  def setUp(self):
+    self.local_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.local_dir, ignore_errors=True)
+
+  def test_split_host_port(self):
+    self.assertEqual(split_host_port("localhost"), ("localhost", 22))
+    self.assertEqual(split_host_port("127.0.0.1:2222"), ("127.0.0.1", 2222))
+    self.assertEqual(split_host_port("::1"), ("::1", 22))
+
+  def test_exec_and_sftp(self):
+    with FakeSSHServer("host0") as server:
+      with get_ssh_client(server.address, username=USER, password=PASSWORD) as ssh:
+        chan = better_exec_command(ssh, "mkdir -p /tmp/fake_dir && echo $FAKESSH_HOST > /tmp/fake_dir/name", "failed")
+        self.assertEqual(chan.recv_exit_status(), 0)
+        with self.assertRaises(ParamikoError):
+          better_exec_command(ssh, "ls /tmp/does_not_exist", "expected failure")
+      # paths under /tmp are private to the host
+      self.assertFalse(os.path.exists("/tmp/fake_dir/name"))
+      with open(os.path.join(server.root, "tmp/fake_dir/name")) as f:
+        self.assertEqual(f.read().strip(), "host0")
+
+      local_file = os.path.join(self.local_dir, "payload")
+      with open(local_file, "w") as f:
+        f.write("x" * 10000)
+      with get_sftp_client(server.address, username=USER, password=PASSWORD) as ftp:
+        self.assertEqual(ftp.listdir("/tmp/fake_dir"), ["name"])
+        ftp.put(local_file, "/tmp/fake_dir/payload")
+        ftp.get("/tmp/fake_dir/payload", local_file + ".copy")
+      self.assertEqual(os.path.getsize(local_file + ".copy"), 10000)
+      self.assertEqual(server.connections, 2)
+
+  def test_latency_and_handshake(self):
+    profile = NetworkProfile(latency=0.05, handshake=0.1)
+    with FakeSSHServer(profile=profile) as server:
+      start = time.time()
+      with get_ssh_client(server.address, username=USER, password=PASSWORD) as ssh:
+        connected = time.time()
+        better_exec_command(ssh, "true", "failed")
+        executed = time.time()
+    self.assertTrue(connected - start >= 0.1 + 0.05)
+    self.assertTrue(executed - connected >= 0.05)
+
+  def test_bandwidth(self):
+    local_file = os.path.join(self.local_dir, "payload")
+    with open(local_file, "w") as f:
+      f.write("x" * 50000)
+    with FakeSSHServer(profile=NetworkProfile(bandwidth=200000)) as server:
+      with get_sftp_client(server.address, username=USER, password=PASSWORD) as ftp:
+        start = time.time()
+        ftp.put(local_file, "/tmp/payload")
+        self.assertTrue(time.time() - start >= 0.25)
+
+  def test_deploy_to_cluster(self):
+    """
+    Installs on and collects logs from several simulated hosts through the machine mapping
+    """
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    deployer = SSHDeployer("sample_program", {
+        'executable': os.path.join(test_dir, "samples/trivial_program"),
+        'install_path': "/tmp/fakessh_deployer_test/",
+        'post_install_cmds': ["echo installed on $FAKESSH_HOST > install.log"]})
+    with FakeCluster(hosts=5) as cluster, cluster.installed():
+      for index, name in enumerate(cluster.names()):
+        deployer.install("unique_id{0}".format(index), {'hostname': runtime.get_machine(name)})
+      for index, name in enumerate(cluster.names()):
+        root = cluster.server(name).root
+        self.assertTrue(os.path.isfile(os.path.join(root, "tmp/fakessh_deployer_test/trivial_program")))
+        deployer.fetch_logs("unique_id{0}".format(index), ["/tmp/fakessh_deployer_test/install.log"], self.local_dir)
+        with open(os.path.join(self.local_dir, "unique_id{0}-install.log".format(index))) as f:
+          self.assertEqual(f.read().strip(), "installed on " + name)
+      self.assertEqual(cluster.commands_run(), 5 * 3)
+    self.assertFalse(os.path.exists("/tmp/fakessh_deployer_test"))
+
+if __name__ == '__main__':
+  unittest.main()
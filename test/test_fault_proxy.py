@@ -0,0 +1,226 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import errno
+import json
+import os
+import select
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import zopkio.fault_proxy as fault_proxy
+from zopkio.fault_proxy import FaultProfile, FaultProxy, FaultProxyClient, FaultSchedule
+import zopkio.runtime as runtime
+
+from .fakessh import FakeCluster
+
+
+class _EchoServer(object):
+  """
+  Echoes back whatever its clients send
+  """
+  def __init__(self):
+    self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.listener.bind(("127.0.0.1", 0))
+    self.listener.listen(16)
+    self.address = "127.0.0.1:{0}".format(self.listener.getsockname()[1])
+    thread = threading.Thread(target=self._accept)
+    thread.daemon = True
+    thread.start()
+
+  def _accept(self):
+    while True:
+      try:
+        sock, _ = self.listener.accept()
+      except socket.error:
+        return
+      thread = threading.Thread(target=self._echo, args=[sock])
+      thread.daemon = True
+      thread.start()
+
+  @staticmethod
+  def _echo(sock):
+    try:
+      while True:
+        data = sock.recv(65536)
+        if not data:
+          break
+        sock.sendall(data)
+    except socket.error:
+      pass
+    finally:
+      sock.close()
+
+  def close(self):
+    self.listener.close()
+
+
+def _round_trip(port, data="ping", timeout=5.0):
+  sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+  try:
+    start = time.time()
+    sock.sendall(data)
+    received = ""
+    while len(received) < len(data):
+      chunk = sock.recv(65536)
+      if not chunk:
+        break
+      received += chunk
+    return received, time.time() - start
+  finally:
+    sock.close()
+
+
+class TestFaultProxy(unittest.TestCase):
+
+  def setUp(self):
+    self.server = _EchoServer()
+
+  def tearDown(self):
+    self.server.close()
+
+  def test_latency_and_bandwidth(self):
+    with FaultProxy(self.server.address, listen_host="127.0.0.1") as proxy:
+      self.assertEqual(_round_trip(proxy.port)[0], "ping")
+      proxy.set_profile(FaultProfile(latency=0.1, jitter=0.02))
+      received, elapsed = _round_trip(proxy.port)
+      self.assertEqual(received, "ping")
+      self.assertTrue(0.2 <= elapsed < 0.6, elapsed)
+      proxy.set_profile(FaultProfile(bandwidth=200 * 1024))
+      received, elapsed = _round_trip(proxy.port, "x" * 50 * 1024)
+      self.assertEqual(len(received), 50 * 1024)
+      self.assertTrue(elapsed >= 0.2, elapsed)
+      deadline = time.time() + 5
+      while proxy.stats()["open"] > 0 and time.time() < deadline:
+        time.sleep(0.01)
+      connections = proxy.connections()
+      self.assertEqual(len(connections), 3)
+      self.assertEqual((connections[2]["bytes_to_server"], connections[2]["bytes_to_client"]), (51200, 51200))
+      self.assertTrue(connections[2]["throughput_to_client"] <= 200 * 1024)
+      self.assertEqual(proxy.stats()["bytes_to_server"], 51208)
+
+  def test_partition_and_reset(self):
+    with FaultProxy(self.server.address, listen_host="127.0.0.1", profile=FaultProfile(partition=True)) as proxy:
+      sock = socket.create_connection(("127.0.0.1", proxy.port), timeout=0.3)
+      sock.sendall("held")
+      self.assertRaises(socket.timeout, sock.recv, 4)
+      proxy.set_profile(None)
+      sock.settimeout(5)
+      self.assertEqual(sock.recv(4), "held")
+      self.assertEqual(proxy.reset_connections(), 1)
+      self._assert_reset(sock)
+      self.assertTrue(proxy.connections()[0]["reset"])
+      self.assertEqual(proxy.stats()["resets"], 1)
+
+      proxy.set_profile(FaultProfile(reset_probability=1.0))
+      sock = socket.create_connection(("127.0.0.1", proxy.port), timeout=5)
+      sock.sendall("reset")
+      self._assert_reset(sock)
+      self.assertEqual(proxy.connections()[1]["bytes_to_server"], 0)
+
+  def test_partition_applies_backpressure(self):
+    limit = 64 * 1024 * 1024
+    with FaultProxy(self.server.address, listen_host="127.0.0.1") as proxy:
+      sock = socket.create_connection(("127.0.0.1", proxy.port), timeout=5)
+      sock.sendall("ping")
+      self.assertEqual(sock.recv(4), "ping")
+      proxy.set_profile(FaultProfile(partition=True))
+      sock.setblocking(0)
+      sent = 0
+      # the proxy stops reading, so the sender blocks once the socket buffers are full
+      while sent < limit:
+        try:
+          sent += sock.send("x" * 65536)
+        except socket.error as e:
+          self.assertEqual(e.errno, errno.EAGAIN)
+          if len(select.select([], [sock], [], 0.5)[1]) == 0:
+            break
+      self.assertTrue(sent < limit, sent)
+      sock.close()
+      proxy.set_profile(None)
+      deadline = time.time() + 5
+      while proxy.stats()["open"] > 0 and time.time() < deadline:
+        time.sleep(0.01)
+      # closed connections are forgotten, their stats are kept
+      self.assertEqual(len(proxy._connections), 0)
+      self.assertEqual((proxy.stats()["connections"], len(proxy.connections())), (1, 1))
+
+  def _assert_reset(self, sock):
+    try:
+      self.assertEqual(sock.recv(4), "")
+    except socket.error as e:
+      self.assertEqual(e.errno, errno.ECONNRESET)
+    sock.close()
+
+  def test_control_port_and_schedule(self):
+    stats_dir = tempfile.mkdtemp()
+    stats_file = os.path.join(stats_dir, fault_proxy.STATS_FILE)
+    try:
+      with FaultProxy(self.server.address, listen_host="127.0.0.1", control_port=0, stats_file=stats_file) as proxy:
+        client = FaultProxyClient("127.0.0.1:{0}".format(proxy.control_port))
+        client.set_profile(FaultProfile(latency=0.05))
+        self.assertEqual(client.get_profile().latency, 0.05)
+        self.assertEqual(_round_trip(proxy.port)[0], "ping")
+        self.assertEqual(client.stats()["connections"], 1)
+        self.assertEqual(len(client.connections()), 1)
+        self.assertRaises(fault_proxy.FaultProxyError, client._call, "explode")
+
+        with FaultSchedule(client, [(0.1, None), (0, FaultProfile(partition=True))]) as schedule:
+          time.sleep(0.3)
+        self.assertEqual([profile is None for _, profile in schedule.applied], [False, True])
+        self.assertFalse(proxy.profile.partition)
+        self.assertEqual(proxy.profile.latency, 0)
+      with open(stats_file) as f:
+        connections = [json.loads(line) for line in f]
+      self.assertEqual(len(connections), 1)
+      self.assertEqual(connections[0]["bytes_to_client"], 4)
+    finally:
+      shutil.rmtree(stats_dir)
+
+  def test_deploy(self):
+    with FakeCluster(hosts=1) as cluster, cluster.installed():
+      host = runtime.get_machine(cluster.names()[0])
+      listen_port, control_port = [_free_port() for _ in xrange(2)]
+      client = fault_proxy.deploy("proxy", host, self.server.address, listen_port, control_port,
+                                  python=sys.executable, profile=FaultProfile(latency=0.05))
+      try:
+        received, elapsed = _round_trip(listen_port)
+        self.assertEqual(received, "ping")
+        self.assertTrue(elapsed >= 0.1)
+        self.assertEqual(client.stats()["connections"], 1)
+      finally:
+        runtime.get_deployer(fault_proxy.SERVICE_NAME).undeploy("proxy")
+      self.assertRaises(socket.error, socket.create_connection, ("127.0.0.1", control_port), 1)
+
+
+def _free_port():
+  sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  sock.bind(("127.0.0.1", 0))
+  port = sock.getsockname()[1]
+  sock.close()
+  return port
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,130 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from zopkio.configobj import Config
+from zopkio.histogram import Histogram
+import zopkio.regression as regression
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+
+from .mock import in_process_runner
+
+
+class TestHistogram(unittest.TestCase):
+
+  def test_percentiles_within_precision(self):
+    rng = random.Random(0)
+    values = [rng.expovariate(100) for _ in xrange(20000)]
+    histogram = Histogram()
+    for value in values:
+      histogram.record(value)
+    ordered = sorted(values)
+    for percentile in [50, 90, 99, 99.9]:
+      expected = ordered[int(percentile / 100.0 * len(ordered)) - 1]
+      self.assertTrue(abs(histogram.percentile(percentile) - expected) <= expected * 0.01 + 1e-6)
+    self.assertEqual(histogram.min(), ordered[0])
+    self.assertEqual(histogram.max(), ordered[-1])
+    self.assertAlmostEqual(histogram.mean(), sum(values) / len(values))
+    self.assertEqual(histogram.percentile(100), ordered[-1])
+
+  def test_fixed_memory(self):
+    histogram = Histogram()
+    buckets = len(histogram._counts)
+    for value in xrange(100000):
+      histogram.record(value * 1e-4)
+    histogram.record(10 ** 6)
+    self.assertEqual(len(histogram._counts), buckets)
+    self.assertEqual(len(histogram), 100001)
+    self.assertEqual(histogram.max(), 10 ** 6)
+
+  def test_empty(self):
+    histogram = Histogram()
+    self.assertEqual(histogram.percentile(99), None)
+    self.assertEqual(histogram.mean(), None)
+    self.assertRaises(ValueError, histogram.record, -1)
+
+  def test_merge_and_serialize(self):
+    first, second = Histogram(unit=1, highest_value=10 ** 6), Histogram(unit=1, highest_value=10 ** 6)
+    for value in xrange(1, 501):
+      first.record(value)
+    for value in xrange(501, 1001):
+      second.record(value)
+    first.merge(second)
+    self.assertEqual(len(first), 1000)
+    self.assertEqual(first.min(), 1)
+    self.assertEqual(first.max(), 1000)
+    self.assertTrue(abs(first.percentile(50) - 500) <= 5)
+    restored = Histogram.from_dict(json.loads(json.dumps(first.to_dict())))
+    self.assertEqual(restored.percentile(90), first.percentile(90))
+    self.assertEqual(restored.summary(), first.summary())
+    self.assertEqual(pickle.loads(pickle.dumps(first)).summary(), first.summary())
+    self.assertRaises(ValueError, first.merge, Histogram())
+
+  def test_concurrent_recording(self):
+    histogram = Histogram()
+
+    def record():
+      for _ in xrange(5000):
+        histogram.record(0.001)
+
+    threads = [threading.Thread(target=record) for _ in xrange(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(histogram), 20000)
+    self.assertEqual(sum(histogram._counts), 20000)
+
+  def test_corrected_recording(self):
+    histogram = Histogram()
+    histogram.record_corrected(1.0, 0.1)
+    self.assertEqual(len(histogram), 10)
+    self.assertAlmostEqual(histogram.min(), 0.1)
+
+  def test_runtime_histograms_are_saved(self):
+    output_dir = tempfile.mkdtemp()
+    old_output_dir = runtime.get_output_dir()
+    try:
+      runtime.set_output_dir(output_dir)
+      test = Test("test_histogram", lambda: None, validate=None)
+      runtime.set_active_tests([test])
+      histogram = runtime.get_histogram("test_histogram", "request_latency")
+      self.assertTrue(runtime.get_histogram("test_histogram", "request_latency") is histogram)
+      histogram.record(0.25)
+      self.assertEqual(regression.flatten_metrics(test, stats=["max"]), {"request_latency.max": 0.25})
+      in_process_runner()._save_measurements(Config("histograms", {}), [test])
+      with open(os.path.join(output_dir, "measurements", "histograms.json")) as measurements_file:
+        saved = json.load(measurements_file)
+      restored = Histogram.from_dict(saved["test_histogram"]["histograms"]["request_latency"])
+      self.assertEqual(restored.max(), 0.25)
+    finally:
+      runtime.set_output_dir(old_output_dir)
+      shutil.rmtree(output_dir)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,110 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import zopkio.constants as constants
+from zopkio.configobj import Config
+from zopkio.html_reporter import Reporter
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+
+
+class TestHtmlReporter(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    runtime.reset_collector()
+    collector = runtime.get_collector()
+    for config_index in xrange(2):
+      config = Config("config_{0}".format(config_index), {})
+      config.result = constants.PASSED
+      config.start_time = 1420070400
+      config.end_time = 1420070460
+      tests = []
+      for index in xrange(60):
+        test = Test("test_{0:03d}".format(index), lambda: None, validate=None)
+        test.start_time = test.func_start_time = 1420070400 + index
+        test.end_time = test.func_end_time = test.start_time + 1
+        test.result = constants.PASSED
+        tests.append(test)
+      collector.collect(config, tests)
+    collector.end_time = collector.start_time + 60
+
+  def tearDown(self):
+    shutil.rmtree(self.output_dir)
+    runtime.reset_collector()
+
+  def _read_report(self, report_dir):
+    pages = {}
+    for root, dirs, files in os.walk(report_dir):
+      for filename in files:
+        if filename.endswith(".html"):
+          with open(os.path.join(root, filename)) as f:
+            pages[os.path.relpath(os.path.join(root, filename), report_dir)] = f.read()
+    return pages
+
+  def test_parallel_matches_serial(self):
+    serial_dir = os.path.join(self.output_dir, "serial")
+    parallel_dir = os.path.join(self.output_dir, "parallel")
+    Reporter("report", serial_dir, self.output_dir, self.output_dir, processes=1).generate()
+    reporter = Reporter("report", parallel_dir, self.output_dir, self.output_dir, processes=2)
+    self.assertEqual(reporter._process_count(123), 2)
+    reporter.generate()
+    serial = self._read_report(serial_dir)
+    parallel = self._read_report(parallel_dir)
+    # 3 top level pages, 2 config pages and 120 test pages
+    self.assertEqual(len(serial), 125)
+    self.assertEqual(sorted(serial.keys()), sorted(parallel.keys()))
+    for page in serial:
+      self.assertEqual(serial[page].replace(serial_dir, parallel_dir), parallel[page])
+    self.assertEqual(reporter.pages_written, 125)
+
+  def test_unchanged_pages_are_not_rewritten(self):
+    report_dir = os.path.join(self.output_dir, "report")
+    Reporter("report", report_dir, self.output_dir, self.output_dir, processes=1).generate()
+    reporter = Reporter("report", report_dir, self.output_dir, self.output_dir, processes=1)
+    rendered = []
+    render_page = reporter._render_page
+    reporter._render_page = lambda page: rendered.append(page) or render_page(page)
+    reporter.generate()
+    self.assertEqual(reporter.pages_written, 0)
+    self.assertEqual(reporter.pages_skipped, 125)
+    # the config and test pages whose results did not change are not even rendered
+    self.assertEqual(sorted(rendered), [("diff",), ("logs",), ("summary",)])
+
+    test = runtime.get_collector().get_test_result("config_1", "test_007")
+    test.result = constants.FAILED
+    test.message = "failed"
+    reporter.generate()
+    # the test page, its config page, the summary and the diff between the configs changed
+    self.assertEqual(reporter.pages_written, 4)
+    with open(os.path.join(report_dir, "resources", "config_1", "test_007_report.html")) as f:
+      self.assertTrue("failed" in f.read())
+
+    os.remove(reporter.report_info.home_page)
+    reporter.generate()
+    self.assertEqual(reporter.pages_written, 1)
+    self.assertTrue(os.path.exists(reporter.report_info.home_page))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,49 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# dependencies that are slow to import and only needed once a run uses them
+HEAVY_MODULES = ["naarad", "numpy", "matplotlib", "jinja2", "paramiko", "cryptography", "dateutil", "multiprocessing"]
+
+# the time it takes is measured by the cli_import benchmark
+_PROBE = """
+import json, sys
+import zopkio.__main__
+print(json.dumps(sorted(set(name.split(".")[0] for name in sys.modules))))
+"""
+
+
+class TestImports(unittest.TestCase):
+
+  def _probe(self):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, "-c", _PROBE], cwd=root)
+    return json.loads(output.strip().splitlines()[-1])
+
+  def test_cli_startup_is_lazy(self):
+    loaded = [module for module in HEAVY_MODULES if module in self._probe()]
+    self.assertEqual(loaded, [], "imported at startup: {0}".format(loaded))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,108 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import zopkio.constants as constants
+from zopkio.configobj import Config
+from zopkio.json_reporter import read_data, Reporter
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+
+
+class TestJsonReporter(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    runtime.reset_collector()
+    collector = runtime.get_collector()
+    for config_index in xrange(2):
+      config = Config("config_{0}".format(config_index), {})
+      config.result = constants.PASSED
+      config.start_time = 1420070400
+      config.end_time = 1420070460
+      tests = []
+      for index in xrange(25):
+        test = Test("test_{0:03d}".format(index), lambda: None, validate=None, iteration=2)
+        test.start_time = test.func_start_time = 1420070400 + index
+        test.end_time = test.func_end_time = test.start_time + 1
+        test.result = constants.FAILED if index == 7 else constants.PASSED
+        test.iteration_durations.add(0.5, 1)
+        test.iteration_durations.add(0.7, 2)
+        tests.append(test)
+      collector.collect(config, tests)
+    collector.end_time = collector.start_time + 60
+
+  def tearDown(self):
+    shutil.rmtree(self.output_dir)
+    runtime.reset_collector()
+
+  def _load(self, name):
+    return read_data(os.path.join(self.output_dir, "data", name + ".js"))
+
+  def test_index_and_shards(self):
+    reporter = Reporter("report", self.output_dir, self.output_dir, self.output_dir, shard_size=20)
+    reporter.generate()
+    self.assertTrue(os.path.exists(reporter.get_report_location()))
+
+    index = self._load("index")
+    self.assertEqual(index["summary"]["tests"], 50)
+    self.assertEqual(index["summary"]["counts"]["failed"], 2)
+    self.assertEqual([config["name"] for config in index["configs"]], ["config_0", "config_1"])
+    self.assertEqual(len(index["tests"]), 50)
+    self.assertEqual(index["shards"], 3)
+
+    config_name, test_name, result, duration, shard = index["tests"][32]
+    self.assertEqual((config_name, test_name, result, duration, shard), ("config_1", "test_007", "failed", 1, 1))
+    details = self._load("shard_00001")["config_1/test_007"]
+    self.assertEqual(details["result"], "failed")
+    self.assertEqual(details["iterations"], [[1, 0.5], [2, 0.7]])
+    self.assertEqual(details["iteration_summary"]["count"], 2)
+
+    # the shards pass their data to the page
+    with open(os.path.join(self.output_dir, "data", "shard_00001.js")) as f:
+      script = f.read()
+    self.assertTrue(script.startswith("zopkioReport.shard(1,\n"))
+    self.assertTrue(script.endswith("\n);\n"))
+
+  def test_non_finite_floats_are_null(self):
+    test = runtime.get_collector().get_test_result("config_0", "test_003")
+    test.confidence = {"mean": 0.6, "half_width": float("inf"), "relative_half_width": float("nan"),
+                       "stop_reason": None}
+    Reporter("report", self.output_dir, self.output_dir, self.output_dir).generate()
+    with open(os.path.join(self.output_dir, "data", "shard_00000.js")) as f:
+      script = f.read()
+    self.assertFalse("Infinity" in script or "NaN" in script)
+    confidence = self._load("shard_00000")["config_0/test_003"]["confidence"]
+    self.assertEqual((confidence["half_width"], confidence["relative_half_width"]), (None, None))
+
+  def test_stale_shards_are_removed(self):
+    Reporter("report", self.output_dir, self.output_dir, self.output_dir, shard_size=10).generate()
+    self.assertEqual(self._load("index")["shards"], 5)
+    Reporter("report", self.output_dir, self.output_dir, self.output_dir, shard_size=30).generate()
+    self.assertEqual(self._load("index")["shards"], 2)
+    self.assertEqual(sorted(os.listdir(os.path.join(self.output_dir, "data"))),
+                     ["index.js", "shard_00000.js", "shard_00001.js"])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,95 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+import zopkio.constants as constants
+from zopkio.configobj import Config
+from zopkio.junit_reporter import Reporter
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+
+
+class TestJunitReporter(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    runtime.reset_collector()
+
+  def tearDown(self):
+    shutil.rmtree(self.output_dir)
+    runtime.reset_collector()
+
+  def _collect(self, config_name):
+    config = Config(config_name, {})
+    config.result = constants.PASSED
+    config.start_time = 1420070400
+    config.end_time = 1420070460
+    passed = Test("test_passed", lambda: None, validate=None)
+    passed.func_start_time, passed.func_end_time = 10.0, 10.5
+    passed.result = constants.PASSED
+    failed = Test("test_failed", lambda: None, validate=None)
+    failed.func_start_time, failed.func_end_time = 11.0, 11.25
+    failed.result = constants.FAILED
+    failed.exception = AssertionError("expected 1\x00")
+    failed.message = "Traceback <here>"
+    iterated = Test("test_iterated", lambda: None, validate=None, iteration=3)
+    iterated.func_start_time, iterated.func_end_time = 12.0, 13.0
+    iterated.result = constants.FAILED
+    for iteration, duration, result in [(1, 0.25, constants.PASSED), (2, 0.5, constants.FAILED)]:
+      iterated.iteration_durations.add(duration, iteration)
+      iterated.iteration_results[iteration] = result
+    runtime.get_collector().collect(config, [passed, failed, iterated])
+
+  def test_every_config_is_reported(self):
+    reporter = Reporter("report", self.output_dir, self.output_dir, self.output_dir)
+    self._collect("config_a")
+    reporter.add_config("config_a")
+    # the report is complete after each config
+    root = ElementTree.parse(reporter.get_report_location()).getroot()
+    self.assertEqual([suite.get("name") for suite in root], ["config_a_report"])
+
+    self._collect("config_b")
+    reporter.generate()
+    root = ElementTree.parse(reporter.get_report_location()).getroot()
+    self.assertEqual([suite.get("name") for suite in root], ["config_a_report", "config_b_report"])
+    suite = root[1]
+    self.assertEqual((suite.get("tests"), suite.get("failures"), suite.get("skipped")), ("6", "3", "1"))
+    self.assertEqual(suite.get("timestamp")[:4], "2015")
+
+    cases = dict((case.get("name"), case) for case in suite.findall("testcase"))
+    self.assertEqual(sorted(cases.keys()), ["test_failed", "test_iterated", "test_iterated[iteration 1]",
+                                            "test_iterated[iteration 2]", "test_iterated[iteration 3]", "test_passed"])
+    self.assertEqual(float(cases["test_passed"].get("time")), 0.5)
+    self.assertEqual(cases["test_passed"].get("classname"), "config_b")
+    failure = cases["test_failed"].find("failure")
+    self.assertEqual(failure.get("message"), u"AssertionError: expected 1\ufffd")
+    self.assertEqual(failure.text, "Traceback <here>")
+    self.assertEqual(float(cases["test_iterated[iteration 1]"].get("time")), 0.25)
+    self.assertTrue(cases["test_iterated[iteration 1]"].find("failure") is None)
+    self.assertTrue(cases["test_iterated[iteration 2]"].find("failure") is not None)
+    self.assertTrue(cases["test_iterated[iteration 3]"].find("skipped") is not None)
+    self.assertTrue("iteration durations" in cases["test_iterated"].find("system-out").text)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,78 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.latency as latency
+import zopkio.load_generator as load_generator
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+
+
+class TestLatency(unittest.TestCase):
+
+  def test_uncorrected_without_interval(self):
+    recorder = latency.LatencyRecorder()
+    recorder.record(0.01)
+    recorder.record(1.0)
+    self.assertEqual(len(recorder.raw), 2)
+    self.assertEqual(len(recorder.corrected), 2)
+    self.assertEqual(recorder.corrected.max(), 1.0)
+
+  def test_expected_interval_back_fills_stall(self):
+    recorder = latency.LatencyRecorder(expected_interval=0.01)
+    for _ in xrange(99):
+      recorder.record(0.001)
+    # a one second stall hides 99 requests the client would have sent in the meantime
+    recorder.record(1.0)
+    self.assertEqual(len(recorder.raw), 100)
+    self.assertEqual(len(recorder.corrected), 199)
+    self.assertAlmostEqual(recorder.raw.percentile(99), 0.001, places=4)
+    self.assertTrue(recorder.corrected.percentile(99) > 0.9)
+    self.assertAlmostEqual(recorder.corrected.percentile(50), 0.01, places=4)
+
+  def test_intended_schedule(self):
+    recorder = latency.LatencyRecorder()
+    recorder.record_scheduled(intended_start=10.0, actual_start=10.5, end=10.6)
+    recorder.record_scheduled(intended_start=11.0, actual_start=11.0, end=11.1)
+    self.assertAlmostEqual(recorder.raw.max(), 0.1)
+    self.assertAlmostEqual(recorder.corrected.min(), 0.1)
+    self.assertAlmostEqual(recorder.corrected.max(), 0.6)
+    summary = recorder.summary()
+    self.assertAlmostEqual(summary["corrected"]["max"], 0.6)
+    self.assertTrue("p99.99" in recorder.format_summary())
+
+  def test_runtime_recorder(self):
+    runtime.set_active_config(Config("latency", {}))
+    test = Test("test_latency", lambda: None, validate=None)
+    runtime.set_active_tests([test])
+    recorder = runtime.get_latency_recorder("test_latency", expected_interval=0.5)
+    self.assertTrue(runtime.get_latency_recorder("test_latency") is recorder)
+    with recorder.time():
+      pass
+    self.assertEqual(len(test.latency_recorders["latency"]), 1)
+    result = load_generator.run_open_loop(lambda: None, rate=100, requests=5, recorder=recorder)
+    self.assertEqual(len(recorder.corrected), 6)
+    self.assertEqual(result.successes, 5)
+    test.reset()
+    self.assertEqual(test.latency_recorders, {})
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,103 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.load_driver as load_driver
+import zopkio.load_generator as load_generator
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+
+from .fakessh import FakeCluster
+
+LOAD_MODULE = """
+import time
+
+def request():
+  time.sleep(0.001)
+
+def fail():
+  raise IOError("refused")
+"""
+
+
+class TestLoadDriver(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.module = os.path.join(self.tmp_dir, "load.py")
+    with open(self.module, "w") as f:
+      f.write(LOAD_MODULE)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def test_local_workers(self):
+    with load_driver.LoadDriver(self.module, "request", workers=3, report_interval=0.05) as driver:
+      result = driver.run(timeout=60, mode=load_generator.CLOSED_LOOP, workers=2, requests=50)
+    self.assertEqual(sorted(result.workers.keys()), [0, 1, 2])
+    self.assertEqual(result.requests, 150)
+    self.assertEqual(result.successes, 150)
+    self.assertEqual(result.recorder.raw.count, sum(worker.recorder.raw.count for worker in result.workers.values()))
+    self.assertEqual(result.recorder.raw.count, 150)
+    self.assertTrue(result.start_time <= min(worker.start_time for worker in result.workers.values()))
+    self.assertEqual(result.summary()["workers"], 3)
+
+  def test_latencies_are_merged_into_the_test(self):
+    runtime.set_active_config(Config("load_driver", {}))
+    runtime.set_active_tests([Test("test_load", None)])
+    result = load_driver.run_distributed_load(self.module, "fail", workers=2, test_name="test_load",
+                                              mode=load_generator.OPEN_LOOP, rate=200, requests=10)
+    self.assertEqual(result.errors, 20)
+    self.assertEqual(result.error_types, {"IOError": 20})
+    self.assertEqual(runtime.get_latency_recorder("test_load").raw.count, 0)
+    result = load_driver.run_distributed_load(self.module, "request", workers=2, test_name="test_load",
+                                              mode=load_generator.OPEN_LOOP, rate=200, requests=10)
+    self.assertEqual(runtime.get_latency_recorder("test_load").raw.count, 20)
+
+  def test_worker_error(self):
+    with load_driver.LoadDriver(self.module, "missing", workers=1) as driver:
+      self.assertRaises(load_driver.LoadDriverError, driver.run, 30, requests=1)
+
+  def test_remote_workers(self):
+    with FakeCluster(hosts=2) as cluster, cluster.installed():
+      hosts = [runtime.get_machine(name) for name in cluster.names()]
+      with load_driver.LoadDriver(self.module, "request", hosts=hosts, workers_per_host=2,
+                                  advertised_host="127.0.0.1", python=sys.executable) as driver:
+        driver.wait_for_workers()
+        self.assertTrue(runtime.get_deployer(driver.deployer_name) is driver.deployer)
+        # every worker is found by its own pid, not by a command line prefixing the ones of other workers
+        pids = [driver.deployer.get_pid(process.unique_id) for process in driver.deployer.get_processes()]
+        self.assertEqual([len(worker_pids) for worker_pids in pids], [1] * 4)
+        self.assertEqual(len(set(worker_pids[0] for worker_pids in pids)), 4)
+        result = driver.run(timeout=60, requests=5)
+      self.assertEqual(len(result.workers), 4)
+      self.assertEqual(result.successes, 20)
+      self.assertFalse(driver.deployer_name in runtime._deployers)
+      for name in cluster.names():
+        self.assertEqual(os.listdir(cluster.server(name).local_path(load_driver.DEFAULT_INSTALL_PATH)), [])
+
+if __name__ == '__main__':
+  unittest.main()
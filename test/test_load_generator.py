@@ -0,0 +1,112 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import random
+import threading
+import time
+import unittest
+
+import zopkio.load_generator as load_generator
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+  def test_closed_loop_request_count(self):
+    calls = []
+    lock = threading.Lock()
+
+    def request():
+      with lock:
+        calls.append(threading.current_thread().name)
+      time.sleep(0.001)
+
+    result = load_generator.run_closed_loop(request, workers=4, requests=200)
+    self.assertEqual(len(calls), 200)
+    self.assertEqual(result.requests, 200)
+    self.assertEqual(len(result.latencies), 200)
+    self.assertEqual(result.errors, 0)
+    self.assertTrue(len(set(calls)) > 1)
+
+  def test_closed_loop_duration(self):
+    result = load_generator.run_closed_loop(lambda: None, workers=2, duration=0.2)
+    self.assertTrue(result.requests > 0)
+    self.assertTrue(0.2 <= result.duration() < 1.0)
+    self.assertTrue(result.throughput() > 0)
+
+  def test_errors_are_counted(self):
+    counter = [0]
+    lock = threading.Lock()
+
+    def request():
+      with lock:
+        counter[0] += 1
+        if counter[0] % 2 == 0:
+          raise IOError("failed")
+
+    result = load_generator.run_closed_loop(request, workers=1, requests=10)
+    self.assertEqual(result.requests, 10)
+    self.assertEqual(result.errors, 5)
+    self.assertEqual(result.error_types, {"IOError": 5})
+    self.assertEqual(len(result.latencies), 5)
+    self.assertAlmostEqual(result.summary()["error_rate"], 0.5)
+
+  def test_stages_ramp_linearly(self):
+    schedule = load_generator.Schedule([load_generator.Stage(10, 100), load_generator.Stage(10, 100),
+                                        load_generator.Stage(5, 0)])
+    self.assertEqual(schedule.duration, 25)
+    self.assertAlmostEqual(schedule.target(5), 50)
+    self.assertAlmostEqual(schedule.target(15), 100)
+    self.assertAlmostEqual(schedule.target(22.5), 50)
+    self.assertEqual(schedule.target(25), None)
+    self.assertEqual(schedule.max_target(), 100)
+
+  def test_constant_arrivals(self):
+    schedule = load_generator.Schedule(target=100, duration=1)
+    offsets = list(load_generator.arrival_offsets(schedule))
+    self.assertEqual(len(offsets), 100)
+    self.assertEqual(offsets[0], 0)
+    self.assertAlmostEqual(offsets[1], 0.01)
+
+  def test_poisson_arrivals_are_reproducible(self):
+    schedule = load_generator.Schedule(target=1000, duration=5)
+    offsets = list(load_generator.arrival_offsets(schedule, load_generator.POISSON_ARRIVALS, random.Random(1)))
+    again = list(load_generator.arrival_offsets(schedule, load_generator.POISSON_ARRIVALS, random.Random(1)))
+    self.assertEqual(offsets, again)
+    self.assertTrue(4700 < len(offsets) < 5300)
+
+  def test_ramped_arrivals(self):
+    schedule = load_generator.Schedule([load_generator.Stage(2, 100)])
+    offsets = list(load_generator.arrival_offsets(schedule))
+    # the rate ramps from 0 to 100 so the average rate is 50 per second
+    self.assertTrue(95 <= len(offsets) <= 101)
+    self.assertTrue(len([offset for offset in offsets if offset < 1]) < len(offsets) / 3)
+
+  def test_open_loop(self):
+    result = load_generator.run_open_loop(lambda: None, rate=200, duration=0.25, workers=2)
+    self.assertTrue(45 <= result.requests <= 51)
+    result = load_generator.run_open_loop(lambda: None, rate=1000, requests=20, workers=2)
+    self.assertEqual(result.requests, 20)
+
+  def test_invalid_arguments(self):
+    self.assertRaises(ValueError, load_generator.LoadGenerator, lambda: None)
+    self.assertRaises(ValueError, load_generator.LoadGenerator, lambda: None, load_generator.OPEN_LOOP, duration=1)
+    self.assertRaises(ValueError, load_generator.Stage, 0, 10)
+
+if __name__ == '__main__':
+  unittest.main()
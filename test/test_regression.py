@@ -0,0 +1,119 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import zopkio.regression as regression
+from zopkio.testobj import Test
+
+
+def _make_test(latency_max, throughput=None, duration=1.0):
+  test = Test("test_perf", lambda: None, validate=None)
+  test.func_start_time = 100.0
+  test.func_end_time = 100.0 + duration
+  test.naarad_stats = {"server1-perf": {"latency": {"max": str(latency_max), "mean": "0.1"}}}
+  if throughput is not None:
+    test.naarad_stats["server1-perf"]["throughput"] = {"mean": throughput}
+  return test
+
+
+class TestRegression(unittest.TestCase):
+
+  def setUp(self):
+    self.history_dir = tempfile.mkdtemp()
+    self.history_file = os.path.join(self.history_dir, "history.json")
+
+  def tearDown(self):
+    shutil.rmtree(self.history_dir)
+
+  def _run_history(self, values, throughputs=None):
+    """
+    Records one run per value so that the values become the baseline
+    """
+    for i, value in enumerate(values):
+      history = regression.RegressionHistory(self.history_file)
+      throughput = throughputs[i] if throughputs is not None else None
+      history.record("config", "test_perf", regression.flatten_metrics(_make_test(value, throughput)))
+      history.save()
+
+  def test_median_and_mad(self):
+    self.assertEqual(regression.median([3, 1, 2]), 2)
+    self.assertEqual(regression.median([4, 1, 2, 3]), 2.5)
+    self.assertEqual(regression.median_absolute_deviation([1, 2, 3, 4, 100]), 1)
+
+  def test_flatten_metrics(self):
+    metrics = regression.flatten_metrics(_make_test(0.5), stats=["max"])
+    self.assertEqual(metrics, {"duration": 1.0, "server1-perf.latency.max": 0.5})
+
+  def test_detects_ten_percent_regression(self):
+    self._run_history([0.50, 0.51, 0.49, 0.50, 0.52])
+    detector = regression.RegressionDetector(regression.RegressionHistory(self.history_file))
+    regressions = detector.check("config", _make_test(0.56))
+    self.assertEqual([found.metric for found in regressions], ["server1-perf.latency.max"])
+    self.assertAlmostEqual(regressions[0].baseline, 0.50)
+    self.assertTrue(regressions[0].relative_change > 0.1)
+
+  def test_noise_and_improvements_are_not_flagged(self):
+    self._run_history([0.50, 0.51, 0.49, 0.50, 0.52])
+    detector = regression.RegressionDetector(regression.RegressionHistory(self.history_file))
+    self.assertEqual(detector.check("config", _make_test(0.515)), [])
+    self.assertEqual(detector.check("config", _make_test(0.30)), [])
+
+  def test_not_enough_history(self):
+    self._run_history([0.50, 0.50])
+    detector = regression.RegressionDetector(regression.RegressionHistory(self.history_file))
+    self.assertEqual(detector.check("config", _make_test(5.0)), [])
+
+  def test_throughput_drop_is_regression(self):
+    self._run_history([0.5] * 4, throughputs=[1000, 1010, 990, 1000])
+    detector = regression.RegressionDetector(regression.RegressionHistory(self.history_file))
+    regressions = detector.check("config", _make_test(0.5, throughput=850))
+    self.assertEqual([found.metric for found in regressions], ["server1-perf.throughput.mean"])
+    self.assertEqual(detector.check("config", _make_test(0.5, throughput=1200)), [])
+
+  def test_higher_is_better_matches_words(self):
+    detector = regression.RegressionDetector(regression.RegressionHistory(self.history_file))
+    self.assertTrue(detector.is_higher_better("server1-perf.throughput.mean"))
+    self.assertTrue(detector.is_higher_better("client.ops.p50"))
+    self.assertFalse(detector.is_higher_better("client.error_rate"))
+    self.assertFalse(detector.is_higher_better("network.drops.mean"))
+    self.assertFalse(detector.is_higher_better("gc.stops"))
+
+  def test_duration_uses_every_iteration(self):
+    test = _make_test(0.5)
+    for sample_id, duration in enumerate([1.0, 2.0, 3.0], 1):
+      test.iteration_durations.add(duration, sample_id)
+    metrics = regression.flatten_metrics(test, stats=["max"])
+    self.assertEqual((metrics["duration"], metrics["duration.max"]), (2.0, 3.0))
+
+  def test_history_keeps_window(self):
+    self._run_history([1, 2, 3, 4, 5])
+    history = regression.RegressionHistory(self.history_file, max_runs=3)
+    self.assertEqual(history.get_baseline("config", "test_perf", "server1-perf.latency.max", 10), [1, 2, 3, 4, 5])
+    self.assertEqual(history.get_baseline("config", "test_perf", "server1-perf.latency.max", 2), [4, 5])
+    history.record("config", "test_perf", {"server1-perf.latency.max": 6})
+    history.save()
+    history = regression.RegressionHistory(self.history_file)
+    self.assertEqual(history.get_baseline("config", "test_perf", "server1-perf.latency.max", 10), [4, 5, 6])
+
+if __name__ == '__main__':
+  unittest.main()
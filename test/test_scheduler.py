@@ -0,0 +1,150 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.constants as constants
+import zopkio.runtime as runtime
+from zopkio.scheduler import DagScheduler, parse_resource_limits
+from zopkio.test_runner import FailureHandler
+from zopkio.testobj import Test
+
+from .mock import in_process_runner
+
+
+class _Recorder(object):
+  def __init__(self, failing=()):
+    self.failing = failing
+    self.intervals = {}
+    self.running = 0
+    self.max_running = 0
+    self.skipped = []
+    self._lock = threading.Lock()
+
+  def execute(self, name):
+    with self._lock:
+      self.running += 1
+      self.max_running = max(self.max_running, self.running)
+    start = time.time()
+    time.sleep(0.05)
+    with self._lock:
+      self.running -= 1
+    self.intervals[name] = (start, time.time())
+    return name not in self.failing
+
+  def skip(self, name, dependency):
+    self.skipped.append((name, dependency))
+
+  def overlap(self, first, second):
+    return self.intervals[first][0] < self.intervals[second][1] and self.intervals[second][0] < self.intervals[first][1]
+
+
+class TestScheduler(unittest.TestCase):
+
+  def test_dependencies_and_resources(self):
+    recorder = _Recorder()
+    dag = DagScheduler(["a", "b", "c", "zk1", "zk2", "zk3"], {"b": ["a"], "zk3": ["unknown"]},
+                       {"zk1": ["zookeeper"], "zk2": ["zookeeper"], "zk3": ["zookeeper"]}, max_workers=3)
+    outcomes = dag.run(recorder.execute, recorder.skip)
+    self.assertTrue(all(outcomes.values()))
+    self.assertEqual(len(outcomes), 6)
+    self.assertTrue(recorder.intervals["b"][0] >= recorder.intervals["a"][1])
+    self.assertFalse(recorder.overlap("zk1", "zk2") or recorder.overlap("zk2", "zk3") or recorder.overlap("zk1", "zk3"))
+    self.assertEqual(recorder.max_running, 3)
+    # a starts first as b depends on it
+    self.assertEqual(min(recorder.intervals, key=lambda name: recorder.intervals[name][0]), "a")
+
+  def test_failure_skips_dependents(self):
+    recorder = _Recorder(failing=["a"])
+    dag = DagScheduler(["a", "b", "c", "d"], {"b": ["a"], "c": ["b"]}, max_workers=2)
+    outcomes = dag.run(recorder.execute, recorder.skip)
+    self.assertEqual(outcomes, {"a": False, "b": None, "c": None, "d": True})
+    self.assertEqual(sorted(recorder.skipped), [("b", "a"), ("c", "a")])
+
+  def test_ordering_ignores_failures(self):
+    recorder = _Recorder(failing=["a"])
+    dag = DagScheduler(["a", "b", "c", "d"], {"b": ["a"]}, max_workers=4, after={"c": ["b"], "d": ["c"]})
+    outcomes = dag.run(recorder.execute, recorder.skip)
+    self.assertEqual(outcomes, {"a": False, "b": None, "c": True, "d": True})
+    self.assertEqual(recorder.skipped, [("b", "a")])
+    self.assertTrue(recorder.intervals["c"][0] >= recorder.intervals["a"][1])
+    self.assertTrue(recorder.intervals["d"][0] >= recorder.intervals["c"][1])
+
+  def test_ordering_contradicting_dependencies_is_ignored(self):
+    # a depends on b, which is ordered after a as it comes later in the suite
+    recorder = _Recorder()
+    dag = DagScheduler(["a", "b", "c"], {"a": ["b"]}, max_workers=2, after={"b": ["a"], "c": ["b"]})
+    self.assertEqual((dag.after, dag.followers), ({"a": [], "b": [], "c": ["b"]}, {"a": [], "b": ["c"], "c": []}))
+    self.assertEqual(dag.run(recorder.execute, recorder.skip), {"a": True, "b": True, "c": True})
+    self.assertTrue(recorder.intervals["a"][0] >= recorder.intervals["b"][1])
+
+  def test_long_serial_suite(self):
+    names = ["test_{0}".format(index) for index in xrange(5000)]
+    dag = DagScheduler(names, {}, after=dict((name, [earlier]) for earlier, name in zip(names, names[1:])))
+    self.assertEqual(dag._priority[names[0]], (5000, 0))
+
+  def test_invalid_graphs(self):
+    self.assertRaises(ValueError, DagScheduler, ["a", "b"], {"a": ["b"], "b": ["a"]})
+    dag = DagScheduler(["a"], {}, {"a": ["disk"]}, resource_limits={"disk": 0})
+    self.assertRaises(ValueError, dag.run, lambda name: True)
+    self.assertEqual(parse_resource_limits("zookeeper:1, kafka:3"), {"zookeeper": 1, "kafka": 3})
+    self.assertEqual(parse_resource_limits({"zookeeper": "2"}), {"zookeeper": 2})
+    self.assertRaises(ValueError, parse_resource_limits, "zookeeper")
+
+  def test_runner_schedules_phases(self):
+    config = Config("scheduler", {"should_fetch_logs": False})
+    runtime.set_active_config(config)
+    runner = in_process_runner()
+    order = []
+
+    def make_test(name, passes=True, duration=0, **kwargs):
+      def function():
+        time.sleep(duration)
+        order.append(name)
+        assert passes
+      return Test(name, function, validate=None, **kwargs)
+    first = make_test("first", duration=0.1)
+    broken = make_test("broken", passes=False, phase=1)
+    independent = make_test("independent", phase=1, depends_on=[])
+    last = make_test("last", phase=2)
+    dependent = make_test("dependent", phase=2, depends_on=["broken"])
+    runner.tests = [first, [broken, independent], [last, dependent]]
+    runner._execute_scheduled_tests(config, FailureHandler(), None, 0, 4)
+    # independent does not wait for the previous phase, broken does and last runs after it although it failed
+    self.assertEqual(order, ["independent", "first", "broken", "last"])
+    self.assertEqual((first.result, broken.result, independent.result, last.result),
+                     (constants.PASSED, constants.FAILED, constants.PASSED, constants.PASSED))
+    self.assertEqual(dependent.result, constants.SKIPPED)
+    self.assertTrue("broken, which this test depends on, did not pass" in dependent.message)
+
+  def test_runner_fails_dependency_cycles(self):
+    config = Config("scheduler", {"should_fetch_logs": False})
+    runtime.set_active_config(config)
+    first = Test("first", lambda: None, validate=None, depends_on=["second"])
+    second = Test("second", lambda: None, validate=None, depends_on=["first"])
+    runner = in_process_runner(tests=[first, second])
+    runner._execute_scheduled_tests(config, FailureHandler(), None, 0, 2)
+    self.assertEqual((first.result, second.result), (constants.FAILED, constants.FAILED))
+    self.assertTrue("the dependencies of first, second form a cycle" in first.message)
+
+if __name__ == '__main__':
+  unittest.main()
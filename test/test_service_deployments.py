@@ -0,0 +1,114 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.runtime as runtime
+from zopkio.service_deployments import changed_services, get_services, order_configs
+from zopkio.test_runner import TestRunner
+from zopkio.ztests import ZTest, ZTestSuite
+
+SERVICES = [("server", ["server_heap"]), ("client", ["server_heap", "client_threads"])]
+
+
+class _PassingTest(ZTest):
+  def test(self):
+    pass
+
+
+class _ServiceSuite(ZTestSuite):
+
+  def __init__(self, config_dir):
+    self.config_dir = config_dir
+    self.calls = []
+    self.only_test = _PassingTest()
+
+  def service_config_keys(self):
+    return SERVICES
+
+  def setup_suite(self):
+    self.calls.append("setup_suite")
+
+  def teardown_suite(self):
+    self.calls.append("teardown_suite")
+
+  def setup_service(self, service):
+    self.calls.append(("setup", service, runtime.get_active_config_name()))
+
+  def teardown_service(self, service):
+    self.calls.append(("teardown", service))
+
+
+class TestServiceDeployments(unittest.TestCase):
+
+  def test_changed_services_and_order(self):
+    self.assertEqual(changed_services(SERVICES, None, {}), ["server", "client"])
+    self.assertEqual(changed_services(SERVICES, {"server_heap": 1, "client_threads": 1},
+                                      {"server_heap": 1, "client_threads": 2}), ["client"])
+    self.assertEqual(changed_services([("logger", None)], {}, {}), ["logger"])
+    configs = [Config("s1c1", {"server_heap": 1, "client_threads": 1}),
+               Config("s2c1", {"server_heap": 2, "client_threads": 1}),
+               Config("s1c2", {"server_heap": 1, "client_threads": 2})]
+    self.assertEqual([config.name for config in order_configs(configs, SERVICES)], ["s1c1", "s1c2", "s2c1"])
+    # a lazy sequence of configs such as a config matrix is iterated once
+    self.assertEqual([config.name for config in order_configs(iter(configs), SERVICES)], ["s1c1", "s1c2", "s2c1"])
+    # the next config is only picked from the window, the configs after it are not read yet
+    ordered = order_configs(iter(configs + [None]), SERVICES, window=2)
+    self.assertEqual([next(ordered).name, next(ordered).name], ["s1c1", "s1c2"])
+    self.assertEqual(get_services(object()), None)
+
+  def test_runner_reuses_deployments(self):
+    output_dir = tempfile.mkdtemp()
+    previous_output_dir = runtime.get_output_dir()
+    try:
+      runtime.set_output_dir(os.path.join(output_dir, "output"))
+      config_dir = os.path.join(output_dir, "configs")
+      for name, server_heap, client_threads in [("s1c1", 1, 1), ("s2c1", 2, 1), ("s1c2", 1, 2)]:
+        os.makedirs(os.path.join(config_dir, name))
+        with open(os.path.join(config_dir, name, "config.json"), "w") as config_file:
+          json.dump({"server_heap": server_heap, "client_threads": client_threads, "should_fetch_logs": False},
+                    config_file)
+      with open(os.path.join(config_dir, "master.json"), "w") as master_file:
+        json.dump({"no_perf": True, "junit_reporter": True, "LOGS_DIRECTORY": os.path.join(output_dir, "logs"),
+                   "OUTPUT_DIRECTORY": os.path.join(output_dir, "output")}, master_file)
+      suite = _ServiceSuite(config_dir)
+      runner = TestRunner(ztestsuite=suite)
+      runner.run()
+    finally:
+      runtime.set_output_dir(previous_output_dir)
+      runtime.reset_collector()
+      shutil.rmtree(output_dir)
+    self.assertEqual(runner.success_count(), 3)
+    self.assertEqual((suite.calls[0], suite.calls[-1]), ("setup_suite", "teardown_suite"))
+    self.assertEqual(suite.calls[-3:-1], [("teardown", "client"), ("teardown", "server")])
+    setups = [call for call in suite.calls if call[0] == "setup"]
+    # whichever config comes first, ordering the configs saves a redeploy of the server
+    self.assertEqual(len(setups), 5)
+    self.assertEqual(len([call for call in suite.calls if call[0] == "teardown"]), 5)
+    self.assertEqual(suite.calls.count("setup_suite"), 1)
+    # the services are set up for the config about to run
+    self.assertEqual([call[2] for call in setups][:2], [runner.configs[0].name] * 2)
+
+if __name__ == '__main__':
+  unittest.main()
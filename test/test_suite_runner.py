@@ -0,0 +1,170 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+import zopkio.checkpoint as checkpoint
+import zopkio.runtime as runtime
+import zopkio.suite_runner as suite_runner
+from zopkio.ztests import ZTest, ZTestSuite
+
+
+class _TimedTest(ZTest):
+
+  def __init__(self, suite):
+    self.suite = suite
+
+  def test(self):
+    start = time.time()
+    time.sleep(self.suite.sleep)
+    # suites may run in other processes, so the runs are recorded in a file
+    with open(self.suite.runs_file, "a") as runs:
+      runs.write("{0} {1} {2}\n".format(self.suite.label, start, time.time()))
+    assert not self.suite.fail
+
+
+class _Suite(ZTestSuite):
+
+  def __init__(self, config_dir, runs_file, label, hosts=None, sleep=0.0, fail=False):
+    self.config_dir = config_dir
+    self.runs_file = runs_file
+    self.label = label
+    self.hosts = hosts
+    self.sleep = sleep
+    self.fail = fail
+    self.timed_test = _TimedTest(self)
+
+
+class TestSuiteRunner(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    self.previous_output_dir = runtime.get_output_dir()
+    runtime.set_output_dir(os.path.join(self.output_dir, "output"))
+    runtime.reset_collector()
+    self.config_dir = os.path.join(self.output_dir, "configs")
+    os.makedirs(os.path.join(self.config_dir, "config_a"))
+    with open(os.path.join(self.config_dir, "config_a", "config.json"), "w") as config_file:
+      json.dump({"should_fetch_logs": False}, config_file)
+    with open(os.path.join(self.config_dir, "master.json"), "w") as master_file:
+      json.dump({"no_perf": True, "junit_reporter": True, "LOGS_DIRECTORY": os.path.join(self.output_dir, "logs"),
+                 "OUTPUT_DIRECTORY": os.path.join(self.output_dir, "output")}, master_file)
+    self.runs_file = os.path.join(self.output_dir, "runs")
+
+  def tearDown(self):
+    runtime.set_output_dir(self.previous_output_dir)
+    runtime.reset_collector()
+    shutil.rmtree(self.output_dir)
+
+  def _runs(self):
+    with open(self.runs_file) as runs:
+      return dict((label, (float(start), float(end))) for label, start, end in (line.split() for line in runs))
+
+  def _run_labels(self):
+    with open(self.runs_file) as runs:
+      return [line.split()[0] for line in runs]
+
+  def test_suite_names(self):
+    suites = [("first", _Suite(self.config_dir, self.runs_file, "a")),
+              ("second", _Suite(self.config_dir, self.runs_file, "b")),
+              ("other", ZTestSuite())]
+    self.assertEqual([name for name, _ in suite_runner.suite_names(suites)],
+                     ["_Suite_first", "_Suite_second", "ZTestSuite"])
+
+  def test_serial_suites_are_merged(self):
+    suites = [("passing", _Suite(self.config_dir, self.runs_file, "a")),
+              ("failing", _Suite(self.config_dir, self.runs_file, "b", fail=True))]
+    runner = suite_runner.SuiteRunner("testfile.py", suites)
+    runner.run()
+    self.assertEqual((runner.success_count(), runner.fail_count()), (1, 1))
+    self.assertTrue(os.path.basename(runner.results_dir).startswith("testfile_"))
+    with open(os.path.join(runner.results_dir, suite_runner.SUMMARY_FILE)) as summary_file:
+      summary = json.load(summary_file)
+    self.assertEqual([(suite["name"], suite["passed"], suite["failed"]) for suite in summary["suites"]],
+                     [("_Suite_passing", 1, 0), ("_Suite_failing", 0, 1)])
+    self.assertEqual([suite["logs_dir"] for suite in summary["suites"]],
+                     [os.path.join(self.output_dir, "logs", name) for name in ["_Suite_passing", "_Suite_failing"]])
+    self.assertNotEqual(summary["suites"][0]["results_dir"], summary["suites"][1]["results_dir"])
+    testsuites = ElementTree.parse(os.path.join(runner.results_dir, suite_runner.JUNIT_REPORT_FILE)).getroot()
+    names = sorted(testsuite.get("name") for testsuite in testsuites)
+    self.assertEqual(len(names), 2)
+    self.assertTrue(names[0].startswith("config_a__Suite_failing_"))
+    self.assertTrue(names[1].startswith("config_a__Suite_passing_"))
+    with open(os.path.join(runner.results_dir, suite_runner.SUMMARY_PAGE)) as page:
+      self.assertTrue(os.path.relpath(summary["suites"][0]["report"], runner.results_dir) in page.read())
+
+  def test_resume_interrupted_suites(self):
+    suites = [("finished", _Suite(self.config_dir, self.runs_file, "a")),
+              ("interrupted", _Suite(self.config_dir, self.runs_file, "b"))]
+    save = checkpoint.Checkpoint.save
+    saves = []
+
+    def dying_save(self):
+      # the second suite dies while checkpointing its finished test, after the one for its started config
+      if self.testfile == "_Suite_interrupted":
+        saves.append(1)
+        if len(saves) == 2:
+          raise KeyboardInterrupt()
+      save(self)
+    runner = suite_runner.SuiteRunner("testfile.py", suites)
+    checkpoint.Checkpoint.save = dying_save
+    try:
+      self.assertRaises(KeyboardInterrupt, runner.run)
+    finally:
+      checkpoint.Checkpoint.save = save
+    with open(os.path.join(runner.results_dir, suite_runner.SUMMARY_FILE)) as summary_file:
+      summary = json.load(summary_file)
+    self.assertEqual([(suite["name"], suite["end_time"] is None) for suite in summary["suites"]],
+                     [("_Suite_finished", False), ("_Suite_interrupted", True)])
+    self.assertTrue(os.path.isdir(summary["suites"][1]["results_dir"]))
+
+    runtime.reset_collector()
+    resumed = suite_runner.SuiteRunner("testfile.py", suites, resume_dir=runner.results_dir)
+    resumed.run()
+    self.assertEqual((resumed.success_count(), resumed.fail_count()), (2, 0))
+    # the finished suite is restored from its checkpoint, the interrupted one runs its test again
+    self.assertEqual(self._run_labels(), ["a", "b", "b"])
+    self.assertEqual([suite["results_dir"] for suite in resumed.summaries],
+                     [suite["results_dir"] for suite in summary["suites"]])
+
+  def test_parallel_suites_with_disjoint_hosts(self):
+    suites = [("a", _Suite(self.config_dir, self.runs_file, "a", hosts=["host1"], sleep=0.5)),
+              ("b", _Suite(self.config_dir, self.runs_file, "b", hosts=["host2"], sleep=0.5)),
+              ("c", _Suite(self.config_dir, self.runs_file, "c", hosts=["host1", "host3"], sleep=0.1)),
+              ("d", _Suite(self.config_dir, self.runs_file, "d", fail=True))]
+    runner = suite_runner.SuiteRunner("testfile.py", suites, parallel=True)
+    runner.run()
+    self.assertEqual((runner.success_count(), runner.fail_count()), (3, 1))
+    self.assertEqual([summary["name"] for summary in runner.summaries],
+                     ["_Suite_a", "_Suite_b", "_Suite_c", "_Suite_d"])
+    runs = self._runs()
+    # a and b share no host and overlap, c waits for a and d, without hosts, runs alone
+    self.assertTrue(runs["b"][0] < runs["a"][1] and runs["a"][0] < runs["b"][1])
+    self.assertTrue(runs["c"][0] >= runs["a"][1])
+    self.assertTrue(runs["d"][0] >= max(runs["a"][1], runs["b"][1], runs["c"][1]))
+
+if __name__ == '__main__':
+  unittest.main()
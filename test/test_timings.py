@@ -0,0 +1,171 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import time
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.constants as constants
+import zopkio.runtime as runtime
+from zopkio.test_runner import FailureHandler
+from zopkio.testobj import Test
+from zopkio.timings import student_t_quantile, TimingSeries
+
+from .mock import in_process_runner
+
+
+class TestTimings(unittest.TestCase):
+
+  def test_statistics(self):
+    series = TimingSeries()
+    for value in xrange(1, 101):
+      series.add(float(value))
+    self.assertEqual(len(series), 100)
+    self.assertEqual(series.min(), 1)
+    self.assertEqual(series.max(), 100)
+    self.assertAlmostEqual(series.mean(), 50.5)
+    self.assertAlmostEqual(series.percentile(50), 50.5)
+    self.assertAlmostEqual(series.percentile(99), 99.01)
+    self.assertEqual(series.percentile(100), 100)
+    self.assertEqual(series.outliers(), 0)
+    summary = series.summary()
+    self.assertEqual(summary["count"], 100)
+    self.assertAlmostEqual(summary["p90"], 90.1)
+    self.assertTrue("p99.9" in summary)
+
+  def test_empty_series(self):
+    series = TimingSeries()
+    self.assertEqual(series.percentile(50), None)
+    self.assertEqual(series.mean(), None)
+    self.assertEqual(series.histogram(), [])
+
+  def test_histogram_and_outliers(self):
+    series = TimingSeries([1.0] * 10 + [2.0] * 10 + [50.0])
+    histogram = series.histogram(bins=7)
+    self.assertEqual(len(histogram), 7)
+    self.assertEqual(sum(count for lower, upper, count in histogram), 21)
+    self.assertEqual(histogram[0][2], 20)
+    self.assertEqual(histogram[-1][2], 1)
+    self.assertEqual(series.outliers(), 1)
+
+  def test_sample_ids(self):
+    series = TimingSeries()
+    series.add(0.5, 1)
+    series.add(0.7, 3)
+    self.assertEqual(series.get(3), 0.7)
+    self.assertEqual(series.get(2), None)
+    self.assertEqual(series.items(), [(1, 0.5), (3, 0.7)])
+    series.add(0.9, 3)
+    series.add(0.2)
+    self.assertEqual(series.get(3), 0.9)
+    self.assertEqual(series.get(-1, "missing"), "missing")
+
+  def test_confidence_interval(self):
+    self.assertAlmostEqual(student_t_quantile(0.975, 1), 12.706, places=3)
+    self.assertAlmostEqual(student_t_quantile(0.975, 10), 2.228, places=3)
+    self.assertAlmostEqual(student_t_quantile(0.95, 1000), 1.646, places=3)
+    mean, half_width = TimingSeries([1.0, 2.0, 3.0, 4.0, 5.0]).confidence_interval(0.95)
+    self.assertEqual(mean, 3.0)
+    self.assertAlmostEqual(half_width, 1.963, places=3)
+    self.assertEqual(TimingSeries([1.0]).confidence_interval(), None)
+
+  def test_runner_records_every_iteration(self):
+    runtime.set_active_config(Config("timings", {"should_fetch_logs": False}))
+    test = Test("test_iterations", lambda: None, iteration=5, validate=None)
+    runner = in_process_runner()
+    for iteration in xrange(1, 6):
+      test.current_iteration = iteration
+      runner._run_and_verify_test(test)
+    self.assertEqual(len(test.iteration_durations), 5)
+    self.assertEqual([sample_id for sample_id, duration in test.iteration_durations.items()], [1, 2, 3, 4, 5])
+    test.reset()
+    self.assertEqual(len(test.iteration_durations), 0)
+
+  def test_warmup_iterations_are_excluded(self):
+    config = Config("timings", {"should_fetch_logs": False})
+    runtime.set_active_config(config)
+    runner = in_process_runner()
+
+    def function():
+      runtime.get_histogram("test_warmup", "latency").record(0.5)
+      runtime.record_iteration_metric("test_warmup", "throughput", 10.0)
+    test = Test("test_warmup", function, iteration=5, warmup_iterations=2, validate=None)
+    runtime.set_active_tests([test])
+    runner._execute_single_test(config, FailureHandler(), None, test)
+    self.assertEqual(test.result, constants.PASSED)
+    self.assertEqual([sample_id for sample_id, duration in test.warmup_durations.items()], [1, 2])
+    self.assertEqual([sample_id for sample_id, duration in test.iteration_durations.items()], [3, 4, 5])
+    self.assertEqual(len(test.histograms["latency"]), 3)
+    self.assertEqual(len(test.iteration_metrics["throughput"]), 3)
+    self.assertTrue(test.warmup_end_time > test.start_time)
+    self.assertEqual(runtime.get_active_test_start_time("test_warmup"), test.warmup_end_time)
+
+    test = Test("test_warmup", lambda: time.sleep(0.02), iteration=20, warmup_duration=0.1, validate=None)
+    runtime.set_active_tests([test])
+    runner._execute_single_test(config, FailureHandler(), None, test)
+    self.assertTrue(0 < test.last_warmup_iteration < 20)
+    self.assertEqual(len(test.iteration_durations), 20 - test.last_warmup_iteration)
+    self.assertTrue(test.warmup_end_time - test.iterations_start_time >= 0.1)
+
+  def test_warmup_iterations_are_not_validated(self):
+    config = Config("timings", {"should_fetch_logs": False})
+    runtime.set_active_config(config)
+    runner = in_process_runner()
+    calls = []
+
+    def function():
+      calls.append(1)
+      assert len(calls) > 1, "cold start"
+
+    def validate():
+      # the service only answers correctly once warmed up
+      assert len(calls) > 2
+    test = Test("test_warmup", function, iteration=4, warmup_iterations=2, validate=validate)
+    runtime.set_active_tests([test])
+    runner._execute_single_test(config, FailureHandler(), None, test)
+    self.assertEqual((test.result, test.exception, test.consecutive_failures), (constants.PASSED, None, 0))
+    self.assertEqual(sorted(test.iteration_results.items())[1:],
+                     [(1, constants.WARMUP), (2, constants.WARMUP), (3, constants.PASSED), (4, constants.PASSED)])
+
+  def test_duration_mode_with_pacing(self):
+    config = Config("timings", {"should_fetch_logs": False})
+    runtime.set_active_config(config)
+    runner = in_process_runner()
+
+    test = Test("test_soak", lambda: None, duration=0.3, pacing=0.05, validate=None)
+    runner._execute_single_test(config, FailureHandler(), None, test)
+    self.assertEqual(test.result, constants.PASSED)
+    self.assertEqual(test.current_iteration, 6)
+    self.assertEqual(test.total_number_iterations, 6)
+    self.assertEqual(len(test.iteration_durations), 6)
+    self.assertEqual(test.duration_summary["iterations"], 6)
+    self.assertTrue(0.25 <= test.duration_summary["duration"] <= 0.35)
+    self.assertAlmostEqual(test.duration_summary["throughput"], 20, delta=3)
+
+    def fail():
+      raise RuntimeError("down")
+    test = Test("test_soak_failure", fail, duration=10, validate=None)
+    started = time.time()
+    runner._execute_single_test(config, FailureHandler(), None, test)
+    self.assertTrue(time.time() - started < 1)
+    self.assertEqual(test.result, constants.FAILED)
+    self.assertEqual(test.current_iteration, 1)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,127 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from zopkio.configobj import Config
+from zopkio.deployer import Process
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+import zopkio.tracing as tracing
+
+from .mock import in_process_runner
+
+
+class _FakeDeployer(object):
+  def __init__(self):
+    self.service_name = "fake"
+    self.processes = {}
+    self.default_configs = {}
+
+  @tracing.traced_deployer_operation
+  def install(self, unique_id, configs=None):
+    self.processes[unique_id] = Process(unique_id, self.service_name, configs["hostname"], "/tmp")
+
+  @tracing.traced_deployer_operation
+  def stop(self, unique_id, configs=None):
+    raise RuntimeError("cannot stop")
+
+
+class TestTracing(unittest.TestCase):
+
+  def setUp(self):
+    self.tracer = tracing.Tracer()
+
+  def test_breakdown_self_time(self):
+    with self.tracer.span("outer", "runner"):
+      time.sleep(0.02)
+      with self.tracer.span("inner", "runner"):
+        time.sleep(0.05)
+    breakdown = dict((phase["name"], phase) for phase in self.tracer.breakdown())
+    self.assertEqual(breakdown["outer"]["count"], 1)
+    self.assertTrue(breakdown["outer"]["total"] >= 0.07)
+    self.assertTrue(0.015 <= breakdown["outer"]["self"] < 0.05)
+    self.assertTrue(breakdown["inner"]["self"] >= 0.05)
+    self.assertEqual(self.tracer.breakdown()[0]["name"], "inner")
+
+  def test_chrome_trace(self):
+    with self.tracer.span("setup_suite", "runner", config="default"):
+      pass
+    trace = json.loads(json.dumps(self.tracer.to_chrome_trace()))
+    events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    self.assertEqual(len(events), 1)
+    self.assertEqual(events[0]["name"], "setup_suite")
+    self.assertEqual(events[0]["cat"], "runner")
+    self.assertEqual(events[0]["args"], {"config": "default"})
+    self.assertTrue(any(event["ph"] == "M" for event in trace["traceEvents"]))
+
+  def test_errors_and_limits(self):
+    try:
+      with self.tracer.span("failing"):
+        raise ValueError("boom")
+    except ValueError:
+      pass
+    self.assertEqual(self.tracer.spans[0].args["error"], "ValueError")
+    self.tracer.max_spans = 1
+    with self.tracer.span("dropped"):
+      pass
+    self.assertEqual(len(self.tracer.spans), 1)
+    self.assertEqual(self.tracer.dropped, 1)
+    self.tracer.enabled = False
+    with self.tracer.span("disabled") as span:
+      self.assertEqual(span, None)
+
+  def test_deployer_operations_are_tagged(self):
+    tracer = tracing.get_tracer()
+    tracer.reset()
+    deployer = _FakeDeployer()
+    deployer.install("server1", {"hostname": "host1"})
+    self.assertRaises(RuntimeError, deployer.stop, "server1")
+    install_span, stop_span = tracer.spans
+    self.assertEqual((install_span.name, install_span.category), ("install", "deployer"))
+    self.assertEqual(install_span.args, {"service": "fake", "unique_id": "server1", "host": "host1"})
+    self.assertEqual(stop_span.args["host"], "host1")
+    self.assertEqual(stop_span.args["error"], "RuntimeError")
+    tracer.reset()
+
+  def test_runner_traces_iterations(self):
+    tracer = tracing.get_tracer()
+    tracer.reset()
+    runtime.set_active_config(Config("tracing", {"should_fetch_logs": False}))
+    test = Test("test_traced", lambda: None, validate=None)
+    test.current_iteration = 1
+    in_process_runner()._run_and_verify_test(test)
+    self.assertEqual([(span.name, span.args["test"]) for span in tracer.spans], [("test", "test_traced")])
+    output_dir = tempfile.mkdtemp()
+    try:
+      trace_file = os.path.join(output_dir, "trace.json")
+      tracer.write_chrome_trace(trace_file)
+      with open(trace_file) as trace:
+        self.assertEqual(json.load(trace)["traceEvents"][0]["args"]["iteration"], "1")
+    finally:
+      shutil.rmtree(output_dir)
+      tracer.reset()
+
+if __name__ == '__main__':
+  unittest.main()
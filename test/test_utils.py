@@ -18,6 +18,9 @@
 # under the License.
 
 import os
+import shutil
+import sys
+import tempfile
 import unittest
 
 import zopkio.utils as utils
@@ -72,5 +75,32 @@ class TestUtils(unittest.TestCase):
     self.assertEqual(len(other_mapping), 3)
     self.assertEqual(other_mapping["a"], '1')
 
+  def test_load_module_isolates_and_caches_modules(self):
+    """
+    Tests that files with the same name load as distinct modules without growing sys.path and that a module is only
+    executed again when its file changes
+    """
+    directory = tempfile.mkdtemp()
+    try:
+      paths = []
+      for name in ["first", "second"]:
+        os.mkdir(os.path.join(directory, name))
+        path = os.path.join(directory, name, "config.py")
+        with open(path, "w") as config_file:
+          config_file.write("name = {0!r}\n".format(name))
+        paths.append(path)
+      sys_path = list(sys.path)
+      first, second = [utils.load_module(path) for path in paths]
+      self.assertEqual(sys.path, sys_path)
+      self.assertEqual((first.name, second.name), ("first", "second"))
+      self.assertTrue(utils.load_module(paths[0]) is first)
+
+      with open(paths[0], "w") as config_file:
+        config_file.write("name = 'changed'\n")
+      os.utime(paths[0], (0, 0))
+      self.assertEqual(utils.load_module(paths[0]).name, "changed")
+    finally:
+      shutil.rmtree(directory)
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,81 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+import unittest
+
+from zopkio.configobj import Config
+import zopkio.constants as constants
+from zopkio.remote_host_helper import better_exec_command, get_ssh_client
+import zopkio.runtime as runtime
+from zopkio.testobj import Test
+import zopkio.watchdog as watchdog
+
+from .fakessh import FakeSSHServer
+from .mock import in_process_runner
+
+
+def _spin():
+  while True:
+    pass
+
+
+class TestWatchdog(unittest.TestCase):
+
+  def test_call_with_timeout(self):
+    self.assertEqual(watchdog.call_with_timeout(lambda: 42, 5, "answer"), 42)
+    self.assertRaises(KeyError, watchdog.call_with_timeout, lambda: {}["x"], 5, "lookup")
+    # without a timeout the function runs on the calling thread
+    self.assertEqual(watchdog.call_with_timeout(lambda: threading.current_thread(), 0, "thread"),
+                     threading.current_thread())
+    start = time.time()
+    self.assertRaises(watchdog.TimeoutExpiredError, watchdog.call_with_timeout, _spin, 0.2, "spin")
+    self.assertTrue(time.time() - start < 1.0)
+    deadline = time.time() + 5
+    while any(thread.name == "zopkio-watchdog-spin" for thread in threading.enumerate()) and time.time() < deadline:
+      time.sleep(0.01)
+    self.assertFalse(any(thread.name == "zopkio-watchdog-spin" for thread in threading.enumerate()))
+
+  def test_interrupts_remote_command(self):
+    with FakeSSHServer("host0") as server:
+      def hang():
+        with get_ssh_client(server.address, username="zopkio", password="fakessh") as ssh:
+          better_exec_command(ssh, "sleep 30", "sleep failed")
+      start = time.time()
+      self.assertRaises(watchdog.TimeoutExpiredError, watchdog.call_with_timeout, hang, 0.5, "hang")
+      self.assertTrue(time.time() - start < 1.5)
+
+  def test_runner_times_out_test(self):
+    runtime.set_active_config(Config("watchdog", {"should_fetch_logs": False, "test_timeout": 0.2}))
+    runner = in_process_runner()
+    test = Test("test_spin", _spin, validate=None)
+    test.current_iteration = 1
+    runner._run_and_verify_test(test)
+    self.assertEqual(test.result, constants.FAILED)
+    self.assertTrue(isinstance(test.exception, watchdog.TimeoutExpiredError))
+    self.assertTrue("test_spin iteration 1 timed out after 0.2 seconds" in test.message)
+    # the timeout of the test takes precedence over the config
+    test = Test("test_quick", lambda: time.sleep(0.3), validate=None, timeout=2)
+    test.current_iteration = 1
+    runner._run_and_verify_test(test)
+    self.assertEqual(test.result, constants.PASSED)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,6 +14,8 @@ class Args:
     self.password = None
     self.test_list = None
     self.nopassword = True
+    self.resume_dir = None
+    self.parallel_suites = None
 
 class TestZopkioMainRunner(unittest.TestCase):
   """
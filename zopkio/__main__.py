@@ -33,6 +33,7 @@ import sys
 
 import zopkio.constants as constants
 import zopkio.runtime as runtime
+from zopkio.suite_runner import SuiteRunner
 from zopkio.test_runner import TestRunner
 from zopkio.ztests import ZTestSuite
 import zopkio.utils as utils
@@ -96,6 +97,14 @@ def main():
                       default="ERROR")
   parser.add_argument("--nopassword", action='store_true', dest="nopassword", help="Disable password prompt")
   parser.add_argument("--user", dest="user", help="user to run the test as (defaults to current user)")
+  parser.add_argument("--resume", dest="resume_dir", metavar="RESULTS_DIR",
+      help='''resume an interrupted run from the checkpoint in its results
+              directory (OUTPUT_DIR/reports/<report name>), skipping the work it
+              finished''')
+  parser.add_argument("--parallel-suites", dest="parallel_suites", nargs="?", type=int, const=0, metavar="N",
+      help='''when the testfile has several test suites, run those whose hosts
+              are disjoint at the same time in separate processes, at most N at
+              once (no limit by default)''')
   args = parser.parse_args()
   try:
     call_main(args)
@@ -109,6 +118,9 @@ def call_main(args):
   try:
     if args.output_dir is not None:
       runtime.set_output_dir(args.output_dir)
+    elif args.resume_dir is not None:
+      # the results directory is OUTPUT_DIR/reports/<report name>
+      runtime.set_output_dir(os.path.dirname(os.path.dirname(os.path.abspath(args.resume_dir))))
   except ValueError as e:
     print str(e)
     raise
@@ -140,14 +152,19 @@ def call_main(args):
   runtime.set_user(user, password)
 
   try:
-    testmodule = utils.load_module(args.testfile)
-    ztestsuites = [getattr(testmodule, attr)
+    testmodule = utils.load_module(args.testfile, importable=True)
+    ztestsuites = [(attr, getattr(testmodule, attr))
                for attr in dir(testmodule)
                if isinstance(getattr(testmodule, attr), ZTestSuite)]
-    if len(ztestsuites) > 0: #TODO(jehrlich) intelligently handle multiple test suites
-      test_runner = TestRunner(ztestsuite=ztestsuites[0], testlist=args.test_list, config_overrides=config_overrides)
+    if len(ztestsuites) > 1:
+      test_runner = SuiteRunner(args.testfile, ztestsuites, testlist=args.test_list, config_overrides=config_overrides,
+                                resume_dir=args.resume_dir, parallel=args.parallel_suites is not None,
+                                max_parallel=args.parallel_suites or None)
+    elif len(ztestsuites) == 1:
+      test_runner = TestRunner(ztestsuite=ztestsuites[0][1], testlist=args.test_list, config_overrides=config_overrides,
+                               resume_dir=args.resume_dir)
     else:
-      test_runner = TestRunner(args.testfile, args.test_list, config_overrides)
+      test_runner = TestRunner(args.testfile, args.test_list, config_overrides, resume_dir=args.resume_dir)
   except BaseException as e:
     print("Error setting up testrunner:\n%s" % traceback.format_exc())
     raise ValueError(e.message)
@@ -0,0 +1,128 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Adaptive number of iterations: a test with a stopping rule keeps iterating until the confidence interval of the mean
+of a metric is narrow enough, instead of running a fixed number of iterations::
+
+  tests_stopping_rule = {"metric": "duration", "relative_width": 0.05, "confidence": 0.95,
+                         "min_iterations": 5, "max_iterations": 200, "time_budget": 600}
+
+The metric is either "duration", the duration of each passed iteration, or the name of a metric the test records once
+per iteration with runtime.record_iteration_metric. The test stops once at least min_iterations values were recorded
+and the half width of the interval is at most relative_width times the mean, after max_iterations iterations, or once
+it has been iterating for time_budget seconds, whichever comes first. The outcome is kept in test.confidence.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DURATION_METRIC = "duration"
+
+CONVERGED = "converged"
+MAX_ITERATIONS = "max_iterations"
+TIME_BUDGET = "time_budget"
+
+
+class StoppingRule(object):
+  """
+  Decides when a test has run enough iterations
+  """
+  def __init__(self, metric=DURATION_METRIC, relative_width=0.05, confidence=0.95, min_iterations=3,
+               max_iterations=100, time_budget=None):
+    """
+    :param metric: "duration" or the name of a metric recorded with runtime.record_iteration_metric
+    :param relative_width: the target half width of the confidence interval relative to the mean
+    :param confidence: the confidence level of the interval
+    :param min_iterations: the number of values needed before the interval is considered, at least 2
+    :param max_iterations: the maximum number of iterations per pass over the suite (see loop_all_tests)
+    :param time_budget: the maximum number of seconds to iterate for, None for no limit
+    """
+    if not 0 < confidence < 1:
+      raise ValueError("confidence must be between 0 and 1")
+    if relative_width <= 0:
+      raise ValueError("relative_width must be positive")
+    if max_iterations < 1:
+      raise ValueError("max_iterations must be at least 1")
+    self.metric = metric
+    self.relative_width = relative_width
+    self.confidence = confidence
+    self.min_iterations = max(int(min_iterations), 2)
+    self.max_iterations = int(max_iterations)
+    self.time_budget = time_budget
+
+  @staticmethod
+  def create(spec):
+    """
+    :param spec: None, a StoppingRule or a dict of the arguments of StoppingRule
+    :return: the StoppingRule or None
+    """
+    if spec is None or isinstance(spec, StoppingRule):
+      return spec
+    return StoppingRule(**spec)
+
+  def values(self, test):
+    """
+    :return: the zopkio.timings.TimingSeries of the metric of test
+    """
+    if self.metric == DURATION_METRIC:
+      return test.iteration_durations
+    return test.iteration_metrics.get(self.metric)
+
+  def evaluate(self, test, last_iteration):
+    """
+    Updates test.confidence with the current interval of the metric
+
+    :param test: the test that just ran an iteration
+    :param last_iteration: True if the test cannot run more iterations
+    :return: True if the test should stop iterating
+    """
+    values = self.values(test)
+    interval = values.confidence_interval(self.confidence) if values is not None else None
+    mean, half_width, relative = None, None, None
+    if interval is not None:
+      mean, half_width = interval
+      relative = half_width / abs(mean) if mean != 0 else (0.0 if half_width == 0 else float("inf"))
+    count = len(values) if values is not None else 0
+
+    reason = None
+    if relative is not None and count >= self.min_iterations and relative <= self.relative_width:
+      reason = CONVERGED
+    elif last_iteration:
+      reason = MAX_ITERATIONS
+    elif self.time_budget is not None and test.iterations_start_time is not None and \
+        time.time() - test.iterations_start_time >= self.time_budget:
+      reason = TIME_BUDGET
+    test.confidence = {
+        "metric": self.metric,
+        "confidence": self.confidence,
+        "count": count,
+        "iterations": test.current_iteration,
+        "mean": mean,
+        "half_width": half_width,
+        "relative_width": relative,
+        "target_relative_width": self.relative_width,
+        "converged": reason == CONVERGED,
+        "stop_reason": reason
+    }
+    if reason is not None:
+      logger.debug("{0} stopped iterating after {1} iterations: {2}, relative width {3}".format(
+          test.name, test.current_iteration, reason, relative))
+    return reason is not None
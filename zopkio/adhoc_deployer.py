@@ -31,6 +31,7 @@ from zopkio.deployer import Deployer, Process
 from zopkio.remote_host_helper import better_exec_command, DeploymentError, get_sftp_client, get_ssh_client,\
   open_remote_file, log_output, exec_with_env
 import zopkio.runtime as runtime
+from zopkio.tracing import traced_deployer_operation
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +76,7 @@ class SSHDeployer(Deployer):
     self.default_configs = {} if configs is None else configs
     Deployer.__init__(self)
 
+  @traced_deployer_operation
   def install(self, unique_id, configs=None):
     """
     Copies the executable to the remote machine under install path. Inspects the configs for the possible keys
@@ -196,6 +198,7 @@ class SSHDeployer(Deployer):
     self.processes[unique_id] = Process(unique_id, self.service_name, hostname, install_path)
     self.processes[unique_id].pid_file = pid_file
 
+  @traced_deployer_operation
   def start(self, unique_id, configs=None):
     """
     Start the service.  If `unique_id` has already been installed the deployer will start the service on that host.
@@ -261,6 +264,7 @@ class SSHDeployer(Deployer):
     if 'delay' in configs:
       time.sleep(configs['delay'])
 
+  @traced_deployer_operation
   def stop(self, unique_id, configs=None):
     """Stop the service.  If the deployer has not started a service with`unique_id` the deployer will raise an Exception
     There are two configs that will be considered:
@@ -305,6 +309,7 @@ class SSHDeployer(Deployer):
     if 'delay' in configs:
       time.sleep(configs['delay'])
 
+  @traced_deployer_operation
   def uninstall(self, unique_id, configs=None):
     """uninstall the service.  If the deployer has not started a service with
     `unique_id` this will raise a DeploymentError.  This considers one config:
@@ -339,6 +344,7 @@ class SSHDeployer(Deployer):
         log_output(better_exec_command(ssh, "rm -rf {0}".format(directory_to_remove),
                                        "Failed to remove {0}".format(directory_to_remove)))
 
+  @traced_deployer_operation
   def get_pid(self, unique_id, configs=None):
     """Gets the pid of the process with `unique_id`.  If the deployer does not know of a process
     with `unique_id` then it should return a value of constants.PROCESS_NOT_RUNNING_PID
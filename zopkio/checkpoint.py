@@ -0,0 +1,381 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Checkpoints the progress of a run so that a run whose process died can be resumed without starting over.
+
+The results of every finished config are appended to a JSON Lines file next to the checkpoint file. After every
+finished config and test the checkpoint file is rewritten with the finished units (a test or a group of parallel tests
+in one pass over the suite) and the state of the tests of the config in progress, and the processes known to the
+deployers, so that saving does not grow with the number of finished configs. The state of a test that is still
+iterating is saved at most once every checkpoint interval, so that checkpointing does not grow with the number of
+iterations either. A resumed run restores the finished configs from the checkpoint, reruns setup_suite for the
+interrupted config, skips its finished units and continues a test that was interrupted from its next iteration.
+"""
+import json
+import logging
+import os
+import pipes
+import re
+import threading
+import time
+
+import zopkio.constants as constants
+from zopkio.histogram import Histogram
+from zopkio.latency import LatencyRecorder
+from zopkio.regression import Regression
+from zopkio.remote_host_helper import better_exec_command, get_ssh_client
+import zopkio.runtime as runtime
+from zopkio.timings import TimingSeries
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.json"
+DEFAULT_INTERVAL = 30.0
+_VERSION = 2
+
+
+def _configs_path(path):
+  """
+  :return: the JSON Lines file of the finished configs of the checkpoint file at path
+  """
+  return os.path.splitext(path)[0] + "_configs.jsonl"
+
+
+class CheckpointError(ValueError):
+  """
+  Raised when a run cannot be resumed from a checkpoint
+  """
+  pass
+
+
+class RestoredException(Exception):
+  """
+  Base class of the exceptions of restored tests; the class of a restored exception has the name of the original one
+  """
+  pass
+
+_exception_classes = {}
+
+
+def _restore_exception(state):
+  if state is None:
+    return None
+  name, message = state
+  if name not in _exception_classes:
+    _exception_classes[name] = type(str(name), (RestoredException,), {})
+  return _exception_classes[name](message)
+
+
+def test_state(test):
+  """
+  :return: a json serializable dict of the results of test
+  """
+  return {
+      "result": test.result,
+      "message": test.message,
+      "exception": [type(test.exception).__name__, str(test.exception)] if test.exception is not None else None,
+      "start_time": test.start_time,
+      "end_time": test.end_time,
+      "func_start_time": test.func_start_time,
+      "func_end_time": test.func_end_time,
+      "current_iteration": test.current_iteration,
+      "total_number_iterations": test.total_number_iterations,
+      "consecutive_failures": test.consecutive_failures,
+      "iteration_results": sorted(test.iteration_results.items()),
+      "iteration_durations": test.iteration_durations.items(),
+      "iteration_metrics": dict((metric, values.items()) for metric, values in test.iteration_metrics.items()),
+      "iterations_start_time": test.iterations_start_time,
+      "confidence": test.confidence,
+      "last_warmup_iteration": test.last_warmup_iteration,
+      "warmup_end_time": test.warmup_end_time,
+      "warmup_durations": test.warmup_durations.items(),
+      "duration_summary": test.duration_summary,
+      "histograms": dict((metric, histogram.to_dict()) for metric, histogram in test.histograms.items()),
+      "latencies": dict((name, {"uncorrected": recorder.raw.to_dict(), "corrected": recorder.corrected.to_dict()})
+                        for name, recorder in test.latency_recorders.items()),
+      "regressions": [{"metric": found.metric, "value": found.value, "baseline": found.baseline,
+                       "deviation": found.deviation, "score": found.score, "baseline_runs": found.baseline_runs}
+                      for found in test.regressions]
+  }
+
+
+def restore_test(test, state):
+  """
+  Sets the results of test from a dict returned by test_state; the naarad stats and SLAs are not restored
+  """
+  for attr in ["result", "message", "start_time", "end_time", "func_start_time", "func_end_time", "current_iteration",
+               "total_number_iterations", "consecutive_failures"]:
+    setattr(test, attr, state[attr])
+  test.iterations_start_time = state.get("iterations_start_time")
+  test.confidence = state.get("confidence")
+  test.last_warmup_iteration = state.get("last_warmup_iteration", 0)
+  test.warmup_end_time = state.get("warmup_end_time")
+  test.duration_summary = state.get("duration_summary")
+  test.warmup_durations = TimingSeries()
+  for sample_id, duration in state.get("warmup_durations", []):
+    test.warmup_durations.add(duration, sample_id)
+  test.exception = _restore_exception(state["exception"])
+  test.iteration_results = dict((iteration, result) for iteration, result in state["iteration_results"])
+  test.iteration_durations = TimingSeries()
+  for sample_id, duration in state["iteration_durations"]:
+    test.iteration_durations.add(duration, sample_id)
+  test.iteration_metrics = {}
+  for metric, items in state.get("iteration_metrics", {}).items():
+    test.iteration_metrics[metric] = TimingSeries()
+    for sample_id, value in items:
+      test.iteration_metrics[metric].add(value, sample_id)
+  test.histograms = dict((metric, Histogram.from_dict(data)) for metric, data in state["histograms"].items())
+  test.latency_recorders = {}
+  for name, data in state["latencies"].items():
+    recorder = LatencyRecorder()
+    recorder.raw = Histogram.from_dict(data["uncorrected"])
+    recorder.corrected = Histogram.from_dict(data["corrected"])
+    test.latency_recorders[name] = recorder
+  test.regressions = [Regression(found["metric"], found["value"], found["baseline"], found["deviation"],
+                                 found["score"], found["baseline_runs"]) for found in state["regressions"]]
+
+
+def process_state(process):
+  """
+  :return: a json serializable dict describing a deployer.Process
+  """
+  return {
+      "unique_id": process.unique_id,
+      "servicename": process.servicename,
+      "hostname": process.hostname,
+      "install_path": process.install_path,
+      "start_command": process.start_command,
+      "args": process.args,
+      "pid_file": process.pid_file
+  }
+
+
+def _pid_pattern(keyword):
+  """
+  :return: an extended regex matching keyword that does not match itself, so that pkill does not kill the shell
+  running it
+  """
+  escape = lambda text: re.sub(r"([\\.^$*+?()\[\]{}|])", r"\\\1", text)
+  if keyword[0].isalnum():
+    return "[{0}]{1}".format(keyword[0], escape(keyword[1:]))
+  return escape(keyword)
+
+
+def cleanup_processes(processes):
+  """
+  Terminates the processes left running by an interrupted run, found by their pid file or, like
+  SSHDeployer.get_pid, by their start command
+
+  :param processes: list of dicts returned by process_state
+  """
+  for process in processes:
+    if process["hostname"] is None:
+      continue
+    if process["pid_file"] is not None:
+      command = "kill $(cat {0}) 2>/dev/null".format(pipes.quote(process["pid_file"]))
+    elif process["start_command"] is not None:
+      keyword = process["start_command"]
+      if process["args"] is not None:
+        keyword = "{0} {1}".format(keyword, " ".join(process["args"]))
+      command = "pkill -f {0}".format(pipes.quote(_pid_pattern(keyword)))
+    else:
+      continue
+    logger.info("Terminating {0} left running on {1} by the interrupted run".format(process["unique_id"],
+                                                                                 process["hostname"]))
+    try:
+      with get_ssh_client(process["hostname"], username=runtime.get_username(), password=runtime.get_password()) as ssh:
+        better_exec_command(ssh, "{0}; true".format(command), "Failed to terminate {0}".format(process["unique_id"]))
+    except Exception as e:
+      logger.warning("Unable to terminate {0} on {1}: {2}".format(process["unique_id"], process["hostname"], e))
+
+
+class Checkpoint(object):
+  """
+  The progress of a run, saved to a json file after every step
+  """
+  def __init__(self, path, testfile, interval=DEFAULT_INTERVAL):
+    """
+    :param path: the checkpoint file
+    :param testfile: the test file or test suite of the run, a checkpoint can only be resumed by the same tests
+    :param interval: the minimum number of seconds between two checkpoints of the iterations of a test
+    """
+    self.path = path
+    self.testfile = testfile
+    self.interval = interval
+    self._last_save = time.time()
+    # the finished configs, config name -> {"result", "message", "start_time", "end_time", "tests": {test name:
+    # test_state}} for the configs finished before the run was resumed and None for the ones finished since
+    self.configs = {}
+    # the config in progress: {"config": name, "units": [finished units], "tests": {test name: test_state}}
+    self.current = None
+    self.processes = []
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def load(path, testfile, interval=DEFAULT_INTERVAL):
+    """
+    :param path: the checkpoint file or the results directory containing it
+    :param testfile: the test file or test suite of the resumed run
+    :param interval: see Checkpoint
+    :raises CheckpointError: if there is no checkpoint or it was written by another test
+    """
+    if os.path.isdir(path):
+      path = os.path.join(path, CHECKPOINT_FILE)
+    if not os.path.isfile(path):
+      raise CheckpointError("No checkpoint to resume from at {0}".format(path))
+    with open(path) as checkpoint_file:
+      data = json.load(checkpoint_file)
+    if data.get("version") != _VERSION:
+      raise CheckpointError("Unsupported checkpoint version {0} in {1}".format(data.get("version"), path))
+    if data["testfile"] != testfile:
+      raise CheckpointError("{0} is a checkpoint of {1}, not of {2}".format(path, data["testfile"], testfile))
+    checkpoint = Checkpoint(path, testfile, interval)
+    checkpoint.configs = Checkpoint._load_configs(_configs_path(path))
+    checkpoint.current = data["current"]
+    checkpoint.processes = data["processes"]
+    return checkpoint
+
+  @staticmethod
+  def _load_configs(path):
+    configs = {}
+    if not os.path.isfile(path):
+      return configs
+    with open(path) as configs_file:
+      for line in configs_file:
+        try:
+          state = json.loads(line)
+        except ValueError:
+          # the run died while appending this config, it is rerun
+          logger.warning("Ignoring a truncated config in {0}".format(path))
+          continue
+        configs[state.pop("config")] = state
+    return configs
+
+  def save(self):
+    """
+    Atomically rewrites the checkpoint file so that a crash while saving leaves the previous checkpoint intact
+    """
+    with self._lock:
+      data = {
+          "version": _VERSION,
+          "testfile": self.testfile,
+          "current": self.current,
+          "processes": self.processes
+      }
+      tmp_path = self.path + ".tmp"
+      with open(tmp_path, "w") as checkpoint_file:
+        json.dump(data, checkpoint_file)
+      os.rename(tmp_path, self.path)
+      self._last_save = time.time()
+
+  def is_config_finished(self, config_name):
+    return config_name in self.configs
+
+  def restore_config(self, config, tests):
+    """
+    Sets the results of a finished config and of its tests from the checkpoint
+    """
+    state = self.configs[config.name]
+    config.result = state["result"]
+    config.message = state["message"]
+    config.start_time = state["start_time"]
+    config.end_time = state["end_time"]
+    for test in tests:
+      if test.name in state["tests"]:
+        restore_test(test, state["tests"][test.name])
+      elif config.result != constants.SKIPPED:
+        logger.warning("{0} is not in the checkpoint of {1}".format(test.name, config.name))
+
+  def config_started(self, config, tests):
+    """
+    Starts recording the progress of config, unless config is the one the checkpoint was interrupted in, in which case
+    the state of its tests is restored
+
+    :return: True if config resumes an interrupted config
+    """
+    if self.current is not None and self.current["config"] == config.name:
+      for test in tests:
+        if test.name in self.current["tests"]:
+          restore_test(test, self.current["tests"][test.name])
+      return True
+    self.current = {"config": config.name, "units": [], "tests": {}}
+    self._record_processes()
+    self.save()
+    return False
+
+  def is_unit_finished(self, unit):
+    return self.current is not None and unit in self.current["units"]
+
+  def iteration_finished(self, test):
+    """
+    Records the state of test after one of its iterations if the last checkpoint is older than the interval, may be
+    called concurrently for parallel tests
+
+    :return: True if the checkpoint was saved
+    """
+    if self.current is None or time.time() - self._last_save < self.interval:
+      return False
+    state = test_state(test)
+    with self._lock:
+      self.current["tests"][test.name] = state
+    self.save()
+    return True
+
+  def unit_finished(self, unit, tests):
+    """
+    Records that unit, running tests, finished together with the processes currently deployed; may be called
+    concurrently for tests run by zopkio.scheduler
+    """
+    states = [(test.name, test_state(test)) for test in tests]
+    with self._lock:
+      self.current["tests"].update(states)
+      self.current["units"].append(unit)
+      self._record_processes()
+    self.save()
+
+  def _record_processes(self):
+    self.processes = [process_state(process) for deployer in runtime.get_deployers()
+                      for process in deployer.get_processes()]
+
+  def cleanup_processes(self):
+    """
+    Terminates the processes that were deployed when the checkpointed run was interrupted
+    """
+    cleanup_processes(self.processes)
+    self.processes = []
+
+  def config_finished(self, config, tests):
+    """
+    Records the results of a finished config, its deployed processes have been cleaned up by teardown_suite
+    """
+    state = {
+        "config": config.name,
+        "result": config.result,
+        "message": config.message,
+        "start_time": config.start_time,
+        "end_time": config.end_time,
+        "tests": dict((test.name, test_state(test)) for test in tests) if config.result != constants.SKIPPED else {}
+    }
+    with open(_configs_path(self.path), "a") as configs_file:
+      configs_file.write(json.dumps(state) + "\n")
+    self.configs[config.name] = None
+    self.current = None
+    self.processes = []
+    self.save()
@@ -0,0 +1,146 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Expands a parameter matrix declared in the master config into configs, so that sweeping parameters does not require a
+config directory per combination::
+
+  "config_matrix": {
+    "product": {"client_threads": [1, 4, 16], "payload_bytes": [64, 4096]},
+    "zip": {"server_heap": ["1g", "4g"], "server_gc": ["parallel", "g1"]},
+    "exclude": [{"client_threads": 16, "payload_bytes": 64}]
+  }
+
+Each key of `product` is an axis of the cartesian product; the lists of a `zip` group (or of each group when `zip` is a
+list of dicts) are advanced together and form a single axis. Combinations matching every key of one of the `exclude`
+mappings are dropped, as are those for which the optional `filter` callable (in a python master config) returns
+False. Every combination is applied on top of every config loaded from the config directory, with the config
+overrides still taking precedence.
+
+The configs are built one at a time while they are iterated. Each is named after its base config (or `name`, "matrix"
+by default, when the directory has no config subdirectories) and a hash of its parameters, so a combination keeps its
+name, and with it its checkpoint and regression baseline, across runs. Combinations resulting in the same mapping as
+an earlier one are run only once.
+"""
+import hashlib
+import itertools
+import json
+import logging
+
+from zopkio.configobj import Config
+
+logger = logging.getLogger(__name__)
+
+MATRIX_KEY = "config_matrix"
+DEFAULT_MATRIX_NAME = "matrix"
+_HASH_LENGTH = 10
+
+
+def _stable_repr(value):
+  """
+  Serializes values json does not support without the memory addresses of their default repr
+  """
+  if hasattr(value, "__module__") and hasattr(value, "__name__"):
+    return "{0}.{1}".format(value.__module__, value.__name__)
+  return repr(value)
+
+
+def digest(mapping):
+  """
+  :return: a hash of the mapping that is stable across runs
+  """
+  return hashlib.md5(json.dumps(mapping, sort_keys=True, default=_stable_repr)).hexdigest()
+
+
+def _axes(spec):
+  """
+  :return: list of axes, each a list of the partial mappings it contributes to a combination
+  """
+  axes = []
+  for key, values in sorted(spec.get("product", {}).items()):
+    if len(values) == 0:
+      raise ValueError("axis {0} of {1} has no values".format(key, MATRIX_KEY))
+    axes.append([{key: value} for value in values])
+  groups = spec.get("zip", [])
+  if isinstance(groups, dict):
+    groups = [groups]
+  for group in groups:
+    lengths = set(len(values) for values in group.values())
+    if len(lengths) != 1 or 0 in lengths:
+      raise ValueError("the zipped axes {0} of {1} must have the same, non zero, number of values".format(
+          sorted(group.keys()), MATRIX_KEY))
+    keys = sorted(group.keys())
+    axes.append([dict(zip(keys, values)) for values in zip(*[group[key] for key in keys])])
+  return axes
+
+
+class ConfigMatrix(object):
+  """
+  Iterable of the configs of a parameter matrix applied to base configs; see the module documentation
+  """
+  def __init__(self, spec, base_configs, overrides=None, name=None):
+    """
+    :param spec: the config_matrix mapping of the master config
+    :param base_configs: list of configobj.Config the combinations are applied to
+    :param overrides: mapping of the command line overrides, applied after the combination
+    :param name: the prefix of the names of the configs, the name of the base config by default
+    """
+    unknown = set(spec.keys()) - set(["product", "zip", "exclude", "filter", "name"])
+    if len(unknown) > 0:
+      raise ValueError("unknown keys in {0}: {1}".format(MATRIX_KEY, ", ".join(sorted(unknown))))
+    self.axes = _axes(spec)
+    self.exclude = spec.get("exclude", [])
+    self.filter = spec.get("filter")
+    self.base_configs = base_configs
+    self.overrides = overrides or {}
+    self.name = name
+
+  def combinations(self):
+    """
+    Generates the parameter mappings of the matrix that are not filtered out
+    """
+    for point in itertools.product(*self.axes):
+      parameters = {}
+      for values in point:
+        parameters.update(values)
+      if any(all(key in parameters and parameters[key] == value for key, value in excluded.items())
+             for excluded in self.exclude):
+        continue
+      if self.filter is not None and not self.filter(parameters):
+        continue
+      yield parameters
+
+  def __iter__(self):
+    seen = set()
+    for base_config in self.base_configs:
+      prefix = self.name or base_config.name
+      for parameters in self.combinations():
+        mapping = base_config.mapping.copy()
+        mapping.update(parameters)
+        mapping.update(self.overrides)
+        mapping_digest = digest(mapping)
+        if mapping_digest in seen:
+          logger.debug("Skipping the combination {0} of {1} which duplicates an earlier config".format(
+              parameters, prefix))
+          continue
+        seen.add(mapping_digest)
+        yield Config("{0}_{1}".format(prefix, digest([base_config.name, parameters])[:_HASH_LENGTH]), mapping)
+
+  def __len__(self):
+    return sum(1 for _ in self)
@@ -28,6 +28,8 @@ WEB_RESOURCE_DIR = os.path.join(PROJECT_ROOT_DIR, "web_resources/")
 PASSED = "passed"
 FAILED = "failed"
 SKIPPED = "skipped"
+# the result of a warmup iteration, which is neither validated nor counted as a failure
+WARMUP = "warmup"
 
 PROCESS_NOT_RUNNING_PID = None
 
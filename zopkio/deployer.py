@@ -28,6 +28,7 @@ import time
 import zopkio.constants as constants
 from zopkio.remote_host_helper import better_exec_command, get_sftp_client, get_ssh_client, copy_dir
 import zopkio.runtime as runtime
+from zopkio.tracing import traced_deployer_operation
 
 logger = logging.getLogger(__name__)
 
@@ -233,6 +234,7 @@ class Deployer(object):
     """deprecated name for fetch_logs"""
     self.fetch_logs(unique_id, logs, directory, pattern)
 
+  @traced_deployer_operation
   def fetch_logs(self, unique_id, logs, directory, pattern=constants.FILTER_NAME_ALLOW_NONE):
     """ Copies logs from the remote host that the process is running on to the provided directory
 
@@ -27,4 +27,8 @@ SETUP_SUITE_FAILED = 'setup_suite() failed. See below for the trace.\n'
 TEARDOWN_SUITE_FAILED = 'teardown_suite() failed. See below for the trace.\n'
 
 SETUP_FAILED = 'setup() failed. See below for the trace.\n'
+DEPENDENCY_FAILED = 'Test skipped. {0}, which this test depends on, did not pass.\n'
+DEPENDENCY_CYCLE = 'The tests could not be scheduled: {0}.\n'
 TEARDOWN_FAILED = 'teardown() failed. See below for the trace.\n'
+
+PERFORMANCE_REGRESSION = 'Performance regression detected against the baseline of earlier runs:\n'
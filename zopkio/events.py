@@ -0,0 +1,207 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+A stream of events describing the progress of a run, written while it is going so that dashboards and alerting can
+follow a long run instead of waiting for the report.
+
+Every event is a json object on its own line (JSON Lines) with the event type, the time, a sequence number and fields
+specific to the event. Events are appended to a file and, optionally, sent to the clients connected to a unix domain
+socket; a client receives the events emitted after it connected and can read the file for the earlier ones. Every
+client is sent its events by a thread of its own, a client that falls behind is disconnected.
+"""
+import json
+import logging
+import os
+import Queue
+import socket
+import threading
+import time
+
+import zopkio.utils as utils
+
+logger = logging.getLogger(__name__)
+
+# a client that does not read its events within this many seconds, or lets this many events queue up, is disconnected
+_SEND_TIMEOUT = 1.0
+_MAX_QUEUED_EVENTS = 1000
+
+
+class _Subscriber(object):
+  """
+  A client of the socket with the queue of the events still to be sent to it
+  """
+  def __init__(self, client):
+    self.client = client
+    self.dropped = False
+    self._queue = Queue.Queue(_MAX_QUEUED_EVENTS)
+    thread = threading.Thread(target=self._send, name="zopkio-events-subscriber")
+    thread.daemon = True
+    thread.start()
+
+  def offer(self, line):
+    """
+    :return: False if the client has too many events queued up to take another one
+    """
+    try:
+      self._queue.put_nowait(line)
+      return True
+    except Queue.Full:
+      return False
+
+  def close(self):
+    """
+    Disconnects the client once the queued events are sent, or right away if it is not keeping up
+    """
+    try:
+      self._queue.put_nowait(None)
+    except Queue.Full:
+      try:
+        # wakes up a blocked sendall, closing alone does not
+        self.client.shutdown(socket.SHUT_RDWR)
+      except socket.error:
+        pass
+
+  def _send(self):
+    while True:
+      line = self._queue.get()
+      if line is None:
+        break
+      try:
+        self.client.sendall(line)
+      except (socket.error, socket.timeout) as e:
+        logger.debug("dropping event subscriber: {0}".format(e))
+        self.dropped = True
+        break
+    self.client.close()
+
+
+class EventStream(object):
+  """
+  Writes events to a JSON Lines file and to the subscribers of a unix domain socket
+  """
+  def __init__(self):
+    self.enabled = False
+    self.path = None
+    self.socket_path = None
+    self._file = None
+    self._server = None
+    self._subscribers = []
+    self._sequence = 0
+    self._lock = threading.Lock()
+
+  def open(self, path, socket_path=None):
+    """
+    Starts writing events
+
+    :param path: the JSON Lines file events are appended to
+    :param socket_path: if given, the path of a unix domain socket clients can connect to in order to receive events
+    """
+    self.close()
+    utils.makedirs(os.path.dirname(os.path.abspath(path)))
+    self.path = path
+    self._sequence = 0
+    self._file = open(path, "a")
+    if socket_path is not None:
+      self._listen(socket_path)
+    self.enabled = True
+
+  def _listen(self, socket_path):
+    if os.path.exists(socket_path):
+      os.remove(socket_path)
+    self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self._server.bind(socket_path)
+    self._server.listen(16)
+    self.socket_path = socket_path
+    thread = threading.Thread(target=self._accept, args=[self._server], name="zopkio-events")
+    thread.daemon = True
+    thread.start()
+
+  def _accept(self, server):
+    while True:
+      try:
+        client, _ = server.accept()
+      except socket.error:
+        # the server socket was closed
+        return
+      client.settimeout(_SEND_TIMEOUT)
+      with self._lock:
+        self._subscribers.append(_Subscriber(client))
+
+  def emit(self, event, **fields):
+    """
+    :param event: the type of the event, e.g. test_started
+    :param fields: json serializable details of the event, other values are written as strings
+    """
+    if not self.enabled:
+      return
+    with self._lock:
+      if self._file is None:
+        return
+      self._sequence += 1
+      record = dict(fields)
+      record.update({"event": event, "time": time.time(), "seq": self._sequence})
+      line = json.dumps(record, sort_keys=True, default=str) + "\n"
+      self._file.write(line)
+      self._file.flush()
+      for subscriber in list(self._subscribers):
+        if subscriber.dropped or not subscriber.offer(line):
+          logger.debug("dropping event subscriber which is not keeping up")
+          self._subscribers.remove(subscriber)
+          subscriber.close()
+
+  def close(self):
+    """
+    Stops writing events, closing the file and disconnecting the subscribers
+    """
+    with self._lock:
+      self.enabled = False
+      if self._file is not None:
+        self._file.close()
+        self._file = None
+      if self._server is not None:
+        try:
+          # wakes up the accepting thread, closing alone does not on linux
+          self._server.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+          pass
+        self._server.close()
+        self._server = None
+        if os.path.exists(self.socket_path):
+          os.remove(self.socket_path)
+      for subscriber in self._subscribers:
+        subscriber.close()
+      self._subscribers = []
+
+
+_stream = EventStream()
+
+
+def get_event_stream():
+  """
+  :return: the EventStream of the current run
+  """
+  return _stream
+
+
+def emit(event, **fields):
+  """
+  Emits an event on the stream of the current run, does nothing unless the stream is open
+  """
+  _stream.emit(event, **fields)
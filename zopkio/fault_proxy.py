@@ -0,0 +1,650 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+A userspace TCP proxy that injects network faults between clients and a service, for hosts where tc and iptables are
+not available.
+
+A FaultProxy listens on a port and forwards every connection to a target host and port. Its FaultProfile adds latency
+and jitter, caps the bandwidth, stalls or resets connections at random and partitions the client from the service;
+the profile can be changed at any time, also from another host through the control port::
+
+  proxy = fault_proxy.deploy("kafka_proxy", "broker1", target="localhost:9092", listen_port=19092, control_port=19093)
+  proxy.set_profile(fault_proxy.FaultProfile(latency=0.05, jitter=0.01, bandwidth=1024 * 1024))
+  ...
+  with fault_proxy.FaultSchedule(proxy, [(10, fault_proxy.FaultProfile(partition=True)), (20, None)]):
+    run_load()
+  print(proxy.connections())
+
+The proxy records the bytes forwarded in each direction and the throughput of every connection; when it runs as a
+process (python -m zopkio.fault_proxy) the connections are also appended to a stats file as they close.
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import pipes
+import random
+import select
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from zopkio.load_worker import Channel
+import zopkio.runtime as runtime
+import zopkio.utils as utils
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "zopkio_fault_proxy"
+DEFAULT_INSTALL_PATH = "/tmp/zopkio_fault_proxy"
+STATS_FILE = "connections.jsonl"
+
+TO_SERVER = "to_server"
+TO_CLIENT = "to_client"
+
+_CHUNK_SIZE = 16 * 1024
+# chunks read but not yet written per direction of a connection; once full, or while partitioned, the proxy stops
+# reading so that the sender is slowed down by tcp flow control instead of the proxy buffering without bound
+_MAX_BUFFERED_CHUNKS = 64
+# the stats of the most recently closed connections kept by FaultProxy.connections
+_MAX_CLOSED_STATS = 1000
+# granularity of waits for partitions to heal and for closed connections
+_POLL_INTERVAL = 0.05
+_CONNECT_TIMEOUT = 30.0
+
+
+class FaultProfile(object):
+  """
+  The faults applied to the data forwarded in each direction of every connection
+  """
+  def __init__(self, latency=0.0, jitter=0.0, bandwidth=None, stall_probability=0.0, stall_duration=0.0,
+               reset_probability=0.0, partition=False):
+    """
+    :param latency: seconds added to the delivery of the data, in each direction
+    :param jitter: up to this many more seconds, drawn uniformly for every chunk of data; data is never reordered
+    :param bandwidth: bytes per second in each direction of a connection, None means unlimited
+    :param stall_probability: probability that forwarding a chunk stalls the direction for stall_duration seconds
+    :param stall_duration: seconds a stall lasts
+    :param reset_probability: probability that forwarding a chunk resets the connection instead
+    :param partition: hold all data and new connections until the partition heals
+    """
+    if latency < 0 or jitter < 0 or stall_duration < 0:
+      raise ValueError("latency, jitter and stall_duration must not be negative")
+    if bandwidth is not None and bandwidth <= 0:
+      raise ValueError("bandwidth must be positive")
+    for probability in (stall_probability, reset_probability):
+      if not 0 <= probability <= 1:
+        raise ValueError("probabilities must be between 0 and 1")
+    self.latency = latency
+    self.jitter = jitter
+    self.bandwidth = bandwidth
+    self.stall_probability = stall_probability
+    self.stall_duration = stall_duration
+    self.reset_probability = reset_probability
+    self.partition = partition
+
+  def to_dict(self):
+    return dict(self.__dict__)
+
+  @staticmethod
+  def from_dict(data):
+    return FaultProfile(**(data or {}))
+
+  def __repr__(self):
+    return "FaultProfile({0})".format(", ".join("{0}={1!r}".format(key, value)
+                                                for key, value in sorted(self.__dict__.items())))
+
+
+class _Connection(object):
+  """
+  A proxied connection; each direction is read by one thread and written by another so that delayed data is
+  delivered without holding up the data read after it
+  """
+  def __init__(self, proxy, connection_id, client, client_address):
+    self.proxy = proxy
+    self.id = connection_id
+    self.client = client
+    self.client_address = client_address
+    self.server = None
+    self.start_time = time.time()
+    self.end_time = None
+    self.bytes = {TO_SERVER: 0, TO_CLIENT: 0}
+    self.was_reset = False
+    self._closed = threading.Event()
+    self._lock = threading.Lock()
+    self._open_directions = 2
+
+  def run(self):
+    # like packets into a partition, the connection attempt is held until the partition heals
+    while self.proxy.profile.partition and not self._closed.is_set():
+      time.sleep(_POLL_INTERVAL)
+    try:
+      self.server = socket.create_connection(self.proxy.target, timeout=_CONNECT_TIMEOUT)
+      self.server.settimeout(None)
+    except socket.error as e:
+      logger.warning("connection {0}: cannot connect to {1}:{2}: {3}".format(self.id, self.proxy.target[0],
+                                                                              self.proxy.target[1], e))
+      self.reset()
+      return
+    for source, destination, direction in [(self.client, self.server, TO_SERVER),
+                                           (self.server, self.client, TO_CLIENT)]:
+      queue = collections.deque()
+      condition = threading.Condition()
+      reader = threading.Thread(target=self._read, args=[source, direction, queue, condition],
+                                name="zopkio-fault-proxy-{0}-{1}-reader".format(self.id, direction))
+      writer = threading.Thread(target=self._write, args=[destination, direction, queue, condition],
+                                name="zopkio-fault-proxy-{0}-{1}-writer".format(self.id, direction))
+      for thread in (reader, writer):
+        thread.daemon = True
+        thread.start()
+
+  def _read(self, source, direction, queue, condition):
+    rng = random.Random()
+    link_free = 0.0
+    last_due = 0.0
+    while not self._closed.is_set():
+      with condition:
+        while not self._closed.is_set() and (self.proxy.profile.partition or len(queue) >= _MAX_BUFFERED_CHUNKS):
+          condition.wait(_POLL_INTERVAL)
+      if self._closed.is_set():
+        break
+      try:
+        readable, _, _ = select.select([source], [], [], _POLL_INTERVAL)
+        if len(readable) == 0:
+          continue
+        data = source.recv(_CHUNK_SIZE)
+      except (socket.error, select.error, ValueError):
+        data = ""
+      if self._closed.is_set():
+        break
+      profile = self.proxy.profile
+      if len(data) > 0:
+        if profile.reset_probability > 0 and rng.random() < profile.reset_probability:
+          self.reset()
+          break
+        if profile.stall_probability > 0 and rng.random() < profile.stall_probability:
+          self._closed.wait(profile.stall_duration)
+        now = time.time()
+        if profile.bandwidth is not None:
+          link_free = max(link_free, now) + float(len(data)) / profile.bandwidth
+        # data is due once it crossed the link and the latency passed, and never before the data read earlier
+        due = max(link_free, now) + profile.latency + (rng.uniform(0, profile.jitter) if profile.jitter > 0 else 0)
+        last_due = max(last_due, due)
+      with condition:
+        queue.append((last_due, data))
+        condition.notify_all()
+      if len(data) == 0:
+        break
+      if profile.bandwidth is not None and link_free > time.time():
+        # reading no faster than the link lets the sender feel the cap through tcp flow control
+        self._closed.wait(link_free - time.time())
+
+  def _write(self, destination, direction, queue, condition):
+    while True:
+      with condition:
+        while len(queue) == 0 and not self._closed.is_set():
+          condition.wait(_POLL_INTERVAL)
+        if self._closed.is_set():
+          return
+        due, data = queue.popleft()
+        # the reader may be waiting for room in the queue
+        condition.notify_all()
+      while not self._closed.is_set() and (self.proxy.profile.partition or due > time.time()):
+        self._closed.wait(_POLL_INTERVAL if self.proxy.profile.partition else due - time.time())
+      if self._closed.is_set():
+        return
+      try:
+        if len(data) == 0:
+          destination.shutdown(socket.SHUT_WR)
+          break
+        destination.sendall(data)
+      except socket.error:
+        self.close()
+        return
+      with self._lock:
+        self.bytes[direction] += len(data)
+    with self._lock:
+      self._open_directions -= 1
+      finished = self._open_directions == 0
+    if finished:
+      self.close()
+
+  def reset(self):
+    """
+    Closes both sides of the connection with a reset
+    """
+    self.was_reset = True
+    for sock in (self.client, self.server):
+      if sock is not None:
+        try:
+          sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except socket.error:
+          pass
+    self.close()
+
+  def close(self):
+    with self._lock:
+      if self._closed.is_set():
+        return
+      self._closed.set()
+      self.end_time = time.time()
+    for sock in (self.client, self.server):
+      if sock is not None:
+        sock.close()
+    self.proxy._connection_closed(self)
+
+  def is_closed(self):
+    return self._closed.is_set()
+
+  def stats(self):
+    """
+    :return: dict of the bytes forwarded in each direction and the throughput in bytes per second of the connection
+    """
+    with self._lock:
+      end_time = self.end_time or time.time()
+      duration = end_time - self.start_time
+      stats = {
+          "id": self.id,
+          "client": "{0}:{1}".format(*self.client_address[:2]),
+          "start_time": self.start_time,
+          "end_time": self.end_time,
+          "duration": duration,
+          "reset": self.was_reset
+      }
+      for direction, count in self.bytes.items():
+        stats["bytes_" + direction] = count
+        stats["throughput_" + direction] = count / duration if duration > 0 else 0.0
+    return stats
+
+
+class FaultProxy(object):
+  """
+  Forwards the connections made to a local port to a target, applying the current FaultProfile
+  """
+  def __init__(self, target, listen_port=0, listen_host="0.0.0.0", profile=None, control_port=None,
+               stats_file=None):
+    """
+    :param target: host:port or (host, port) of the service
+    :param listen_port: the port clients connect to, any free port by default
+    :param listen_host: the address to listen on
+    :param profile: the initial FaultProfile, no faults by default
+    :param control_port: if given, the proxy accepts FaultProxyClient commands on this port
+    :param stats_file: if given, the stats of every connection are appended to this file as json when it closes
+    """
+    if isinstance(target, basestring):
+      host, _, port = target.rpartition(":")
+      target = (host, int(port))
+    self.target = target
+    self.listen_port = listen_port
+    self.listen_host = listen_host
+    self.profile = profile or FaultProfile()
+    self.control_port = control_port
+    self.stats_file = stats_file
+    self._listener = None
+    self._control_listener = None
+    # connection id -> the open connections
+    self._connections = {}
+    # the stats of the recently closed connections and the totals of all of them
+    self._closed_stats = collections.deque(maxlen=_MAX_CLOSED_STATS)
+    self._closed_totals = {"connections": 0, "resets": 0, "bytes_" + TO_SERVER: 0, "bytes_" + TO_CLIENT: 0}
+    self._next_id = 0
+    self._lock = threading.Lock()
+    self._stopped = threading.Event()
+
+  @property
+  def port(self):
+    return self._listener.getsockname()[1]
+
+  def start(self):
+    self._listener = self._listen(self.listen_port)
+    self._start_thread(self._accept, "zopkio-fault-proxy-acceptor")
+    if self.control_port is not None:
+      self._control_listener = self._listen(self.control_port)
+      self.control_port = self._control_listener.getsockname()[1]
+      self._start_thread(self._accept_control, "zopkio-fault-proxy-control")
+    logger.info("Proxying port {0} to {1}:{2}".format(self.port, self.target[0], self.target[1]))
+    return self
+
+  def _listen(self, port):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((self.listen_host, port))
+    listener.listen(128)
+    return listener
+
+  @staticmethod
+  def _start_thread(target, name, args=()):
+    thread = threading.Thread(target=target, name=name, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+  def _accept(self):
+    while not self._stopped.is_set():
+      try:
+        client, address = self._listener.accept()
+      except socket.error:
+        return
+      with self._lock:
+        connection = _Connection(self, self._next_id, client, address)
+        self._next_id += 1
+        self._connections[connection.id] = connection
+      self._start_thread(connection.run, "zopkio-fault-proxy-{0}".format(connection.id))
+
+  def _connection_closed(self, connection):
+    stats = connection.stats()
+    with self._lock:
+      self._connections.pop(connection.id, None)
+      self._closed_stats.append(stats)
+      self._closed_totals["connections"] += 1
+      self._closed_totals["resets"] += 1 if stats["reset"] else 0
+      for direction in (TO_SERVER, TO_CLIENT):
+        self._closed_totals["bytes_" + direction] += stats["bytes_" + direction]
+      if self.stats_file is not None:
+        with open(self.stats_file, "a") as stats_file:
+          stats_file.write(json.dumps(stats) + "\n")
+
+  def set_profile(self, profile):
+    """
+    Changes the faults, applies to the data read from now on
+    :param profile: FaultProfile, None to remove every fault
+    """
+    self.profile = profile or FaultProfile()
+    logger.info("Fault profile of the proxy of port {0}: {1}".format(self.port, self.profile))
+
+  def get_profile(self):
+    return self.profile
+
+  def reset_connections(self):
+    """
+    Resets every open connection
+    :return: the number of connections reset
+    """
+    with self._lock:
+      connections = [connection for connection in self._connections.values() if not connection.is_closed()]
+    for connection in connections:
+      connection.reset()
+    return len(connections)
+
+  def connections(self):
+    """
+    :return: list of the stats (see _Connection.stats) of the open connections and of the last closed ones, the stats
+             file has those of every closed connection
+    """
+    with self._lock:
+      connections = self._connections.values()
+      closed_stats = list(self._closed_stats)
+    return sorted(closed_stats + [connection.stats() for connection in connections], key=lambda stats: stats["id"])
+
+  def stats(self):
+    """
+    :return: dict of the totals of every connection
+    """
+    with self._lock:
+      connections = self._connections.values()
+      stats = dict(self._closed_totals)
+    # a connection closing now is not in the totals taken above
+    stats["open"] = 0
+    for connection in [connection.stats() for connection in connections]:
+      stats["connections"] += 1
+      stats["open"] += 1 if connection["end_time"] is None else 0
+      stats["resets"] += 1 if connection["reset"] else 0
+      for direction in (TO_SERVER, TO_CLIENT):
+        stats["bytes_" + direction] += connection["bytes_" + direction]
+    return stats
+
+  def _accept_control(self):
+    while not self._stopped.is_set():
+      try:
+        sock, _ = self._control_listener.accept()
+      except socket.error:
+        return
+      self._start_thread(self._serve_control, "zopkio-fault-proxy-control-client", [Channel(sock)])
+
+  def _serve_control(self, channel):
+    try:
+      while True:
+        message = channel.receive()
+        if message is None:
+          return
+        try:
+          channel.send(dict(self._control(message), ok=True))
+        except Exception as e:
+          channel.send({"ok": False, "error": "{0}: {1}".format(type(e).__name__, e)})
+    except (socket.error, ValueError) as e:
+      logger.debug("control connection lost: {0}".format(e))
+    finally:
+      channel.close()
+
+  def _control(self, message):
+    command = message.get("command")
+    if command == "set_profile":
+      self.set_profile(FaultProfile.from_dict(message.get("profile")))
+      return {}
+    elif command == "get_profile":
+      return {"profile": self.profile.to_dict()}
+    elif command == "reset_connections":
+      return {"reset": self.reset_connections()}
+    elif command == "connections":
+      return {"connections": self.connections()}
+    elif command == "stats":
+      return {"stats": self.stats()}
+    raise ValueError("unknown command {0}".format(command))
+
+  def stop(self):
+    """
+    Stops accepting connections and closes the open ones
+    """
+    self._stopped.set()
+    for listener in (self._listener, self._control_listener):
+      if listener is not None:
+        listener.close()
+    with self._lock:
+      connections = self._connections.values()
+    for connection in connections:
+      connection.close()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+
+class FaultProxyError(RuntimeError):
+  """
+  Raised when a proxy rejects a command
+  """
+  pass
+
+
+class FaultProxyClient(object):
+  """
+  Controls a FaultProxy through its control port, e.g. one deployed on another host
+  """
+  def __init__(self, address, timeout=_CONNECT_TIMEOUT):
+    """
+    :param address: host:port of the control port of the proxy
+    :param timeout: seconds to keep trying to connect, the proxy may still be starting
+    """
+    self.address = address
+    self.timeout = timeout
+
+  def _call(self, command, **fields):
+    host, _, port = self.address.rpartition(":")
+    deadline = time.time() + self.timeout
+    while True:
+      try:
+        sock = socket.create_connection((host, int(port)), timeout=self.timeout)
+        break
+      except socket.error:
+        if time.time() >= deadline:
+          raise
+        time.sleep(0.1)
+    channel = Channel(sock)
+    try:
+      channel.send(dict(fields, command=command))
+      response = channel.receive()
+    finally:
+      channel.close()
+    if response is None:
+      raise FaultProxyError("the proxy at {0} closed the connection".format(self.address))
+    if not response.pop("ok"):
+      raise FaultProxyError(response["error"])
+    return response
+
+  def set_profile(self, profile):
+    self._call("set_profile", profile=profile.to_dict() if profile is not None else None)
+
+  def get_profile(self):
+    return FaultProfile.from_dict(self._call("get_profile")["profile"])
+
+  def reset_connections(self):
+    return self._call("reset_connections")["reset"]
+
+  def connections(self):
+    return self._call("connections")["connections"]
+
+  def stats(self):
+    return self._call("stats")["stats"]
+
+
+class FaultSchedule(object):
+  """
+  Changes the profile of a proxy over time, e.g. to partition the service for a while during a load
+  """
+  def __init__(self, proxy, steps):
+    """
+    :param proxy: FaultProxy or FaultProxyClient
+    :param steps: list of (seconds since the start of the schedule, FaultProfile or None to remove the faults)
+    """
+    self.proxy = proxy
+    self.steps = sorted(steps, key=lambda step: step[0])
+    self.applied = []
+    self._stopped = threading.Event()
+    self._thread = None
+
+  def start(self):
+    self._thread = threading.Thread(target=self._run, name="zopkio-fault-schedule")
+    self._thread.daemon = True
+    self._thread.start()
+    return self
+
+  def _run(self):
+    start = time.time()
+    for offset, profile in self.steps:
+      if self._stopped.wait(max(start + offset - time.time(), 0)):
+        return
+      try:
+        self.proxy.set_profile(profile)
+        self.applied.append((time.time() - start, profile))
+      except Exception as e:
+        logger.error("Failed to change the fault profile to {0}: {1}".format(profile, e))
+
+  def stop(self):
+    """
+    Stops applying the steps, the current profile is left in place
+    """
+    self._stopped.set()
+    if self._thread is not None:
+      self._thread.join()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+
+def deploy(unique_id, hostname, target, listen_port, control_port, install_path=DEFAULT_INSTALL_PATH,
+           python="python", profile=None):
+  """
+  Deploys a proxy to a host with an SSHDeployer registered with the runtime as SERVICE_NAME, so that the runner
+  cleans it up like any other process. The proxy runs from install_path/unique_id, where its log, fault_proxy.log,
+  and its stats file, connections.jsonl, can be fetched from; stop it with
+  runtime.get_deployer(SERVICE_NAME).undeploy(unique_id).
+
+  :param unique_id: the unique id of the proxy process
+  :param hostname: the host to run the proxy on
+  :param target: host:port of the service, as seen from the proxy host
+  :param listen_port: the port the clients of the service should connect to
+  :param control_port: the port the proxy is controlled on
+  :param install_path: the directory of the host the proxies are installed in
+  :param python: the python interpreter of the host
+  :param profile: the initial FaultProfile
+  :return: FaultProxyClient controlling the proxy
+  """
+  from zopkio.adhoc_deployer import SSHDeployer
+  try:
+    deployer = runtime.get_deployer(SERVICE_NAME)
+  except KeyError:
+    deployer = SSHDeployer(SERVICE_NAME, {"extract": True})
+    runtime.set_deployer(SERVICE_NAME, deployer)
+  args = ["--target", target, "--listen-port", str(listen_port), "--control-port", str(control_port),
+          "--stats-file", STATS_FILE]
+  tmp_dir = tempfile.mkdtemp()
+  try:
+    process_path = "{0}/{1}".format(install_path, unique_id)
+    deployer.start(unique_id, {
+        "hostname": hostname,
+        "executable": utils.build_zopkio_package(os.path.join(tmp_dir, "zopkio_fault_proxy.tar")),
+        "install_path": process_path,
+        "start_command": "nohup {0} -m zopkio.fault_proxy {1} > fault_proxy.log 2>&1 & echo $! > fault_proxy.pid"
+                         .format(pipes.quote(python), " ".join(pipes.quote(arg) for arg in args)),
+        # the proxy is backgrounded by the start command, which is not its command line, so it is found by its pid file
+        "pid_file": "{0}/fault_proxy.pid".format(process_path)
+    })
+  finally:
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+  # the host may be an ssh address with a port
+  client = FaultProxyClient("{0}:{1}".format(hostname.split(":")[0], control_port))
+  client.set_profile(profile)
+  return client
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Zopkio fault injecting TCP proxy")
+  parser.add_argument("--target", required=True, help="host:port of the service")
+  parser.add_argument("--listen-port", required=True, type=int, dest="listen_port")
+  parser.add_argument("--listen-host", default="0.0.0.0", dest="listen_host")
+  parser.add_argument("--control-port", type=int, dest="control_port")
+  parser.add_argument("--stats-file", dest="stats_file", help="file the stats of every connection are appended to")
+  parser.add_argument("--profile", help="the initial fault profile as json")
+  args = parser.parse_args(argv)
+  logging.basicConfig(level=logging.INFO)
+  profile = FaultProfile.from_dict(json.loads(args.profile)) if args.profile else None
+  proxy = FaultProxy(args.target, args.listen_port, args.listen_host, profile, args.control_port, args.stats_file)
+  proxy.start()
+  try:
+    while True:
+      time.sleep(1)
+  except KeyboardInterrupt:
+    pass
+  finally:
+    proxy.stop()
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,264 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+A fixed memory histogram with logarithmic buckets in the style of HdrHistogram.
+
+Values are converted to integer ticks of `unit` (a microsecond by default) and counted in buckets whose width
+doubles every power of two while keeping `significant_digits` decimal digits of precision, so recording any number of
+samples uses the same memory and no allocation. Histograms with the same layout can be merged, which is how samples
+recorded by parallel threads, processes or hosts are combined, and serialized to a json friendly dict.
+"""
+from array import array
+import math
+import threading
+
+DEFAULT_PERCENTILES = [50, 90, 95, 99, 99.9]
+
+
+class Histogram(object):
+  """
+  Thread safe log bucketed histogram
+  """
+  def __init__(self, unit=1e-6, highest_value=3600.0, significant_digits=2):
+    """
+    :param unit: the smallest distinguishable value, values are rounded to a multiple of it
+    :param highest_value: the highest value tracked with full precision, larger values are counted in the last bucket
+    :param significant_digits: the number of decimal digits of precision kept for every value, between 1 and 5
+    """
+    if unit <= 0:
+      raise ValueError("unit must be positive")
+    if not 1 <= significant_digits <= 5:
+      raise ValueError("significant_digits must be between 1 and 5")
+    if highest_value < 2 * unit:
+      raise ValueError("highest_value must be at least twice the unit")
+    self.unit = unit
+    self.highest_value = highest_value
+    self.significant_digits = significant_digits
+
+    largest_single_unit_resolution = 2 * 10 ** significant_digits
+    self._sub_bucket_count_magnitude = int(math.ceil(math.log(largest_single_unit_resolution, 2)))
+    self._sub_bucket_half_count_magnitude = self._sub_bucket_count_magnitude - 1
+    self._sub_bucket_count = 1 << self._sub_bucket_count_magnitude
+    self._sub_bucket_half_count = self._sub_bucket_count >> 1
+    self._sub_bucket_mask = self._sub_bucket_count - 1
+    self._highest_tick = int(math.ceil(highest_value / unit))
+    bucket_count = 1
+    smallest_untrackable = self._sub_bucket_count
+    while smallest_untrackable <= self._highest_tick:
+      smallest_untrackable <<= 1
+      bucket_count += 1
+    self._counts = array('l', [0]) * ((bucket_count + 1) * self._sub_bucket_half_count)
+
+    self._lock = threading.Lock()
+    self.count = 0
+    self.total = 0.0
+    self._total_squares = 0.0
+    self._min = None
+    self._max = None
+
+  def _layout(self):
+    return (self.unit, self.highest_value, self.significant_digits)
+
+  def _index(self, tick):
+    tick = min(tick, self._highest_tick)
+    bucket_index = (tick | self._sub_bucket_mask).bit_length() - self._sub_bucket_count_magnitude
+    sub_bucket_index = tick >> bucket_index
+    return ((bucket_index + 1) << self._sub_bucket_half_count_magnitude) + sub_bucket_index - self._sub_bucket_half_count
+
+  def _highest_equivalent_tick(self, index):
+    """
+    :return: the largest tick counted at index
+    """
+    bucket_index = (index >> self._sub_bucket_half_count_magnitude) - 1
+    sub_bucket_index = (index & (self._sub_bucket_half_count - 1)) + self._sub_bucket_half_count
+    if bucket_index < 0:
+      sub_bucket_index -= self._sub_bucket_half_count
+      bucket_index = 0
+    return ((sub_bucket_index + 1) << bucket_index) - 1
+
+  def record(self, value, count=1):
+    """
+    Records value count times
+
+    :param value: a non negative number in the same unit as unit, e.g. seconds
+    :param count: the number of occurrences of value
+    """
+    if value < 0:
+      raise ValueError("cannot record negative value {0}".format(value))
+    index = self._index(int(round(value / self.unit)))
+    with self._lock:
+      self._counts[index] += count
+      self.count += count
+      self.total += value * count
+      self._total_squares += value * value * count
+      if self._min is None or value < self._min:
+        self._min = value
+      if self._max is None or value > self._max:
+        self._max = value
+
+  def record_corrected(self, value, expected_interval):
+    """
+    Records value and, if it exceeds expected_interval, the samples a client sending one request every
+    expected_interval missed while waiting, as HdrHistogram's recordValueWithExpectedInterval does
+
+    :param value: the measured value
+    :param expected_interval: the interval at which values were expected, None or 0 disables the correction
+    """
+    self.record(value)
+    if not expected_interval or expected_interval <= 0:
+      return
+    # counted up front so that floating point drift does not drop or add a sample
+    missed = int(math.floor(value / expected_interval + 1e-9)) - 1
+    for index in xrange(1, missed + 1):
+      self.record(value - index * expected_interval)
+
+  def merge(self, other):
+    """
+    Adds the samples of other to this histogram
+
+    :param other: a Histogram with the same unit, highest value and significant digits
+    """
+    if other._layout() != self._layout():
+      raise ValueError("cannot merge histograms with different layouts {0} and {1}".format(self._layout(),
+                                                                                          other._layout()))
+    with other._lock:
+      counts = array('l', other._counts)
+      count, total, total_squares, low, high = other.count, other.total, other._total_squares, other._min, other._max
+    with self._lock:
+      for index, value in enumerate(counts):
+        if value:
+          self._counts[index] += value
+      self.count += count
+      self.total += total
+      self._total_squares += total_squares
+      if low is not None and (self._min is None or low < self._min):
+        self._min = low
+      if high is not None and (self._max is None or high > self._max):
+        self._max = high
+    return self
+
+  def reset(self):
+    with self._lock:
+      for index in xrange(len(self._counts)):
+        self._counts[index] = 0
+      self.count = 0
+      self.total = 0.0
+      self._total_squares = 0.0
+      self._min = None
+      self._max = None
+
+  def __len__(self):
+    return self.count
+
+  def min(self):
+    return self._min
+
+  def max(self):
+    return self._max
+
+  def mean(self):
+    if self.count == 0:
+      return None
+    return self.total / self.count
+
+  def stddev(self):
+    """
+    :return: the sample standard deviation, 0 for a single sample
+    """
+    if self.count < 2:
+      return 0.0 if self.count == 1 else None
+    variance = (self._total_squares - self.total * self.total / self.count) / (self.count - 1)
+    return math.sqrt(max(variance, 0.0))
+
+  def percentile(self, percentile):
+    """
+    :param percentile: a number between 0 and 100
+    :return: the highest value equivalent to the sample at percentile, within the precision of the histogram and
+             never above the maximum recorded value
+    """
+    if self.count == 0:
+      return None
+    if percentile <= 0:
+      return self._min
+    # rounded first so that e.g. 99.9% of 20000 is rank 19980 rather than 19981
+    rank = max(int(math.ceil(round(percentile * self.count / 100.0, 9))), 1)
+    seen = 0
+    for index, value in enumerate(self._counts):
+      seen += value
+      if seen >= rank:
+        return min(self._highest_equivalent_tick(index) * self.unit, self._max)
+    return self._max
+
+  def percentiles(self, percentiles=None):
+    """
+    :return: list of (percentile, value) for each of percentiles, defaults to DEFAULT_PERCENTILES
+    """
+    percentiles = DEFAULT_PERCENTILES if percentiles is None else percentiles
+    return [(percentile, self.percentile(percentile)) for percentile in percentiles]
+
+  def summary(self):
+    """
+    :return: dict with the count, min, max, mean, stddev and the DEFAULT_PERCENTILES as p50, p90, ...
+    """
+    summary = {
+        "count": self.count,
+        "min": self.min(),
+        "max": self.max(),
+        "mean": self.mean(),
+        "stddev": self.stddev()
+    }
+    for percentile, value in self.percentiles():
+      summary["p{0:g}".format(percentile)] = value
+    return summary
+
+  def to_dict(self):
+    """
+    :return: a json serializable dict from which from_dict recreates the histogram; only non empty buckets are stored
+    """
+    with self._lock:
+      return {
+          "unit": self.unit,
+          "highest_value": self.highest_value,
+          "significant_digits": self.significant_digits,
+          "count": self.count,
+          "total": self.total,
+          "total_squares": self._total_squares,
+          "min": self._min,
+          "max": self._max,
+          "counts": [[index, value] for index, value in enumerate(self._counts) if value]
+      }
+
+  @staticmethod
+  def from_dict(data):
+    histogram = Histogram(data["unit"], data["highest_value"], data["significant_digits"])
+    for index, value in data["counts"]:
+      histogram._counts[index] = value
+    histogram.count = data["count"]
+    histogram.total = data["total"]
+    histogram._total_squares = data["total_squares"]
+    histogram._min = data["min"]
+    histogram._max = data["max"]
+    return histogram
+
+  def __getstate__(self):
+    return self.to_dict()
+
+  def __setstate__(self, state):
+    self.__dict__.update(Histogram.from_dict(state).__dict__)
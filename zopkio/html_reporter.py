@@ -19,14 +19,39 @@
 
 """
 Class used to generate the report.
+
+Pages are rendered by a pool of threads when there are many of them. A config or test page is only rendered and
+rewritten when the results it is rendered from changed since the last time the report was generated, so regenerating
+the report during a run is cheap.
 """
+import hashlib
+import json
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import os
 from jinja2 import Environment, FileSystemLoader
 
+from zopkio.checkpoint import test_state
 import zopkio.constants as constants
+import zopkio.latency as latency
 import zopkio.runtime as runtime
+import zopkio.tracing as tracing
 import zopkio.utils as utils
 
+logger = logging.getLogger(__name__)
+
+# below this many pages per thread the cost of starting the pool outweighs rendering in parallel
+_MIN_PAGES_PER_THREAD = 50
+_PAGE_HASHES_FILE = "page_hashes.json"
+_TEMPLATES = ["config_page.html", "diff.html", "footer.html", "header.html", "landing_page.html", "logs_page.html",
+              "test_page.html", "topbar.html"]
+
+
+def _config_state(config):
+  return [config.name, config.mapping, config.result, config.message, config.naarad_id, config.start_time,
+          config.end_time]
+
 
 class _ReportInfo(object):
   """
@@ -45,7 +70,9 @@ class _ReportInfo(object):
     self.home_page = os.path.join(output_dir, "report.html")
     self.diff_page = os.path.join(output_dir, "diff.html")
     self.log_page = os.path.join(output_dir, "log.html")
+    self.page_hashes_file = os.path.join(self.resource_dir, _PAGE_HASHES_FILE)
     self.project_url = "https://github.com/linkedin/Zopkio"
+    self.latency_percentiles = latency.REPORT_PERCENTILES
 
     self.results_map = {
         "passed": constants.PASSED,
@@ -58,17 +85,25 @@ class Reporter(object):
   """
   Class that converts the aggregated output into a user-friendly web page.
   """
-  def __init__(self, report_name, output_dir, logs_dir, naarad_dir):
+  def __init__(self, report_name, output_dir, logs_dir, naarad_dir, processes=None):
     """
     :param report_name: used in the title of the front-end
     :param output_dir: directory where the report will be generated
     :param logs_dir: directory of where the logs will be collected
     :param naarad_dir: directory containing the naarad reports
+    :param processes: the maximum number of threads rendering pages, defaults to the number of cpus
     """
     self.name = report_name
     self.env = Environment(loader=FileSystemLoader(constants.WEB_RESOURCE_DIR))  # used to load html pages for Jinja2
     self.data_source = runtime.get_collector()
     self.report_info = _ReportInfo(output_dir, logs_dir, naarad_dir)
+    self.processes = processes
+    self._templates = {}
+    self._fragments = {}
+    self._templates_digest = None
+    self._page_hashes = {}
+    self.pages_written = 0
+    self.pages_skipped = 0
 
   def get_config_to_test_names_map(self):
     config_to_test_names_map = {}
@@ -87,39 +122,146 @@ class Reporter(object):
     Generates the report
     """
     self._setup()
-
-    header_html = self._generate_header()
-    footer_html = self._generate_footer()
-    results_topbar_html = self._generate_topbar("results")
-    summary_topbar_html = self._generate_topbar("summary")
-    logs_topbar_html = self._generate_topbar("logs")
-    diff_topbar_html = self._generate_topbar("diff")
-
-    summary_body_html = self._generate_summary_body()
-    diff_body_html = self._generate_diff_body()
-    summary_html = header_html + summary_topbar_html + summary_body_html + footer_html
-    diff_html = header_html + diff_topbar_html + diff_body_html+ footer_html
-    Reporter._make_file(summary_html, self.report_info.home_page)
-    Reporter._make_file(diff_html,self.report_info.diff_page)
-
-    log_body_html = self._generate_log_body()
-    log_html = header_html + logs_topbar_html + log_body_html+footer_html
-    Reporter._make_file(log_html, self.report_info.log_page)
-
+    pages = [("summary",), ("diff",), ("logs",)]
     for config_name in self.report_info.config_to_test_names_map.keys():
-      config_dir = os.path.join(self.report_info.resource_dir, config_name)
-      utils.makedirs(config_dir)
+      utils.makedirs(os.path.join(self.report_info.resource_dir, config_name))
+      pages.append(("config", config_name))
+      for test_name in self.data_source.get_test_names(config_name):
+        pages.append(("test", config_name, test_name))
+
+    # templates and shared fragments are prepared once, before the pages are rendered concurrently
+    for name in _TEMPLATES:
+      self._get_template(name)
+    self._fragments = {
+        "header": self._generate_header(),
+        "footer": self._generate_footer(),
+        "results": self._generate_topbar("results"),
+        "summary": self._generate_topbar("summary"),
+        "logs": self._generate_topbar("logs"),
+        "diff": self._generate_topbar("diff")
+    }
+    # a page rendered from unchanged results by other templates is different
+    sources = [self.env.loader.get_source(self.env, name)[0] for name in _TEMPLATES]
+    self._templates_digest = hashlib.md5(json.dumps([sources, sorted(self._fragments.items())])).hexdigest()
+    results = self._write_pages(pages)
+
+    self.pages_written = 0
+    self.pages_skipped = 0
+    for location, digest, written in results:
+      self._page_hashes[location] = digest
+      if written:
+        self.pages_written += 1
+      else:
+        self.pages_skipped += 1
+    with open(self.report_info.page_hashes_file, "w") as f:
+      json.dump(self._page_hashes, f)
+    logger.debug("report: {0} pages written, {1} unchanged".format(self.pages_written, self.pages_skipped))
+
+  def _process_count(self, page_count):
+    processes = self.processes
+    if processes is None:
+      try:
+        processes = multiprocessing.cpu_count()
+      except NotImplementedError:
+        processes = 1
+    return max(1, min(processes, page_count // _MIN_PAGES_PER_THREAD))
+
+  def _write_pages(self, pages):
+    """
+    Renders and writes pages, in a pool of threads when there are enough of them; threads rather than processes as the
+    runner has threads of its own, e.g. the watchdog and the event stream, which forking does not carry over
 
-      config_body_html = self._generate_config_body(config_name)
-      config_html = header_html + results_topbar_html + config_body_html + footer_html
-      config_file = os.path.join(config_dir, config_name + self.report_info.report_file_sfx)
-      Reporter._make_file(config_html, config_file)
+    :return: list of (location, hash, whether the file was written)
+    """
+    threads = self._process_count(len(pages))
+    if threads == 1:
+      return [self._write_page(page) for page in pages]
+    pool = ThreadPool(threads)
+    try:
+      return pool.map(self._write_page, pages, chunksize=max(1, len(pages) // (threads * 4)))
+    finally:
+      pool.close()
+      pool.join()
+
+  def _write_page(self, page):
+    """
+    Renders a page and writes it, unless a config or test page is rendered from the same results as when it was
+    written or another page has the same content as its file
 
-      for test_name in self.data_source.get_test_names(config_name):
-        test_body_html = self._generate_test_body(config_name, test_name)
-        test_html = header_html + results_topbar_html + test_body_html + footer_html
-        test_file = os.path.join(config_dir, test_name + self.report_info.report_file_sfx)
-        Reporter._make_file(test_html, test_file)
+    :param page: tuple of the kind of page followed by its config and test names
+    :return: (location, hash of the inputs of a config or test page or of the content of another page, whether the
+             file was written)
+    """
+    location = self._page_location(page)
+    digest = self._inputs_digest(page)
+    if digest is not None and self._page_hashes.get(location) == digest and os.path.exists(location):
+      return location, digest, False
+    html = self._render_page(page)
+    if isinstance(html, unicode):
+      html = html.encode("utf-8")
+    if digest is None:
+      digest = hashlib.md5(html).hexdigest()
+      if self._page_hashes.get(location) == digest and os.path.exists(location):
+        return location, digest, False
+    Reporter._make_file(html, location)
+    return location, digest, True
+
+  def _inputs_digest(self, page):
+    """
+    :return: the hash of the results a config or test page is rendered from, None for the summary, diff and logs pages
+    """
+    kind = page[0]
+    if kind == "config":
+      tests = sorted(self.data_source.get_test_results(page[1]), key=lambda test: test.name)
+      inputs = [_config_state(self.data_source.get_config_result(page[1])),
+                [(test.name, test.description, test.result) for test in tests]]
+    elif kind == "test":
+      test = self.data_source.get_test_result(page[1], page[2])
+      inputs = [_config_state(self.data_source.get_config_result(page[1])), test.name, test_state(test),
+                test.naarad_id, test.naarad_stats,
+                [getattr(sla, "__dict__", repr(sla)) for sla in test.sla_objs or []]]
+    else:
+      return None
+    return hashlib.md5(json.dumps([self._templates_digest, list(page), inputs], sort_keys=True,
+                                  default=repr)).hexdigest()
+
+  def _page_location(self, page):
+    kind = page[0]
+    if kind == "summary":
+      return self.report_info.home_page
+    elif kind == "diff":
+      return self.report_info.diff_page
+    elif kind == "logs":
+      return self.report_info.log_page
+    elif kind == "config":
+      return os.path.join(self.report_info.resource_dir, page[1], page[1] + self.report_info.report_file_sfx)
+    return os.path.join(self.report_info.resource_dir, page[1], page[2] + self.report_info.report_file_sfx)
+
+  def _render_page(self, page):
+    """
+    :return: the html of page
+    """
+    kind = page[0]
+    fragments = self._fragments
+    if kind == "summary":
+      body, topbar = self._generate_summary_body(), fragments["summary"]
+    elif kind == "diff":
+      body, topbar = self._generate_diff_body(), fragments["diff"]
+    elif kind == "logs":
+      body, topbar = self._generate_log_body(), fragments["logs"]
+    elif kind == "config":
+      body, topbar = self._generate_config_body(page[1]), fragments["results"]
+    else:
+      body, topbar = self._generate_test_body(page[1], page[2]), fragments["results"]
+    return fragments["header"] + topbar + body + fragments["footer"]
+
+  def _get_template(self, name):
+    """
+    Templates are compiled once per reporter
+    """
+    if name not in self._templates:
+      self._templates[name] = self.env.get_template(name)
+    return self._templates[name]
 
   def _generate_config_body(self, config_name):
     summary_stats = [
@@ -132,7 +274,7 @@ class Reporter(object):
         self.data_source.get_config_end_time(config_name)
     ]
 
-    config_template = self.env.get_template("config_page.html")
+    config_template = self._get_template("config_page.html")
     config_body_html = config_template.render(
         config_data=self.data_source.get_config_result(config_name),
         tests=self.data_source.get_test_results(config_name),
@@ -144,12 +286,12 @@ class Reporter(object):
 
 
   def _generate_log_body(self):
-    log_template = self.env.get_template("logs_page.html")
+    log_template = self._get_template("logs_page.html")
     log_body_html = log_template.render(logs_dir=self.report_info.logs_dir)
     return log_body_html
 
   def _generate_footer(self):
-    footer_template = self.env.get_template("footer.html")
+    footer_template = self._get_template("footer.html")
     footer_html = footer_template.render()
     return footer_html
 
@@ -163,7 +305,7 @@ class Reporter(object):
         "web_resources/script.js"
     ]
     JS_INCLUDES[:] = [os.path.join(constants.PROJECT_ROOT_DIR, js_include) for js_include in JS_INCLUDES]
-    header_template = self.env.get_template("header.html")
+    header_template = self._get_template("header.html")
     header_html = header_template.render(
         page_title=self.name,
         css_includes=CSS_INCLUDES,
@@ -189,7 +331,7 @@ class Reporter(object):
         config_tests_dict[config_name] = config_tests
         config_data_dict[config_name] = self.data_source.get_config_result(config_name)
 
-      diff_template = self.env.get_template("diff.html")
+      diff_template = self._get_template("diff.html")
       diff_body_html = diff_template.render(
         test_names = test_names,
         report_info = self.report_info,
@@ -222,7 +364,7 @@ class Reporter(object):
       config_test_skipped_map[config_name] = self.data_source.count_tests_with_result(config_name, constants.SKIPPED)
       config_test_passed_map[config_name] = self.data_source.count_tests_with_result(config_name, constants.PASSED)
 
-    summary_template = self.env.get_template("landing_page.html")
+    summary_template = self._get_template("landing_page.html")
     summary_body = summary_template.render(
         report_info=self.report_info,
         summary=summary_stats,
@@ -230,12 +372,14 @@ class Reporter(object):
         config_fail_map=config_test_failure_map,
         config_skip_map=config_test_skipped_map,
         config_tests_map = config_total_tests_map,
-        config_pass_map = config_test_passed_map
+        config_pass_map = config_test_passed_map,
+        regressions = self.data_source.get_regressions(),
+        time_breakdown = tracing.get_tracer().breakdown()
     )
     return summary_body
 
   def _generate_topbar(self, active_page):
-    topbar_template = self.env.get_template("topbar.html")
+    topbar_template = self._get_template("topbar.html")
     topbar_html = topbar_template.render(
         report_info=self.report_info,
         active=active_page,
@@ -243,7 +387,7 @@ class Reporter(object):
     return topbar_html
 
   def _generate_test_body(self, config_name, test_name):
-    test_template = self.env.get_template("test_page.html")
+    test_template = self._get_template("test_page.html")
     test_body = test_template.render(
         config_name=config_name,
         test_data=self.data_source.get_test_result(config_name, test_name),
@@ -261,3 +405,9 @@ class Reporter(object):
     utils.makedirs(self.report_info.output_dir)
     utils.makedirs(self.report_info.resource_dir)
     self.report_info.config_to_test_names_map = self.get_config_to_test_names_map()
+    if not self._page_hashes and os.path.exists(self.report_info.page_hashes_file):
+      try:
+        with open(self.report_info.page_hashes_file) as f:
+          self._page_hashes = json.load(f)
+      except ValueError:
+        logger.warning("ignoring corrupt {0}, every page will be rewritten".format(self.report_info.page_hashes_file))
@@ -0,0 +1,270 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Class used to generate a single page report driven by json data.
+
+The report is one static page, report.html, and a data directory holding an index of every test (its config, result
+and duration) and the details of the tests split into shards of SHARD_SIZE tests. The page pages through and filters
+the index and loads the shard holding a test when its details are shown, so the size of the report grows with the
+amount of data rather than with the number of pages. The data files are javascript (JSONP) so that the report can be
+opened from the filesystem; the json they pass to the page is on a line of its own and read_data loads it for other
+tools. Infinite and nan floats, which json cannot represent, are written as null.
+"""
+import glob
+import json
+import logging
+import math
+import os
+from jinja2 import Environment, FileSystemLoader
+
+import zopkio.constants as constants
+import zopkio.latency as latency
+import zopkio.runtime as runtime
+import zopkio.tracing as tracing
+import zopkio.utils as utils
+
+logger = logging.getLogger(__name__)
+
+SHARD_SIZE = 500
+_CALLBACK = "zopkioReport"
+
+
+class _ReportInfo(object):
+  """
+  Holds the locations of the report files
+  """
+  def __init__(self, output_dir, logs_dir, naarad_dir):
+    self.output_dir = os.path.abspath(output_dir)
+    self.data_dir = os.path.join(self.output_dir, "data")
+    self.logs_dir = os.path.abspath(logs_dir)
+    self.naarad_dir = os.path.abspath(naarad_dir)
+    self.home_page = os.path.join(self.output_dir, "report.html")
+
+
+def _finite(value):
+  """
+  :return: value, or None if it is an infinite or nan float which json cannot represent
+  """
+  if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+    return None
+  return value
+
+
+def _sanitize(data):
+  """
+  :return: a copy of data where the infinite and nan floats nested in dicts, lists and tuples are None
+  """
+  if isinstance(data, dict):
+    return dict((key, _sanitize(value)) for key, value in data.items())
+  if isinstance(data, (list, tuple)):
+    return [_sanitize(value) for value in data]
+  return _finite(data)
+
+
+def read_data(path):
+  """
+  :param path: a data file of the report, data/index.js or data/shard_NNNNN.js
+  :return: the data it holds
+  """
+  with open(path) as f:
+    lines = f.read().splitlines()
+  return json.loads(lines[1])
+
+
+def _duration(start, end):
+  if start is None or end is None:
+    return None
+  return end - start
+
+
+class Reporter(object):
+  """
+  Class that converts the aggregated output into a single page report
+  """
+  def __init__(self, report_name, output_dir, logs_dir, naarad_dir, shard_size=SHARD_SIZE):
+    """
+    :param report_name: used in the title of the front-end
+    :param output_dir: directory where the report will be generated
+    :param logs_dir: directory of where the logs will be collected
+    :param naarad_dir: directory containing the naarad reports
+    :param shard_size: the number of tests whose details are stored in each data file
+    """
+    self.name = report_name
+    self.env = Environment(loader=FileSystemLoader(constants.WEB_RESOURCE_DIR))  # used to load html pages for Jinja2
+    self.data_source = runtime.get_collector()
+    self.report_info = _ReportInfo(output_dir, logs_dir, naarad_dir)
+    self.shard_size = shard_size
+
+  def get_report_location(self):
+    """
+    Returns the filename of the landing page
+    """
+    return self.report_info.home_page
+
+  def generate(self):
+    """
+    Generates the report
+    """
+    utils.makedirs(self.report_info.data_dir)
+    # shards of an earlier report with more tests, and the gzipped copies older versions wrote
+    for stale in glob.glob(os.path.join(self.report_info.data_dir, "shard_*")) + \
+        glob.glob(os.path.join(self.report_info.data_dir, "*.json.gz")):
+      os.remove(stale)
+
+    rows = []
+    shard = {}
+    shard_count = 0
+    for config_name in sorted(self.data_source.get_config_names()):
+      for test in sorted(self.data_source.get_test_results(config_name), key=lambda test: test.name):
+        key = "{0}/{1}".format(config_name, test.name)
+        rows.append([config_name, test.name, test.result, _duration(test.start_time, test.end_time), shard_count])
+        shard[key] = self._test_details(config_name, test)
+        if len(shard) == self.shard_size:
+          self._write_data("shard_{0:05d}".format(shard_count), shard_count, shard)
+          shard = {}
+          shard_count += 1
+    if len(shard) > 0:
+      self._write_data("shard_{0:05d}".format(shard_count), shard_count, shard)
+      shard_count += 1
+
+    index = self._index()
+    index["shards"] = shard_count
+    index["columns"] = ["config", "test", "result", "duration", "shard"]
+    index["tests"] = rows
+    self._write_data("index", None, index)
+
+    page_template = self.env.get_template("single_page_report.html")
+    with open(self.report_info.home_page, "w") as f:
+      f.write(page_template.render(
+          page_title=self.name,
+          css_include=os.path.join(constants.WEB_RESOURCE_DIR, "style.css"),
+          js_include=os.path.join(constants.WEB_RESOURCE_DIR, "single_page_report.js")
+      ))
+    logger.debug("single page report: {0} tests in {1} shards".format(len(rows), shard_count))
+
+  def _write_data(self, name, shard, data):
+    """
+    Writes data as name.js, which passes it to the page, with the json on its second line
+    """
+    encoded = json.dumps(_sanitize(data), separators=(",", ":"), sort_keys=True, allow_nan=False)
+    with open(os.path.join(self.report_info.data_dir, name + ".js"), "w") as f:
+      if shard is None:
+        f.write("{0}.index(\n{1}\n);\n".format(_CALLBACK, encoded))
+      else:
+        f.write("{0}.shard({1},\n{2}\n);\n".format(_CALLBACK, shard, encoded))
+
+  def _index(self):
+    results = [constants.PASSED, constants.FAILED, constants.SKIPPED]
+    configs = []
+    for config_name in sorted(self.data_source.get_config_names()):
+      config = self.data_source.get_config_result(config_name)
+      counts = dict((result, self.data_source.count_tests_with_result(config_name, result)) for result in results)
+      configs.append({
+          "name": config_name,
+          "result": config.result,
+          "tests": self.data_source.count_tests(config_name),
+          "counts": counts,
+          "exec_time": self.data_source.get_config_exec_time(config_name),
+          "start_time": self.data_source.get_config_start_time(config_name),
+          "end_time": self.data_source.get_config_end_time(config_name)
+      })
+    return {
+        "name": self.name,
+        "summary": {
+            "tests": self.data_source.count_all_tests(),
+            "counts": dict((result, self.data_source.count_all_tests_with_result(result)) for result in results),
+            "exec_time": self.data_source.get_total_config_exec_time(),
+            "start_time": self.data_source.get_summary_start_time(),
+            "end_time": self.data_source.get_summary_end_time()
+        },
+        "configs": configs,
+        "regressions": [[config_name, test_name, self._regression(regression)]
+                        for config_name, test_name, regression in self.data_source.get_regressions()],
+        "time_breakdown": tracing.get_tracer().breakdown(),
+        "logs_dir": self.report_info.logs_dir,
+        "naarad_dir": self.report_info.naarad_dir,
+        "latency_percentiles": latency.REPORT_PERCENTILES
+    }
+
+  @staticmethod
+  def _regression(regression):
+    return {
+        "metric": regression.metric,
+        "value": _finite(regression.value),
+        "baseline": _finite(regression.baseline),
+        "relative_change": _finite(regression.relative_change)
+    }
+
+  @staticmethod
+  def _histogram_summary(histogram):
+    """
+    :return: the count, min, mean, max and REPORT_PERCENTILES (as p50, p90, ...) of histogram
+    """
+    summary = {"count": len(histogram), "min": histogram.min(), "mean": histogram.mean(), "max": histogram.max()}
+    if len(histogram) > 0:
+      for percentile, value in histogram.percentiles(latency.REPORT_PERCENTILES):
+        summary["p{0:g}".format(percentile)] = value
+    return summary
+
+  def _test_details(self, config_name, test):
+    """
+    :return: json serializable dictionary with what the html report shows on the page of test
+    """
+    details = {
+        "config": config_name,
+        "name": test.name,
+        "description": test.description,
+        "result": test.result,
+        "function_time": _duration(test.func_start_time, test.func_end_time),
+        "total_time": _duration(test.start_time, test.end_time),
+        "start_time": test.start_time,
+        "end_time": test.end_time,
+        "exception": str(test.exception) if test.exception is not None else None,
+        "message": test.message,
+        "iterations": [[iteration, duration] for iteration, duration in test.iteration_durations.items()],
+        "latencies": dict((name, {"uncorrected": self._histogram_summary(recorder.raw),
+                                  "corrected": self._histogram_summary(recorder.corrected)})
+                          for name, recorder in test.latency_recorders.items()),
+        "histograms": dict((metric, self._histogram_summary(histogram))
+                           for metric, histogram in test.histograms.items()),
+        "regressions": [self._regression(regression) for regression in test.regressions]
+    }
+    if len(test.iteration_durations) > 1:
+      details["iteration_summary"] = test.iteration_durations.summary()
+    if test.confidence is not None:
+      details["confidence"] = test.confidence
+    if test.duration_summary is not None:
+      details["duration_summary"] = test.duration_summary
+    if test.last_warmup_iteration > 0:
+      details["warmup_iterations"] = [[iteration, duration] for iteration, duration in test.warmup_durations.items()]
+      details["warmup_end_time"] = test.warmup_end_time
+    if test.result != constants.SKIPPED and test.naarad_id is not None:
+      details["naarad_report"] = os.path.join(self.report_info.naarad_dir, str(test.naarad_id), "report.html")
+    if test.naarad_stats:
+      details["metrics"] = test.naarad_stats
+    if test.sla_objs:
+      details["slas"] = [{
+          "metric": sla.metric,
+          "submetric": sla.sub_metric,
+          "rule": "{0} {1} {2}".format(sla.stat_name, sla.sla_type, sla.threshold),
+          "value": sla.stat_value,
+          "passed": sla.sla_passed
+      } for sla in test.sla_objs]
+    return details
@@ -20,14 +20,134 @@
 
 """
 Class used to generate the report.
+
+The JUnit XML report is streamed: the testsuite of each config is appended to the file as soon as the config finished,
+with one testcase per test and, for tests run for several iterations, one more per iteration.
 """
+import datetime
 import os
-from jinja2 import Environment, FileSystemLoader
+import re
+from xml.sax.saxutils import escape, quoteattr
 
 import zopkio.constants as constants
 import zopkio.runtime as runtime
 import zopkio.utils as utils
-from junit_xml import TestSuite, TestCase
+
+REPORT_FILE = "zopkio_junit_reports.xml"
+
+# characters that are not allowed in XML 1.0 documents
+_INVALID_XML_CHARS = re.compile(u"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# room left in the testsuite start tag for the counts, which are only known once its testcases are written
+_COUNTS_WIDTH = 128
+
+
+def _xml_text(value):
+  if not isinstance(value, unicode):
+    value = str(value).decode("utf-8", "replace")
+  return _INVALID_XML_CHARS.sub(u"\ufffd", value)
+
+
+def _attribute(value):
+  return quoteattr(_xml_text(value)).encode("utf-8")
+
+
+def _text(value):
+  return escape(_xml_text(value)).encode("utf-8")
+
+
+class JUnitTestCase(object):
+  """
+  A testcase as written to the report
+  """
+  def __init__(self, name, classname, time=None, result=constants.PASSED, message=None, details=None, stdout=None,
+               stderr=None):
+    """
+    :param time: the execution time in seconds, None if unknown
+    :param result: one of constants.PASSED, constants.FAILED or constants.SKIPPED
+    :param message: short description of the failure or why the test was skipped
+    :param details: body of the failure element, e.g. a traceback
+    """
+    self.name = name
+    self.classname = classname
+    self.time = time
+    self.result = result
+    self.message = message
+    self.details = details
+    self.stdout = stdout
+    self.stderr = stderr
+
+
+class JUnitXmlWriter(object):
+  """
+  Writes a JUnit XML document one testsuite at a time without keeping the testcases in memory. The closing
+  </testsuites> tag is rewritten after every testsuite so the file is a complete report at any time, which lets CI
+  pick up the configs that finished when a run is interrupted.
+  """
+  def __init__(self, path):
+    self.path = path
+    self._file = open(path, "w")
+    self._file.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+    self._end = self._file.tell()
+    self._write_document_end()
+
+  def _write_document_end(self):
+    self._file.write("</testsuites>\n")
+    self._file.flush()
+
+  def write_suite(self, name, testcases, timestamp=None):
+    """
+    :param name: the name of the testsuite
+    :param testcases: iterable of JUnitTestCase, consumed as they are written
+    :param timestamp: the start of the testsuite in seconds since the epoch
+    """
+    self._file.seek(self._end)
+    self._file.truncate()
+    start_tag = "  <testsuite name={0}".format(_attribute(name))
+    if timestamp is not None:
+      start_tag += " timestamp={0}".format(_attribute(datetime.datetime.fromtimestamp(timestamp).isoformat()))
+    start_position = self._file.tell()
+    self._file.write(start_tag + " " * _COUNTS_WIDTH + ">\n")
+
+    tests = failures = skipped = 0
+    total_time = 0.0
+    for testcase in testcases:
+      self._write_case(testcase)
+      tests += 1
+      if testcase.result == constants.FAILED:
+        failures += 1
+      elif testcase.result == constants.SKIPPED:
+        skipped += 1
+      total_time += testcase.time or 0.0
+    self._file.write("  </testsuite>\n")
+    self._end = self._file.tell()
+    self._write_document_end()
+
+    counts = ' tests="{0}" failures="{1}" errors="0" skipped="{2}" time="{3:.6f}"'.format(tests, failures, skipped,
+                                                                                        total_time)
+    self._file.seek(start_position + len(start_tag))
+    self._file.write(counts.ljust(_COUNTS_WIDTH))
+    self._file.seek(0, os.SEEK_END)
+    self._file.flush()
+
+  def _write_case(self, testcase):
+    write = self._file.write
+    write("    <testcase classname={0} name={1}".format(_attribute(testcase.classname), _attribute(testcase.name)))
+    if testcase.time is not None:
+      write(' time="{0:.6f}"'.format(testcase.time))
+    write(">\n")
+    if testcase.result == constants.FAILED:
+      write('      <failure type="failure" message={0}>{1}</failure>\n'.format(
+          _attribute(testcase.message or testcase.result), _text(testcase.details or "")))
+    elif testcase.result == constants.SKIPPED:
+      write('      <skipped type="skipped" message={0} />\n'.format(_attribute(testcase.message or testcase.result)))
+    if testcase.stdout:
+      write("      <system-out>{0}</system-out>\n".format(_text(testcase.stdout)))
+    if testcase.stderr:
+      write("      <system-err>{0}</system-err>\n".format(_text(testcase.stderr)))
+    write("    </testcase>\n")
+
+  def close(self):
+    self._file.close()
 
 
 class _ReportInfo(object):
@@ -36,7 +156,6 @@ class _ReportInfo(object):
   """
   def __init__(self, output_dir, logs_dir, naarad_dir):
     self.output_dir = os.path.abspath(output_dir)
-    self.resource_dir = os.path.join(output_dir, "resources/")
     self.logs_dir = os.path.abspath(logs_dir)
     self.naarad_dir = os.path.abspath(naarad_dir)
 
@@ -52,19 +171,20 @@ class _ReportInfo(object):
 
 class Reporter(object):
   """
-  Class that converts the aggregated output into a user-friendly web page.
+  Class that writes the aggregated output as a JUnit XML report
   """
   def __init__(self, report_name, output_dir, logs_dir, naarad_dir):
     """
-    :param report_name: used in the title of the front-end
+    :param report_name: used in the name of the testsuites
     :param output_dir: directory where the report will be generated
     :param logs_dir: directory of where the logs will be collected
     :param naarad_dir: directory containing the naarad reports
     """
     self.name = report_name
-    self.env = Environment(loader=FileSystemLoader(constants.WEB_RESOURCE_DIR))  # used to load html pages for Jinja2
     self.data_source = runtime.get_collector()
     self.report_info = _ReportInfo(output_dir, logs_dir, naarad_dir)
+    self._writer = None
+    self._written_configs = set()
 
   def get_config_to_test_names_map(self):
     config_to_test_names_map = {}
@@ -76,37 +196,94 @@ class Reporter(object):
     """
     Returns the filename of the landing page
     """
-    return os.path.join(self.report_info.junit_xml_path, 'zopkio_junit_reports.xml')
+    return os.path.join(self.report_info.junit_xml_path, REPORT_FILE)
+
+  def add_config(self, config_name):
+    """
+    Appends the testsuite of a config to the report, called by the test runner as soon as the config finished
+    """
+    if config_name in self._written_configs:
+      return
+    if self._writer is None:
+      utils.makedirs(self.report_info.output_dir)
+      self._writer = JUnitXmlWriter(self.get_report_location())
+    config = self.data_source.get_config_result(config_name)
+    self._writer.write_suite(config_name + '_' + self.name, self._generate_testcases(config_name),
+                             timestamp=config.start_time)
+    self._written_configs.add(config_name)
 
   def generate(self):
     """
-    Generates the report
+    Generates the report, adding the configs that were not added as they finished
     """
     self._setup()
-    for config_name in self.report_info.config_to_test_names_map.keys():
-      config_dir = os.path.join(self.report_info.resource_dir, config_name)
-      utils.makedirs(config_dir)
-      testsuite = self._generate_junit_xml(config_name)
-      with open(os.path.join(self.report_info.junit_xml_path, 'zopkio_junit_reports.xml'), 'w') as file:
-          TestSuite.to_file(file, [testsuite], prettyprint=False)
-
-  def _generate_junit_xml(self, config_name):
-      testcases = []
-      tests=self.data_source.get_test_results(config_name)
-      for test in tests:
-          test_time = 0
-          if test.func_end_time != None and test.func_start_time != None:
-              test_time = test.func_end_time - test.func_start_time
-          tc = TestCase(test.name,config_name,test_time, test.description, test.message)
-          if 'failed' in test.result:
-              tc.add_failure_info(test.result)
-          elif 'skipped' in test.result:
-              tc.add_skipped_info(test.result)
-          testcases.append(tc)
-      testsuite = TestSuite(config_name+'_'+self.name, testcases)
-      return testsuite
+    for config_name in sorted(self.report_info.config_to_test_names_map.keys()):
+      self.add_config(config_name)
+    if self._writer is None:
+      self._writer = JUnitXmlWriter(self.get_report_location())
+    self._writer.close()
+
+  def _generate_testcases(self, config_name):
+    """
+    Generates the testcases of a config: one per test, timed from func_start_time to func_end_time, followed by one per
+    iteration for the tests that ran several iterations
+    """
+    tests = sorted(self.data_source.get_test_results(config_name), key=lambda test: test.name)
+    for test in tests:
+      test_time = None
+      if test.func_end_time is not None and test.func_start_time is not None:
+        test_time = test.func_end_time - test.func_start_time
+      stdout = test.description
+      if len(test.iteration_durations) > 1:
+        stdout = "{0}\n{1}".format(stdout or "", Reporter._format_iteration_durations(test.iteration_durations))
+      if test.confidence is not None:
+        stdout = "{0}\n{1}".format(stdout or "", Reporter._format_confidence(test.confidence))
+      if test.duration_summary is not None:
+        stdout = "{0}\nduration run: {1}".format(stdout or "", ", ".join(
+            "{0}={1}".format(stat, test.duration_summary[stat])
+            for stat in ["iterations", "duration", "target_duration", "pacing", "throughput"]))
+      for recorder_name, recorder in sorted(test.latency_recorders.items()):
+        stdout = "{0}\nlatency {1}: {2}".format(stdout or "", recorder_name, recorder.format_summary())
+      for metric, histogram in sorted(test.histograms.items()):
+        stdout = "{0}\nhistogram {1}: {2}".format(stdout or "", metric, Reporter._format_histogram(histogram))
+      message = None
+      if test.exception is not None:
+        message = "{0}: {1}".format(type(test.exception).__name__, test.exception)
+      result = test.result or constants.SKIPPED
+      # the messages of a failed test are the body of its failure element
+      yield JUnitTestCase(test.name, config_name, test_time, result, message, test.message or None, stdout,
+                          test.message or None if result != constants.FAILED else None)
+
+      if test.total_number_iterations > 1:
+        for iteration in xrange(1, test.total_number_iterations + 1):
+          result = test.iteration_results.get(iteration, constants.SKIPPED)
+          warmup = iteration <= test.last_warmup_iteration
+          durations = test.warmup_durations if warmup else test.iteration_durations
+          yield JUnitTestCase("{0}[iteration {1}]".format(test.name, iteration), config_name,
+                              durations.get(iteration), result,
+                              "iteration {0} {1}".format(iteration, result)
+                              if result not in [constants.PASSED, constants.WARMUP] else None,
+                              stdout="warmup iteration, excluded from the statistics" if warmup else None)
+
+  @staticmethod
+  def _format_confidence(confidence):
+    stats = ["metric", "confidence", "count", "iterations", "mean", "half_width", "relative_width",
+             "target_relative_width", "stop_reason"]
+    return "confidence interval: " + ", ".join("{0}={1}".format(stat, confidence[stat]) for stat in stats)
+
+  @staticmethod
+  def _format_iteration_durations(iteration_durations):
+    summary = iteration_durations.summary()
+    stats = ["count", "min", "mean", "stddev"] + ["p{0:g}".format(p) for p, value in iteration_durations.percentiles()] +\
+            ["max", "outliers"]
+    return "iteration durations: " + ", ".join("{0}={1}".format(stat, summary[stat]) for stat in stats)
+
+  @staticmethod
+  def _format_histogram(histogram):
+    summary = histogram.summary()
+    stats = ["count", "min", "mean"] + ["p{0:g}".format(p) for p, value in histogram.percentiles()] + ["max"]
+    return ", ".join("{0}={1}".format(stat, summary[stat]) for stat in stats)
 
   def _setup(self):
     utils.makedirs(self.report_info.output_dir)
-    utils.makedirs(self.report_info.resource_dir)
     self.report_info.config_to_test_names_map = self.get_config_to_test_names_map()
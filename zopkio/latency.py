@@ -0,0 +1,120 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Records request latencies together with a copy corrected for coordinated omission.
+
+A client that times a blocking call and only sends the next request once the previous one returned stops sending
+while the server stalls, so a stall of several seconds shows up as a single slow sample instead of all the requests
+that should have been sent during it. Given the interval at which requests were expected, or the time at which each
+request was intended to start, the corrected histogram back-fills the samples the client failed to send the same way
+HdrHistogram's recordValueWithExpectedInterval does.
+"""
+import contextlib
+import time
+
+from zopkio.histogram import Histogram
+
+# the tail is where coordinated omission hides, so the reports go further than the default percentiles
+REPORT_PERCENTILES = [50, 90, 99, 99.9, 99.99]
+
+
+class LatencyRecorder(object):
+  """
+  Thread safe recorder keeping histograms of the raw latencies and of the latencies corrected for coordinated omission
+  """
+  def __init__(self, expected_interval=None, **histogram_args):
+    """
+    :param expected_interval: seconds expected between two requests of the same client; if None only latencies
+                              recorded against an intended start time are corrected
+    :param histogram_args: passed to both zopkio.histogram.Histogram, e.g. unit or highest_value
+    """
+    self.expected_interval = expected_interval
+    self.raw = Histogram(**histogram_args)
+    self.corrected = Histogram(**histogram_args)
+
+  def __len__(self):
+    return len(self.raw)
+
+  def record(self, latency, expected_interval=None):
+    """
+    Records a latency measured around a blocking call. If the latency exceeds the expected interval the requests that
+    would have been sent in the meantime are added to the corrected histogram with linearly decreasing latencies.
+
+    :param latency: the measured latency in seconds
+    :param expected_interval: overrides the expected interval given to the constructor
+    """
+    interval = self.expected_interval if expected_interval is None else expected_interval
+    self.raw.record(latency)
+    self.corrected.record_corrected(latency, interval)
+
+  def record_scheduled(self, intended_start, actual_start, end):
+    """
+    Records a request that was scheduled to start at intended_start. The raw latency is measured from the actual
+    start while the corrected latency includes the time the request waited behind a slow server or client.
+
+    :param intended_start: the time at which the request should have been sent
+    :param actual_start: the time at which it was sent
+    :param end: the time at which the response was received
+    """
+    self.raw.record(end - actual_start)
+    self.corrected.record(end - min(intended_start, actual_start))
+
+  def merge(self, other):
+    """
+    Adds the latencies recorded by other, e.g. by another thread or process
+    """
+    self.raw.merge(other.raw)
+    self.corrected.merge(other.corrected)
+    return self
+
+  @contextlib.contextmanager
+  def time(self, intended_start=None):
+    """
+    Times the body of a with statement::
+
+      with recorder.time():
+        client.get(key)
+
+    :param intended_start: the time at which the timed request should have started, if known
+    """
+    start = time.time()
+    yield
+    end = time.time()
+    if intended_start is None:
+      self.record(end - start)
+    else:
+      self.record_scheduled(intended_start, start, end)
+
+  def summary(self):
+    """
+    :return: dict with the summary of the "uncorrected" and "corrected" latencies
+    """
+    return {"uncorrected": self.raw.summary(), "corrected": self.corrected.summary()}
+
+  def format_summary(self, percentiles=None):
+    """
+    :return: a one line description of the uncorrected and corrected percentiles
+    """
+    percentiles = REPORT_PERCENTILES if percentiles is None else percentiles
+    parts = []
+    for label, series in [("uncorrected", self.raw), ("corrected", self.corrected)]:
+      stats = ", ".join("p{0:g}={1}".format(percentile, value) for percentile, value in series.percentiles(percentiles))
+      parts.append("{0} (count={1}, {2}, max={3})".format(label, len(series), stats, series.max()))
+    return "; ".join(parts)
@@ -0,0 +1,393 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Drives load from several processes, on the runner host or on remote driver hosts, when one process is not enough to
+saturate a service.
+
+A LoadDriver starts zopkio.load_worker processes, either locally or on driver hosts through an SSHDeployer which
+installs a copy of zopkio and of the module defining the request function on each host. The workers connect back to
+the driver, and once all of them said hello (the start barrier) they are told to start their
+zopkio.load_generator.LoadGenerator at the same time. While the load runs every worker streams snapshots of its
+counters and latency histograms, which the driver merges into a DistributedLoadResult::
+
+  result = load_driver.run_distributed_load("load.py", "request", hosts=["driver1", "driver2"], workers_per_host=2,
+                                            test_name="test_throughput", mode=load_generator.OPEN_LOOP, rate=500,
+                                            duration=60)
+
+The load arguments (mode, workers, rate, arrival, stages as [duration, target] pairs, duration, requests, seed) apply
+to each worker, e.g. the rate above is per worker.
+"""
+import itertools
+import logging
+import os
+import pipes
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import shutil
+
+from zopkio.adhoc_deployer import SSHDeployer
+from zopkio.histogram import Histogram
+from zopkio.latency import LatencyRecorder
+from zopkio.load_generator import LoadResult
+import zopkio.load_worker as load_worker
+import zopkio.runtime as runtime
+import zopkio.utils as utils
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "zopkio_load_driver"
+# numbers the deployers of the drivers so that drivers running at the same time do not replace each other's
+_driver_ids = itertools.count()
+DEFAULT_INSTALL_PATH = "/tmp/zopkio_load_driver"
+# seconds between the start message and the start of the load, so that every worker starts at the same time
+DEFAULT_START_DELAY = 0.5
+
+
+class LoadDriverError(RuntimeError):
+  """
+  Raised when a worker fails or does not report in time
+  """
+  pass
+
+
+class DistributedLoadResult(LoadResult):
+  """
+  The merged results of the workers of a distributed load; `workers` maps the id of each worker to its own LoadResult
+  """
+  def __init__(self, snapshots=None):
+    """
+    :param snapshots: dict of worker id to the snapshot (see zopkio.load_worker.snapshot) of its result
+    """
+    LoadResult.__init__(self)
+    self.workers = {}
+    for worker_id, snapshot in sorted((snapshots or {}).items()):
+      self.add(worker_id, snapshot)
+
+  @staticmethod
+  def _from_snapshot(snapshot):
+    recorder = LatencyRecorder()
+    recorder.raw = Histogram.from_dict(snapshot["latencies"]["uncorrected"])
+    recorder.corrected = Histogram.from_dict(snapshot["latencies"]["corrected"])
+    result = LoadResult(recorder)
+    result.requests = snapshot["requests"]
+    result.successes = snapshot["successes"]
+    result.errors = snapshot["errors"]
+    result.error_types = dict(snapshot["error_types"])
+    result.start_time = snapshot["start_time"]
+    result.end_time = snapshot["end_time"]
+    return result
+
+  def add(self, worker_id, snapshot):
+    """
+    Merges the snapshot of the result of a worker
+    """
+    result = self._from_snapshot(snapshot)
+    self.workers[worker_id] = result
+    self.recorder.merge(result.recorder)
+    self.requests += result.requests
+    self.successes += result.successes
+    self.errors += result.errors
+    for error_type, count in result.error_types.items():
+      self.error_types[error_type] = self.error_types.get(error_type, 0) + count
+    if result.start_time is not None and (self.start_time is None or result.start_time < self.start_time):
+      self.start_time = result.start_time
+    if result.end_time is not None and (self.end_time is None or result.end_time > self.end_time):
+      self.end_time = result.end_time
+
+  def summary(self):
+    summary = LoadResult.summary(self)
+    summary["workers"] = len(self.workers)
+    return summary
+
+
+class LoadDriver(object):
+  """
+  Starts load driver workers and coordinates them
+  """
+  def __init__(self, module, function, workers=1, hosts=None, workers_per_host=1, advertised_host=None,
+               bind_host="0.0.0.0", port=0, install_path=DEFAULT_INSTALL_PATH, python="python",
+               report_interval=load_worker.DEFAULT_REPORT_INTERVAL, start_delay=DEFAULT_START_DELAY,
+               connect_timeout=60.0):
+    """
+    :param module: path of the python file defining the request function
+    :param function: the name of the request function
+    :param workers: the number of local worker processes, used when no hosts are given
+    :param hosts: the driver hosts to run workers on through ssh
+    :param workers_per_host: the number of worker processes per driver host
+    :param advertised_host: the name or address of this host as seen from the driver hosts, the fqdn by default
+    :param bind_host: the address the driver listens on for the workers
+    :param port: the port the driver listens on, any free port by default
+    :param install_path: the directory of the driver hosts the workers are installed in
+    :param python: the python interpreter of the driver hosts
+    :param report_interval: seconds between the reports of a worker
+    :param start_delay: seconds between the start message and the start of the load
+    :param connect_timeout: seconds to wait for every worker to connect
+    """
+    self.module = os.path.abspath(module)
+    self.function = function
+    self.hosts = hosts
+    self.worker_count = workers if hosts is None else len(hosts) * workers_per_host
+    self.workers_per_host = workers_per_host
+    self.advertised_host = advertised_host
+    self.bind_host = bind_host
+    self.port = port
+    self.install_path = install_path
+    self.python = python
+    self.report_interval = report_interval
+    self.start_delay = start_delay
+    self.connect_timeout = connect_timeout
+
+    self.deployer = None
+    self.deployer_name = None
+    self._server = None
+    self._processes = []
+    self._channels = {}
+    self._hosts = {}
+    self._snapshots = {}
+    self._done = set()
+    self._errors = {}
+    self._condition = threading.Condition()
+    self._tmp_dir = None
+
+  @property
+  def address(self):
+    host = self.advertised_host or socket.getfqdn()
+    return "{0}:{1}".format(host, self._server.getsockname()[1])
+
+  def start_workers(self):
+    """
+    Listens for the workers and starts them
+    """
+    self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._server.bind((self.bind_host, self.port))
+    self._server.listen(max(self.worker_count, 16))
+    acceptor = threading.Thread(target=self._accept, name="zopkio-load-driver-acceptor")
+    acceptor.daemon = True
+    acceptor.start()
+    if self.hosts is None:
+      self._start_local_workers()
+    else:
+      self._start_remote_workers()
+
+  def _worker_args(self, worker_id, module):
+    return ["--coordinator", self.address, "--worker-id", str(worker_id), "--module", module,
+            "--function", self.function, "--report-interval", str(self.report_interval)]
+
+  def _start_local_workers(self):
+    zopkio_parent = os.path.dirname(os.path.dirname(os.path.abspath(load_worker.__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([zopkio_parent] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    for worker_id in xrange(self.worker_count):
+      self._processes.append(subprocess.Popen([sys.executable, "-m", "zopkio.load_worker"] +
+                                              self._worker_args(worker_id, self.module), env=env))
+
+  def _start_remote_workers(self):
+    self._tmp_dir = tempfile.mkdtemp()
+    self.deployer_name = "{0}_{1}".format(SERVICE_NAME, next(_driver_ids))
+    self.deployer = SSHDeployer(self.deployer_name, {
+        "executable": utils.build_zopkio_package(os.path.join(self._tmp_dir, "zopkio_load_worker.tar"), [self.module]),
+        "extract": True
+    })
+    # registered with the runtime so that the runner cleans up workers left running after a failure
+    runtime.set_deployer(self.deployer_name, self.deployer)
+    worker_id = 0
+    for host in self.hosts:
+      for _ in xrange(self.workers_per_host):
+        worker_path = "{0}/worker_{1}".format(self.install_path, worker_id)
+        args = " ".join(pipes.quote(arg) for arg in self._worker_args(worker_id, os.path.basename(self.module)))
+        self.deployer.start("load_worker_{0}".format(worker_id), {
+            "hostname": host,
+            "install_path": worker_path,
+            "start_command": "nohup {0} -m zopkio.load_worker {1} > load_worker.log 2>&1 & echo $! > load_worker.pid"
+                             .format(pipes.quote(self.python), args),
+            # the worker is backgrounded by the start command, which is not its command line, and the arguments of
+            # one worker prefix those of others (--worker-id 1 and 10), so it is found by its pid file
+            "pid_file": "{0}/load_worker.pid".format(worker_path)
+        })
+        worker_id += 1
+
+  def _accept(self):
+    while True:
+      try:
+        sock, _ = self._server.accept()
+      except socket.error:
+        return
+      thread = threading.Thread(target=self._serve, args=[load_worker.Channel(sock)],
+                                name="zopkio-load-driver-worker")
+      thread.daemon = True
+      thread.start()
+
+  def _serve(self, channel):
+    worker_id = None
+    while True:
+      try:
+        message = channel.receive()
+      except (socket.error, ValueError) as e:
+        message = None
+        logger.debug("lost worker {0}: {1}".format(worker_id, e))
+      with self._condition:
+        if message is None:
+          if worker_id is not None and worker_id not in self._done and worker_id not in self._errors:
+            self._errors[worker_id] = "the worker disconnected before finishing"
+          self._condition.notify_all()
+          return
+        worker_id = message["worker"]
+        if message["type"] == load_worker.HELLO:
+          self._channels[worker_id] = channel
+          self._hosts[worker_id] = message["host"]
+        elif message["type"] == load_worker.REPORT:
+          self._snapshots[worker_id] = message["result"]
+        elif message["type"] == load_worker.DONE:
+          self._snapshots[worker_id] = message["result"]
+          self._done.add(worker_id)
+        elif message["type"] == load_worker.ERROR:
+          self._errors[worker_id] = message["message"]
+        self._condition.notify_all()
+
+  def _wait(self, predicate, timeout, description):
+    deadline = time.time() + timeout if timeout is not None else None
+    with self._condition:
+      while not predicate():
+        if len(self._errors) > 0:
+          worker_id, message = sorted(self._errors.items())[0]
+          raise LoadDriverError("load worker {0} failed: {1}".format(worker_id, message))
+        for process in self._processes:
+          if process.poll() not in (None, 0):
+            raise LoadDriverError("a local load worker exited with status {0}".format(process.returncode))
+        remaining = deadline - time.time() if deadline is not None else 1.0
+        if remaining <= 0:
+          raise LoadDriverError("timed out waiting for {0}".format(description))
+        self._condition.wait(min(remaining, 1.0))
+
+  def wait_for_workers(self, timeout=None):
+    """
+    The start barrier: waits until every worker connected and loaded the request function
+    """
+    self._wait(lambda: len(self._channels) == self.worker_count,
+               self.connect_timeout if timeout is None else timeout, "the load workers to connect")
+
+  def run(self, timeout=None, **load):
+    """
+    Runs the load on every worker and waits for it to finish
+
+    :param timeout: seconds to wait for the load to finish, None to wait until it does
+    :param load: the arguments of zopkio.load_generator.LoadGenerator used by every worker, stages as
+                 [duration, target] pairs
+    :return: DistributedLoadResult
+    """
+    self.wait_for_workers()
+    start_time = time.time() + self.start_delay
+    with self._condition:
+      channels = self._channels.values()
+    for channel in channels:
+      channel.send({"type": load_worker.START, "start_time": start_time, "load": load})
+    try:
+      self._wait(lambda: len(self._done) == self.worker_count, timeout, "the load to finish")
+    except LoadDriverError:
+      self.stop()
+      raise
+    return self.progress()
+
+  def progress(self):
+    """
+    :return: DistributedLoadResult merging the latest snapshots of the workers, also while the load runs
+    """
+    with self._condition:
+      return DistributedLoadResult(dict(self._snapshots))
+
+  def stop(self):
+    """
+    Asks the workers to stop their load, their requests in flight are completed
+    """
+    with self._condition:
+      channels = self._channels.values()
+    for channel in channels:
+      try:
+        channel.send({"type": load_worker.STOP})
+      except socket.error:
+        pass
+
+  def close(self):
+    """
+    Disconnects the workers and stops and removes those still running
+    """
+    if self._server is not None:
+      self._server.close()
+    with self._condition:
+      channels = self._channels.values()
+      self._channels = {}
+    for channel in channels:
+      channel.close()
+    for process in self._processes:
+      deadline = time.time() + 5
+      while process.poll() is None and time.time() < deadline:
+        time.sleep(0.01)
+      if process.poll() is None:
+        process.kill()
+        process.wait()
+    if self.deployer is not None:
+      for process in self.deployer.get_processes():
+        try:
+          self.deployer.undeploy(process.unique_id)
+        except Exception as e:
+          logger.warning("Failed to undeploy load worker {0}: {1}".format(process.unique_id, e))
+      runtime.remove_deployer(self.deployer_name)
+    if self._tmp_dir is not None:
+      shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+  def __enter__(self):
+    self.start_workers()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+def run_distributed_load(module, function, hosts=None, workers=1, workers_per_host=1, test_name=None,
+                         recorder_name="latency", timeout=None, driver_args=None, **load):
+  """
+  Runs a load from several workers and, if test_name is given, merges the latencies into the latency recorder of the
+  test so that they appear in the reports
+
+  :param module: path of the python file defining the request function
+  :param function: the name of the request function
+  :param hosts: the driver hosts, None to run the workers locally
+  :param workers: the number of local workers
+  :param workers_per_host: the number of workers per driver host
+  :param test_name: the active test the latencies belong to
+  :param recorder_name: the name of the latency recorder of the test
+  :param timeout: seconds to wait for the load to finish
+  :param driver_args: other arguments of LoadDriver
+  :param load: the arguments of zopkio.load_generator.LoadGenerator used by each worker
+  :return: DistributedLoadResult
+  """
+  with LoadDriver(module, function, workers=workers, hosts=hosts, workers_per_host=workers_per_host,
+                  **(driver_args or {})) as driver:
+    result = driver.run(timeout, **load)
+  if test_name is not None:
+    runtime.get_latency_recorder(test_name, recorder_name).merge(result.recorder)
+  logger.info("Distributed load of {0} workers: {1} requests, {2} errors, {3:.1f} requests/sec".format(
+      len(result.workers), result.requests, result.errors, result.throughput()))
+  return result
@@ -0,0 +1,373 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Generates load against a service from within a test by repeatedly calling a request function.
+
+Two models are supported:
+  closed loop: a number of workers each send the next request as soon as the previous one returned
+  open loop: requests are started at a target rate (with constant or Poisson arrivals) regardless of how long earlier
+             requests take, using a pool of workers to bound the concurrency
+
+The load can be shaped with stages that linearly ramp the number of workers (closed loop) or the rate (open loop)
+and stops after a duration or a number of requests, whichever comes first.
+"""
+import logging
+import Queue
+import random
+import threading
+import time
+
+from zopkio.latency import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+CLOSED_LOOP = "closed"
+OPEN_LOOP = "open"
+
+CONSTANT_ARRIVALS = "constant"
+POISSON_ARRIVALS = "poisson"
+
+# granularity used to follow ramps and to poll for changes in the number of active workers
+_STEP = 0.001
+_POLL_INTERVAL = 0.01
+
+
+class Stage(object):
+  """
+  A stage of the load. Over `duration` seconds the target (the number of workers for a closed loop, requests per second
+  for an open loop) changes linearly from the target of the previous stage (0 for the first stage) to `target`.
+  """
+  def __init__(self, duration, target):
+    if duration <= 0:
+      raise ValueError("stage duration must be positive")
+    if target < 0:
+      raise ValueError("stage target must not be negative")
+    self.duration = duration
+    self.target = target
+
+
+class Schedule(object):
+  """
+  Maps the elapsed time since the start of the load to the current target
+  """
+  def __init__(self, stages=None, target=None, duration=None):
+    """
+    :param stages: list of Stage, if given target is ignored
+    :param target: constant target used when there are no stages
+    :param duration: the maximum duration of the load; defaults to the sum of the stage durations, None means unbounded
+    """
+    self.stages = stages or []
+    self.constant_target = target
+    stage_duration = sum(stage.duration for stage in self.stages) if len(self.stages) > 0 else None
+    if duration is None:
+      self.duration = stage_duration
+    elif stage_duration is None:
+      self.duration = duration
+    else:
+      self.duration = min(duration, stage_duration)
+
+  def max_target(self):
+    if len(self.stages) == 0:
+      return self.constant_target
+    return max(stage.target for stage in self.stages)
+
+  def target(self, elapsed):
+    """
+    :param elapsed: seconds since the start of the load
+    :return: the target at elapsed or None if the load is over
+    """
+    if self.duration is not None and elapsed >= self.duration:
+      return None
+    if len(self.stages) == 0:
+      return self.constant_target
+    previous_target = 0.0
+    stage_start = 0.0
+    for stage in self.stages:
+      if elapsed < stage_start + stage.duration:
+        fraction = (elapsed - stage_start) / stage.duration
+        return previous_target + (stage.target - previous_target) * fraction
+      previous_target = stage.target
+      stage_start += stage.duration
+    return None
+
+
+def arrival_offsets(schedule, arrival=CONSTANT_ARRIVALS, rng=None):
+  """
+  Generates the offsets (seconds since the start) at which open loop requests should be sent. The rate can change over
+  time so arrivals are produced by accumulating rate * time until it crosses a threshold: 1 for constant arrivals and
+  an exponentially distributed threshold for Poisson arrivals.
+
+  :param schedule: Schedule whose target is the rate in requests per second
+  :param arrival: CONSTANT_ARRIVALS or POISSON_ARRIVALS
+  :param rng: random.Random used for Poisson arrivals
+  """
+  if arrival == POISSON_ARRIVALS:
+    rng = rng or random.Random()
+    draw = lambda: rng.expovariate(1.0)
+  elif arrival == CONSTANT_ARRIVALS:
+    draw = lambda: 1.0
+  else:
+    raise ValueError("arrival must be one of {0}, {1}".format(CONSTANT_ARRIVALS, POISSON_ARRIVALS))
+  # the first constant arrival happens immediately, later ones once a full request worth of rate has accumulated
+  accumulated = 1.0 if arrival == CONSTANT_ARRIVALS else 0.0
+  threshold = draw()
+  offset = 0.0
+  while True:
+    rate = schedule.target(offset)
+    if rate is None:
+      return
+    gain = rate * _STEP
+    if rate > 0 and accumulated + gain >= threshold:
+      offset += max(threshold - accumulated, 0.0) / rate
+      accumulated = 0.0
+      threshold = draw()
+      if schedule.duration is not None and offset >= schedule.duration:
+        return
+      yield offset
+    else:
+      accumulated += gain
+      offset += _STEP
+
+
+class LoadResult(object):
+  """
+  Per-request latencies and error counts of a load run. For an open loop the corrected latencies are measured from the
+  time each request was scheduled, so requests delayed behind a stalled server or busy workers are accounted for.
+  """
+  def __init__(self, recorder=None):
+    """
+    :param recorder: the LatencyRecorder latencies are recorded to, e.g. from runtime.get_latency_recorder
+    """
+    self.recorder = recorder if recorder is not None else LatencyRecorder()
+    self.latencies = self.recorder.raw
+    self.corrected_latencies = self.recorder.corrected
+    self.requests = 0
+    self.successes = 0
+    self.errors = 0
+    self.error_types = {}
+    self.start_time = None
+    self.end_time = None
+    self._lock = threading.Lock()
+
+  def record_success(self, start, end, intended_start=None):
+    with self._lock:
+      self.requests += 1
+      self.successes += 1
+    if intended_start is None:
+      self.recorder.record(end - start)
+    else:
+      self.recorder.record_scheduled(intended_start, start, end)
+
+  def record_error(self, exception):
+    with self._lock:
+      self.requests += 1
+      self.errors += 1
+      error_type = type(exception).__name__
+      self.error_types[error_type] = self.error_types.get(error_type, 0) + 1
+
+  def duration(self):
+    if self.start_time is None or self.end_time is None:
+      return None
+    return self.end_time - self.start_time
+
+  def throughput(self):
+    """
+    :return: successful requests per second
+    """
+    duration = self.duration()
+    if not duration:
+      return 0.0
+    return self.successes / duration
+
+  def error_rate(self):
+    return float(self.errors) / self.requests if self.requests > 0 else 0.0
+
+  def summary(self):
+    summary = self.latencies.summary()
+    summary["corrected"] = self.corrected_latencies.summary()
+    summary.update({
+        "requests": self.requests,
+        "errors": self.errors,
+        "error_rate": self.error_rate(),
+        "throughput": self.throughput(),
+        "duration": self.duration()
+    })
+    return summary
+
+
+class LoadGenerator(object):
+  """
+  Drives a request function with a closed or open loop load
+  """
+  def __init__(self, request, mode=CLOSED_LOOP, workers=1, rate=None, arrival=CONSTANT_ARRIVALS, stages=None,
+               duration=None, requests=None, seed=None, recorder=None):
+    """
+    :param request: function taking no arguments that performs a single request, raising an exception on error
+    :param mode: CLOSED_LOOP or OPEN_LOOP
+    :param workers: closed loop: the number of workers when there are no stages;
+                    open loop: the maximum number of requests in flight
+    :param rate: open loop: requests per second when there are no stages
+    :param arrival: open loop: CONSTANT_ARRIVALS or POISSON_ARRIVALS
+    :param stages: list of Stage ramping the number of workers (closed loop) or the rate (open loop)
+    :param duration: stop after this many seconds
+    :param requests: stop after this many requests
+    :param seed: seed for the Poisson arrivals so that a run can be reproduced
+    :param recorder: LatencyRecorder the latencies are recorded to, a new one is used by default
+    """
+    if mode not in (CLOSED_LOOP, OPEN_LOOP):
+      raise ValueError("mode must be one of {0}, {1}".format(CLOSED_LOOP, OPEN_LOOP))
+    if mode == OPEN_LOOP and rate is None and not stages:
+      raise ValueError("an open loop requires a rate or stages")
+    if duration is None and requests is None and not stages:
+      raise ValueError("a duration, a number of requests or stages are required to stop the load")
+    self.request = request
+    self.mode = mode
+    self.workers = workers
+    self.arrival = arrival
+    self.requests = requests
+    self.rng = random.Random(seed)
+    self.recorder = recorder
+    target = rate if mode == OPEN_LOOP else workers
+    self.schedule = Schedule(stages, target, duration)
+    self._issued = 0
+    self._issue_lock = threading.Lock()
+    self._stop = threading.Event()
+    # the LoadResult of the current run, other threads may read it while the load runs
+    self.result = None
+
+  def stop(self):
+    """
+    Stops the load from another thread, requests in flight are completed
+    """
+    self._stop.set()
+
+  def _acquire(self):
+    """
+    :return: True if another request may be sent
+    """
+    with self._issue_lock:
+      if self._stop.is_set():
+        return False
+      if self.requests is not None and self._issued >= self.requests:
+        self._stop.set()
+        return False
+      self._issued += 1
+      return True
+
+  def _execute(self, result, intended_start=None):
+    start = time.time()
+    try:
+      self.request()
+    except Exception as e:
+      result.record_error(e)
+      logger.debug("request failed: {0}".format(e))
+    else:
+      result.record_success(start, time.time(), intended_start)
+
+  def run(self):
+    """
+    Runs the load in the calling thread until a stop condition is reached
+
+    :return: LoadResult
+    """
+    result = LoadResult(self.recorder)
+    self.result = result
+    result.start_time = time.time()
+    if self.mode == CLOSED_LOOP:
+      self._run_closed_loop(result)
+    else:
+      self._run_open_loop(result)
+    result.end_time = time.time()
+    return result
+
+  def _run_closed_loop(self, result):
+    start = result.start_time
+
+    def worker(index):
+      while not self._stop.is_set():
+        target = self.schedule.target(time.time() - start)
+        if target is None:
+          self._stop.set()
+          break
+        if index >= target:
+          # this worker is not needed at the current stage of the ramp
+          time.sleep(_POLL_INTERVAL)
+          continue
+        if not self._acquire():
+          break
+        self._execute(result)
+
+    max_workers = int(round(self.schedule.max_target()))
+    threads = [threading.Thread(target=worker, args=[index]) for index in xrange(max_workers)]
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+  def _run_open_loop(self, result):
+    start = result.start_time
+    pending = Queue.Queue()
+
+    def worker():
+      while True:
+        scheduled = pending.get()
+        if scheduled is None:
+          break
+        self._execute(result, scheduled)
+
+    threads = [threading.Thread(target=worker) for _ in xrange(self.workers)]
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+    try:
+      for offset in arrival_offsets(self.schedule, self.arrival, self.rng):
+        delay = start + offset - time.time()
+        if delay > 0:
+          self._stop.wait(delay)
+        if not self._acquire():
+          break
+        pending.put(start + offset)
+    finally:
+      for _ in threads:
+        pending.put(None)
+      for thread in threads:
+        thread.join()
+
+
+def run_closed_loop(request, workers=1, duration=None, requests=None, stages=None, recorder=None):
+  """
+  Runs a closed loop load, see LoadGenerator
+
+  :return: LoadResult
+  """
+  return LoadGenerator(request, CLOSED_LOOP, workers=workers, stages=stages, duration=duration,
+                       requests=requests, recorder=recorder).run()
+
+
+def run_open_loop(request, rate=None, arrival=CONSTANT_ARRIVALS, workers=16, duration=None, requests=None,
+                  stages=None, seed=None, recorder=None):
+  """
+  Runs an open loop load, see LoadGenerator
+
+  :return: LoadResult
+  """
+  return LoadGenerator(request, OPEN_LOOP, workers=workers, rate=rate, arrival=arrival, stages=stages,
+                       duration=duration, requests=requests, seed=seed, recorder=recorder).run()
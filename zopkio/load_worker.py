@@ -0,0 +1,206 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+A load driver worker: a process, usually on a remote host, that drives a request function with a
+zopkio.load_generator.LoadGenerator on behalf of a zopkio.load_driver.LoadDriver::
+
+  python -m zopkio.load_worker --coordinator runner-host:41000 --worker-id 3 --module load.py --function request
+
+The worker connects to the coordinator, says hello and waits for the start message, which carries the arguments of the
+LoadGenerator and the time at which every worker starts. While the load runs it sends a snapshot of its counters and
+latency histograms every report interval, and a final one once the load is over. Messages are json objects, one per
+line, in both directions; the coordinator may send a stop message at any time.
+"""
+import argparse
+import imp
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from zopkio.load_generator import LoadGenerator, Stage
+
+logger = logging.getLogger(__name__)
+
+HELLO = "hello"
+START = "start"
+STOP = "stop"
+REPORT = "report"
+DONE = "done"
+ERROR = "error"
+
+DEFAULT_REPORT_INTERVAL = 1.0
+_CONNECT_TIMEOUT = 30.0
+
+
+class Channel(object):
+  """
+  Sends and receives json messages, one per line, over a connected socket; sends are thread safe
+  """
+  def __init__(self, sock):
+    self.sock = sock
+    self._reader = sock.makefile("r")
+    self._lock = threading.Lock()
+
+  def send(self, message):
+    data = json.dumps(message) + "\n"
+    with self._lock:
+      self.sock.sendall(data)
+
+  def receive(self):
+    """
+    :return: the next message or None once the connection is closed
+    """
+    line = self._reader.readline()
+    if not line:
+      return None
+    return json.loads(line)
+
+  def close(self):
+    try:
+      self.sock.shutdown(socket.SHUT_RDWR)
+    except socket.error:
+      pass
+    self._reader.close()
+    self.sock.close()
+
+
+def snapshot(result):
+  """
+  :param result: the zopkio.load_generator.LoadResult of a load in progress or finished
+  :return: a json serializable dict of the counters and latency histograms of result
+  """
+  with result._lock:
+    counters = {
+        "requests": result.requests,
+        "successes": result.successes,
+        "errors": result.errors,
+        "error_types": dict(result.error_types)
+    }
+  counters.update({
+      "start_time": result.start_time,
+      "end_time": result.end_time,
+      "latencies": {"uncorrected": result.recorder.raw.to_dict(), "corrected": result.recorder.corrected.to_dict()}
+  })
+  return counters
+
+
+def _load_arguments(load):
+  """
+  Converts the json form of the LoadGenerator arguments, where stages are [duration, target] pairs
+  """
+  load = dict(load)
+  if load.get("stages"):
+    load["stages"] = [Stage(duration, target) for duration, target in load["stages"]]
+  return load
+
+
+def _connect(address):
+  host, _, port = address.rpartition(":")
+  deadline = time.time() + _CONNECT_TIMEOUT
+  while True:
+    try:
+      return socket.create_connection((host, int(port)), timeout=_CONNECT_TIMEOUT)
+    except socket.error:
+      if time.time() >= deadline:
+        raise
+      time.sleep(0.1)
+
+
+def run_worker(coordinator, worker_id, module, function, report_interval=DEFAULT_REPORT_INTERVAL):
+  """
+  Connects to the coordinator and runs the load it asks for
+
+  :param coordinator: host:port of the coordinator
+  :param worker_id: the id of this worker, unique within the load
+  :param module: path of the python file defining the request function
+  :param function: the name of the request function, called without arguments for each request
+  :param report_interval: seconds between two reports
+  :return: the exit status of the worker
+  """
+  sock = _connect(coordinator)
+  sock.settimeout(None)
+  channel = Channel(sock)
+  try:
+    try:
+      request = getattr(imp.load_source("zopkio_load_module", module), function)
+    except Exception:
+      channel.send({"type": ERROR, "worker": worker_id, "message": traceback.format_exc()})
+      return 1
+    channel.send({"type": HELLO, "worker": worker_id, "host": socket.gethostname(), "pid": os.getpid()})
+    message = channel.receive()
+    if message is None or message["type"] != START:
+      return 0
+    generator = LoadGenerator(request, **_load_arguments(message["load"]))
+
+    def listen():
+      while True:
+        message = channel.receive()
+        if message is None or message["type"] == STOP:
+          generator.stop()
+          return
+    listener = threading.Thread(target=listen, name="zopkio-load-worker-listener")
+    listener.daemon = True
+    listener.start()
+
+    # the coordinator picks a start time slightly in the future so that every worker starts at once
+    delay = message["start_time"] - time.time()
+    if delay > 0:
+      time.sleep(delay)
+    finished = threading.Event()
+
+    def report():
+      while not finished.wait(report_interval):
+        if generator.result is not None:
+          channel.send({"type": REPORT, "worker": worker_id, "result": snapshot(generator.result)})
+    reporter = threading.Thread(target=report, name="zopkio-load-worker-reporter")
+    reporter.daemon = True
+    reporter.start()
+    try:
+      result = generator.run()
+    except Exception:
+      finished.set()
+      channel.send({"type": ERROR, "worker": worker_id, "message": traceback.format_exc()})
+      return 1
+    finished.set()
+    reporter.join()
+    channel.send({"type": DONE, "worker": worker_id, "result": snapshot(result)})
+    return 0
+  finally:
+    channel.close()
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Zopkio load driver worker")
+  parser.add_argument("--coordinator", required=True, help="host:port of the coordinator")
+  parser.add_argument("--worker-id", required=True, type=int, dest="worker_id")
+  parser.add_argument("--module", required=True, help="python file defining the request function")
+  parser.add_argument("--function", required=True, help="name of the request function")
+  parser.add_argument("--report-interval", type=float, default=DEFAULT_REPORT_INTERVAL, dest="report_interval")
+  args = parser.parse_args(argv)
+  logging.basicConfig(level=logging.INFO)
+  return run_worker(args.coordinator, args.worker_id, args.module, args.function, args.report_interval)
+
+if __name__ == "__main__":
+  sys.exit(main())
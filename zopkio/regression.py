@@ -0,0 +1,267 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Detects performance regressions by comparing the metrics of each test with a rolling baseline built from the
+same test in earlier runs.
+"""
+import json
+import logging
+import os
+import re
+import time
+
+import zopkio.utils as utils
+
+logger = logging.getLogger(__name__)
+
+DURATION_METRIC = "duration"
+DEFAULT_STATS = ["mean", "p50", "p95", "p99", "max"]
+DEFAULT_HIGHER_IS_BETTER = ["throughput", "qps", "tps", "ops", "rate", "bandwidth"]
+# metrics with one of these words in their name regress when they grow, even if they also contain e.g. rate
+LOWER_IS_BETTER = ["error", "errors", "failure", "failures", "failed", "drop", "drops", "dropped", "timeout",
+                   "timeouts", "reset", "resets", "retry", "retries"]
+
+_WORD_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+# scales the median absolute deviation so that it estimates the standard deviation of normally distributed data
+_MAD_SCALE = 1.4826
+
+
+class PerformanceRegressionError(AssertionError):
+  """
+  Raised (stored as the test exception) when a test is failed because of a performance regression
+  """
+  pass
+
+
+class Regression(object):
+  """
+  A single metric of a test that is significantly worse than its baseline
+  """
+  def __init__(self, metric, value, baseline, deviation, score, baseline_runs):
+    """
+    :param metric: the flattened metric name e.g. server1-perf.latency.max
+    :param value: the value observed in this run
+    :param baseline: the median of the metric over the baseline runs
+    :param deviation: the scaled median absolute deviation of the baseline
+    :param score: the robust z-score of the value; infinite if the baseline has no deviation
+    :param baseline_runs: the number of earlier runs the baseline was computed from
+    """
+    self.metric = metric
+    self.value = value
+    self.baseline = baseline
+    self.deviation = deviation
+    self.score = score
+    self.baseline_runs = baseline_runs
+    self.relative_change = (value - baseline) / abs(baseline) if baseline != 0 else float("inf")
+
+  def __str__(self):
+    return "{0}: {1:g} vs baseline median {2:g} ({3:+.1%}, score {4:.1f}, {5} runs)".format(
+        self.metric, self.value, self.baseline, self.relative_change, self.score, self.baseline_runs)
+
+
+def median(values):
+  """
+  :param values: a non empty list of numbers
+  :return: the median of the values
+  """
+  ordered = sorted(values)
+  mid = len(ordered) // 2
+  if len(ordered) % 2 == 1:
+    return ordered[mid]
+  return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+def median_absolute_deviation(values, center=None):
+  """
+  :param values: a non empty list of numbers
+  :param center: the value deviations are measured from, defaults to the median of values
+  :return: the median of the absolute deviations from center
+  """
+  if center is None:
+    center = median(values)
+  return median([abs(value - center) for value in values])
+
+
+def flatten_metrics(test, stats=None):
+  """
+  Flattens the metrics of a test into a mapping from metric name to value. The mean duration of the measured iterations
+  of the test is always included (and its other stats as duration.stat when the test iterated), the histograms
+  recorded through runtime.get_histogram as metric.stat and the naarad stats as metric.submetric.stat for each stat in
+  stats.
+
+  :param test: the test object
+  :param stats: the stats to consider, defaults to DEFAULT_STATS
+  :return: dict of metric name to float
+  """
+  stats = DEFAULT_STATS if stats is None else stats
+  metrics = {}
+  durations = getattr(test, "iteration_durations", None)
+  if durations is not None and len(durations) > 0:
+    # every measured iteration counts, not only the last one
+    metrics[DURATION_METRIC] = durations.mean()
+    if len(durations) > 1:
+      summary = durations.summary()
+      for stat in stats:
+        if stat != "mean" and summary.get(stat) is not None:
+          metrics["{0}.{1}".format(DURATION_METRIC, stat)] = float(summary[stat])
+  elif test.func_start_time is not None and test.func_end_time is not None:
+    metrics[DURATION_METRIC] = test.func_end_time - test.func_start_time
+  for metric_name, histogram in test.histograms.items():
+    if len(histogram) == 0:
+      continue
+    summary = histogram.summary()
+    for stat in stats:
+      if summary.get(stat) is not None:
+        metrics["{0}.{1}".format(metric_name, stat)] = float(summary[stat])
+  naarad_stats = test.naarad_stats or {}
+  for metric_name, submetrics in naarad_stats.items():
+    for submetric_name, stat_map in (submetrics or {}).items():
+      for stat in stats:
+        if stat not in stat_map:
+          continue
+        try:
+          metrics["{0}.{1}.{2}".format(metric_name, submetric_name, stat)] = float(stat_map[stat])
+        except (TypeError, ValueError):
+          logger.debug("Ignoring non numeric stat {0} of {1}.{2}".format(stat, metric_name, submetric_name))
+  return metrics
+
+
+class RegressionHistory(object):
+  """
+  Stores the flattened metrics of earlier runs in a json file, one entry per run keyed by config and test name
+  """
+  def __init__(self, path, max_runs=50):
+    """
+    :param path: the json file holding the history; it is created on save if it does not exist
+    :param max_runs: the number of runs to keep in the file
+    """
+    self.path = path
+    self.max_runs = max_runs
+    self.runs = []
+    self.current_run = {}
+    if os.path.isfile(path):
+      try:
+        with open(path) as history_file:
+          self.runs = json.load(history_file).get("runs", [])
+      except ValueError:
+        logger.error("Ignoring malformed regression history {0}".format(path))
+
+  @staticmethod
+  def _key(config_name, test_name):
+    return "{0}/{1}".format(config_name, test_name)
+
+  def get_baseline(self, config_name, test_name, metric, window):
+    """
+    :return: the values of metric in the last window runs that recorded it, oldest first
+    """
+    key = RegressionHistory._key(config_name, test_name)
+    values = [run["metrics"][key][metric] for run in self.runs
+              if metric in run.get("metrics", {}).get(key, {})]
+    return values[-window:]
+
+  def record(self, config_name, test_name, metrics):
+    self.current_run[RegressionHistory._key(config_name, test_name)] = metrics
+
+  def save(self):
+    """
+    Appends the current run to the history and writes the file
+    """
+    if len(self.current_run) == 0:
+      return
+    self.runs.append({"timestamp": time.time(), "metrics": self.current_run})
+    self.runs = self.runs[-self.max_runs:]
+    self.current_run = {}
+    utils.makedirs(os.path.dirname(os.path.abspath(self.path)))
+    tmp_path = self.path + ".tmp"
+    with open(tmp_path, "w") as history_file:
+      json.dump({"runs": self.runs}, history_file)
+    os.rename(tmp_path, self.path)
+
+
+class RegressionDetector(object):
+  """
+  Flags metrics whose value is both far from the baseline median in terms of the median absolute deviation and
+  relatively worse by at least a minimum amount. Using the median and MAD keeps a single noisy run in the baseline from
+  hiding or triggering a regression.
+  """
+  def __init__(self, history, window=10, min_runs=3, threshold=3.5, min_relative_change=0.05, stats=None,
+               higher_is_better=None):
+    """
+    :param history: a RegressionHistory
+    :param window: the number of earlier runs used as baseline
+    :param min_runs: the minimum number of earlier runs needed before a metric is checked
+    :param threshold: the robust z-score above which a change is significant
+    :param min_relative_change: the minimum relative change (0.05 is 5%) for a change to be reported
+    :param stats: the naarad stats to consider, defaults to DEFAULT_STATS
+    :param higher_is_better: words of metric names for which a decrease is a regression
+    """
+    self.history = history
+    self.window = window
+    self.min_runs = min_runs
+    self.threshold = threshold
+    self.min_relative_change = min_relative_change
+    self.stats = stats
+    self.higher_is_better = DEFAULT_HIGHER_IS_BETTER if higher_is_better is None else higher_is_better
+
+  def is_higher_better(self, metric):
+    """
+    Matches the words of the metric name, e.g. server1-perf.error_rate.mean has the words server1, perf, error,
+    rate and mean, so that drops does not match ops; a word of LOWER_IS_BETTER wins over higher_is_better
+    """
+    words = set(_WORD_SEPARATORS.split(metric.lower()))
+    if len(words.intersection(LOWER_IS_BETTER)) > 0:
+      return False
+    return len(words.intersection(keyword.lower() for keyword in self.higher_is_better)) > 0
+
+  def check_metric(self, metric, value, baseline_values):
+    """
+    :return: a Regression if value is a significant regression compared to baseline_values otherwise None
+    """
+    if len(baseline_values) < self.min_runs:
+      return None
+    center = median(baseline_values)
+    deviation = _MAD_SCALE * median_absolute_deviation(baseline_values, center)
+    # orient the change so that a positive delta is always a regression
+    delta = center - value if self.is_higher_better(metric) else value - center
+    if delta <= 0:
+      return None
+    if center != 0 and delta / abs(center) < self.min_relative_change:
+      return None
+    score = delta / deviation if deviation > 0 else float("inf")
+    if score < self.threshold:
+      return None
+    return Regression(metric, value, center, deviation, score, len(baseline_values))
+
+  def check(self, config_name, test):
+    """
+    Compares the metrics of test with the baseline and records them in the history
+
+    :return: the list of regressions found, sorted by decreasing score
+    """
+    metrics = flatten_metrics(test, self.stats)
+    regressions = []
+    for metric, value in metrics.items():
+      baseline_values = self.history.get_baseline(config_name, test.name, metric, self.window)
+      regression = self.check_metric(metric, value, baseline_values)
+      if regression is not None:
+        regressions.append(regression)
+    self.history.record(config_name, test.name, metrics)
+    return sorted(regressions, key=lambda regression: regression.score, reverse=True)
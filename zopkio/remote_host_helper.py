@@ -24,10 +24,17 @@ import logging
 import os
 import re
 import stat
+import threading
+
+import zopkio.tracing as tracing
 
 
 logger = logging.getLogger(__name__)
 
+# thread ident -> the ssh clients opened by that thread, so that zopkio.watchdog can interrupt a hung thread
+_clients_by_thread = {}
+_clients_lock = threading.Lock()
+
 
 class DeploymentError(Exception):
   """Represents an exception occurring in the deployment module
@@ -85,7 +92,14 @@ def exec_with_env(ssh, command, msg='', env={}, **kwargs):
   if kwargs.get('sync', True):
     return better_exec_command(ssh, new_command, msg)
   else:
-    return ssh.exec_command(new_command)
+    with tracing.span("exec_command", "remote", host=_peer_host(ssh), command=command, sync=False):
+      return ssh.exec_command(new_command)
+
+def _peer_host(ssh):
+  try:
+    return ssh.get_transport().getpeername()[0]
+  except Exception:
+    return None
 
 def better_exec_command(ssh, command, msg):
   """Uses paramiko to execute a command but handles failure by raising a ParamikoError if the command fails.
@@ -101,9 +115,10 @@ def better_exec_command(ssh, command, msg):
   :Raises  SSHException: if paramiko would raise an SSHException
   :Raises  ParamikoError: if the command produces output to stderr
   """
-  chan = ssh.get_transport().open_session()
-  chan.exec_command(command)
-  exit_status = chan.recv_exit_status()
+  with tracing.span("exec_command", "remote", host=_peer_host(ssh), command=command):
+    chan = ssh.get_transport().open_session()
+    chan.exec_command(command)
+    exit_status = chan.recv_exit_status()
   if exit_status != 0:
     msg_str = chan.recv_stderr(1024)
     err_msgs = []
@@ -196,17 +211,54 @@ def get_sftp_client(hostname, username=None, password=None):
         sftp.close()
 
 
+def split_host_port(hostname, default_port=22):
+  """
+  Splits a hostname of the form host:port, used to reach sshd on a non standard port
+
+  :param hostname: the hostname optionally followed by :port
+  :param default_port: the port used when none is given
+  :return: (host, port)
+  """
+  host, sep, port = hostname.rpartition(":")
+  if sep and host and port.isdigit() and ":" not in host:
+    return host, int(port)
+  return hostname, default_port
+
 @contextmanager
 def get_ssh_client(hostname, username=None, password=None):
+  """
+  :param hostname: the host to connect to, host:port connects to a non standard port
+  """
+  thread_id = threading.current_thread().ident
   try:
     ssh = sshclient()
+    with _clients_lock:
+      _clients_by_thread.setdefault(thread_id, set()).add(ssh)
     ssh.load_system_host_keys()
-    ssh.connect(hostname, username=username, password=password)
+    host, port = split_host_port(hostname)
+    with tracing.span("ssh_connect", "remote", host=hostname):
+      ssh.connect(host, port=port, username=username, password=password)
     yield ssh
   finally:
     if ssh is not None:
+      with _clients_lock:
+        clients = _clients_by_thread.get(thread_id, set())
+        clients.discard(ssh)
+        if len(clients) == 0:
+          _clients_by_thread.pop(thread_id, None)
       ssh.close()
 
+def close_ssh_clients(thread_id):
+  """
+  Closes the ssh clients currently opened by a thread, failing the remote commands the thread is blocked on
+
+  :param thread_id: the ident of the thread
+  """
+  with _clients_lock:
+    clients = list(_clients_by_thread.pop(thread_id, []))
+  for ssh in clients:
+    ssh.close()
+
 @contextmanager
 def get_remote_session(hostname, username=None, password=None):
   with get_ssh_client(hostname, username=username, password=password) as ssh:
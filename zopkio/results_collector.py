@@ -149,6 +149,18 @@ class ResultsCollector(object):
     return datetime.datetime.fromtimestamp(self.end_time).strftime('%Y-%m-%d %H:%M:%S')
 
 
+  def get_regressions(self):
+    """
+
+    :return: list of (config name, test name, regression) for every regression found in any test
+    """
+    regressions = []
+    for config_name in sorted(self.results.keys()):
+      for test_name, test_data in sorted(self.results[config_name].test_results.items()):
+        for regression in getattr(test_data, "regressions", []):
+          regressions.append((config_name, test_name, regression))
+    return regressions
+
   def get_config_result(self, config_name):
     return self.results[config_name].config_result
 
@@ -19,9 +19,13 @@
 
 from collections import defaultdict
 import os
+import threading
 import time
 
+from zopkio.histogram import Histogram
+from zopkio.latency import LatencyRecorder
 from zopkio.results_collector import ResultsCollector
+from zopkio.timings import TimingSeries
 
 _init_time = time.time()
 _username = None
@@ -30,6 +34,7 @@ _active_config = None
 _active_tests = {}
 _machine_names = defaultdict()
 _deployers = {}
+_measurements_lock = threading.Lock()
 _collector = ResultsCollector()
 _output_dir = os.path.join(os.getcwd(), time.strftime("zopkio_%Y%m%d_%H%M%S", time.localtime(_init_time)))
 
@@ -225,7 +230,11 @@ def set_active_tests(tests):
 
 
 def get_active_test_start_time(test_name):
-  return _active_tests[test_name].start_time
+  """
+  :return: the start of the metric window of the test, i.e. the end of its warmup if it has one
+  """
+  test = _active_tests[test_name]
+  return test.warmup_end_time if test.warmup_end_time is not None else test.start_time
 
 
 def get_active_test_end_time(test_name):
@@ -234,3 +243,58 @@ def get_active_test_end_time(test_name):
 
 def get_active_test_metrics(test_name):
   return _active_tests[test_name].naarad_stats
+
+
+def get_latency_recorder(test_name, recorder_name="latency", expected_interval=None):
+  """
+  Gets the latency recorder with the given name of an active test, creating it on first use. The uncorrected and the
+  coordinated omission corrected latencies of every recorder are shown in the reports.
+  :param test_name: the name of the test the latencies belong to
+  :param recorder_name: name of the recorder, a test can record several kinds of requests separately
+  :param expected_interval: seconds expected between two requests of the same client, used to back-fill the samples
+  missed while the server stalled, see zopkio.latency
+  :return: a zopkio.latency.LatencyRecorder
+  """
+  test = _active_tests[test_name]
+  # latencies recorded during the warmup are kept apart so that they do not show in the reports
+  recorders = test.warmup_measurements.setdefault("latency", {}) if test.in_warmup else test.latency_recorders
+  with _measurements_lock:
+    if recorder_name not in recorders:
+      recorders[recorder_name] = LatencyRecorder(expected_interval)
+    return recorders[recorder_name]
+
+
+def get_histogram(test_name, metric, **histogram_args):
+  """
+  Gets the histogram recording the given metric of an active test, creating it on first use. The histogram is thread
+  safe so it can be shared by the threads of a test, and its summary appears in the reports.
+  :param test_name: the name of the test the measurements belong to
+  :param metric: name of the measured metric
+  :param histogram_args: arguments of zopkio.histogram.Histogram (unit, highest_value, significant_digits) used when
+  the histogram is created; by default values are seconds with microsecond resolution up to an hour
+  :return: a zopkio.histogram.Histogram
+  """
+  test = _active_tests[test_name]
+  histograms = test.warmup_measurements.setdefault("histograms", {}) if test.in_warmup else test.histograms
+  with _measurements_lock:
+    if metric not in histograms:
+      histograms[metric] = Histogram(**histogram_args)
+    return histograms[metric]
+
+
+def record_iteration_metric(test_name, metric, value):
+  """
+  Records the value a metric took in the current iteration of an active test, e.g. the throughput the iteration
+  achieved. A stopping rule (see zopkio.adaptive) can use these values to decide when the test ran enough iterations.
+  Values recorded during the warmup of the test are ignored.
+  :param test_name: the name of the test the value belongs to
+  :param metric: name of the metric
+  :param value: the value of the metric in the current iteration
+  """
+  test = _active_tests[test_name]
+  if test.in_warmup:
+    return
+  with _measurements_lock:
+    if metric not in test.iteration_metrics:
+      test.iteration_metrics[metric] = TimingSeries()
+    test.iteration_metrics[metric].add(value, test.current_iteration)
@@ -0,0 +1,261 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Runs tests that depend on each other and share resources on a bounded pool of workers.
+
+Each test may depend on other tests and be tagged with resources (e.g. zookeeper); a test starts as soon as every test
+it depends on succeeded and, for every one of its resources, fewer tests than the limit of the resource (1 by default)
+are running. When several tests are ready the one with the longest chain of tests depending on it starts first so that
+the critical path is not delayed. The tests depending, directly or not, on a test that did not succeed are skipped.
+A test may also only be ordered after other tests, in which case it starts once they finished or were skipped whatever
+their outcome; an ordering that contradicts the dependencies is ignored.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESOURCE_LIMIT = 1
+
+
+def parse_resource_limits(limits):
+  """
+  :param limits: a dict of resource to the number of tests that may use it at once, or a string such as
+                 "zookeeper:1,kafka:3" as found in properties config files
+  :return: dict of resource to limit
+  """
+  if not limits:
+    return {}
+  if isinstance(limits, dict):
+    return dict((resource, int(limit)) for resource, limit in limits.items())
+  parsed = {}
+  for item in limits.split(","):
+    resource, _, limit = item.strip().partition(":")
+    if not resource or not limit.strip().isdigit():
+      raise ValueError("resource limits must be of the form resource:limit, got {0}".format(item))
+    parsed[resource] = int(limit)
+  return parsed
+
+
+class DagScheduler(object):
+  """
+  Schedules named tasks forming a directed acyclic graph of dependencies on a pool of worker threads
+  """
+  def __init__(self, names, dependencies, resources=None, max_workers=1, resource_limits=None, after=None):
+    """
+    :param names: the names of the tasks, ties between ready tasks are broken by this order
+    :param dependencies: dict of name to the names of the tasks it depends on; unknown names are ignored
+    :param resources: dict of name to the resources it uses
+    :param max_workers: the maximum number of tasks running at once
+    :param resource_limits: dict of resource to the maximum number of tasks using it at once
+    :param after: dict of name to the names of the tasks it runs after, whether they succeed or not; unknown names
+                  and the orderings which would form a cycle with the dependencies are ignored
+    :raises ValueError: if the dependencies have a cycle
+    """
+    if max_workers < 1:
+      raise ValueError("max_workers must be at least 1")
+    self.names = list(names)
+    self.max_workers = max_workers
+    self.resources = dict((name, list((resources or {}).get(name) or [])) for name in self.names)
+    self.resource_limits = resource_limits or {}
+    known = set(self.names)
+    self.dependencies = {}
+    self.after = {}
+    for name in self.names:
+      self.dependencies[name] = []
+      for dependency in (dependencies.get(name) or []):
+        if dependency in known:
+          self.dependencies[name].append(dependency)
+        else:
+          logger.warning("{0} depends on {1} which is not run, ignoring the dependency".format(name, dependency))
+      self.after[name] = [earlier for earlier in ((after or {}).get(name) or []) if earlier in known]
+    self.dependents = dict((name, []) for name in self.names)
+    self.followers = dict((name, []) for name in self.names)
+    for name in self.names:
+      for dependency in self.dependencies[name]:
+        self.dependents[dependency].append(name)
+      for earlier in self.after[name]:
+        self.followers[earlier].append(name)
+    order = self._topological_order()
+    if len(order) < len(self.names):
+      order = self._break_cycles()
+    self._priority = self._compute_priorities(order)
+
+  def _topological_order(self):
+    """
+    :return: the names ordered so that every task comes after the tasks it waits for, without the tasks which are part
+             of or wait for a cycle
+    """
+    counts = dict((name, len(set(self.dependencies[name]) | set(self.after[name]))) for name in self.names)
+    ready = [name for name in self.names if counts[name] == 0]
+    order = []
+    while len(ready) > 0:
+      name = ready.pop()
+      order.append(name)
+      for waiting in set(self.dependents[name]) | set(self.followers[name]):
+        counts[waiting] -= 1
+        if counts[waiting] == 0:
+          ready.append(waiting)
+    return order
+
+  def _break_cycles(self):
+    """
+    Drops the orderings which form a cycle with the dependencies, e.g. a task ordered after a task depending on it
+
+    :return: the topological order of the remaining graph
+    :raises ValueError: if the dependencies alone have a cycle
+    """
+    after = self.after
+    self.after = dict((name, []) for name in self.names)
+    self.followers = dict((name, []) for name in self.names)
+    order = self._topological_order()
+    if len(order) < len(self.names):
+      cycle = sorted(set(self.names) - set(order))
+      raise ValueError("the dependencies of {0} form a cycle".format(", ".join(cycle)))
+    for name in self.names:
+      for earlier in after[name]:
+        if self._waits_for(earlier, name):
+          logger.warning("{0} depends on {1}, ignoring that it is ordered after it".format(earlier, name))
+        else:
+          self.after[name].append(earlier)
+          self.followers[earlier].append(name)
+    return self._topological_order()
+
+  def _waits_for(self, name, other):
+    """
+    :return: True if name waits, directly or not, for other to finish
+    """
+    seen = set()
+    to_visit = [name]
+    while len(to_visit) > 0:
+      current = to_visit.pop()
+      if current == other:
+        return True
+      if current not in seen:
+        seen.add(current)
+        to_visit.extend(self.dependencies[current] + self.after[current])
+    return False
+
+  def _compute_priorities(self, order):
+    """
+    :param order: the names in topological order
+    :return: dict of name to (length of the longest chain of dependents and followers, -position) so that max picks the
+             next task
+    """
+    heights = {}
+    for name in reversed(order):
+      heights[name] = 1 + max([heights[waiting] for waiting in self.dependents[name] + self.followers[name]] or [0])
+    return dict((name, (heights[name], -position)) for position, name in enumerate(self.names))
+
+  def run(self, execute, skip=None):
+    """
+    Runs every task, returning once all of them finished or were skipped
+
+    :param execute: function called with the name of a task on a worker thread, returns True if the task succeeded
+    :param skip: function called with the name of a task skipped and the name of the dependency that did not succeed
+    :return: dict of name to True (succeeded), False (failed) or None (skipped)
+    """
+    outcomes = {}
+    waiting = dict((name, set(self.dependencies[name]) | set(self.after[name])) for name in self.names)
+    in_use = {}
+    running = []
+    errors = []
+    condition = threading.Condition()
+
+    def next_ready():
+      ready = [name for name, dependencies in waiting.items() if len(dependencies) == 0 and
+               all(in_use.get(resource, 0) < self.resource_limits.get(resource, DEFAULT_RESOURCE_LIMIT)
+                   for resource in self.resources[name])]
+      return max(ready, key=lambda name: self._priority[name]) if len(ready) > 0 else None
+
+    def finish(name, succeeded):
+      """
+      Records the outcome of a task, called with the condition held
+
+      :return: list of (skipped task, failed dependency)
+      """
+      outcomes[name] = succeeded
+      running.remove(name)
+      for resource in self.resources[name]:
+        in_use[resource] -= 1
+      skipped = []
+      for follower in self.followers[name]:
+        if follower in waiting:
+          waiting[follower].discard(name)
+      if succeeded:
+        for dependent in self.dependents[name]:
+          if dependent in waiting:
+            waiting[dependent].discard(name)
+      else:
+        to_skip = [(dependent, name) for dependent in self.dependents[name]]
+        while len(to_skip) > 0:
+          dependent, failed = to_skip.pop()
+          if dependent in waiting:
+            del waiting[dependent]
+            outcomes[dependent] = None
+            skipped.append((dependent, failed))
+            for follower in self.followers[dependent]:
+              if follower in waiting:
+                waiting[follower].discard(dependent)
+            to_skip.extend((transitive, failed) for transitive in self.dependents[dependent])
+      condition.notify_all()
+      return skipped
+
+    def worker():
+      while True:
+        with condition:
+          while True:
+            if len(waiting) == 0 or len(errors) > 0:
+              return
+            name = next_ready()
+            if name is not None:
+              break
+            if len(running) == 0:
+              errors.append(ValueError("cannot run {0} within the resource limits".format(", ".join(sorted(waiting)))))
+              condition.notify_all()
+              return
+            condition.wait()
+          del waiting[name]
+          running.append(name)
+          for resource in self.resources[name]:
+            in_use[resource] = in_use.get(resource, 0) + 1
+        succeeded = False
+        try:
+          succeeded = bool(execute(name))
+        except BaseException as e:
+          with condition:
+            errors.append(e)
+        finally:
+          with condition:
+            skipped = finish(name, succeeded)
+        if skip is not None:
+          for dependent, failed in skipped:
+            skip(dependent, failed)
+
+    threads = [threading.Thread(target=worker, name="zopkio-scheduler-{0}".format(index))
+               for index in xrange(min(self.max_workers, len(self.names)))]
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+    for thread in threads:
+      thread.join()
+    if len(errors) > 0:
+      raise errors[0]
+    return outcomes
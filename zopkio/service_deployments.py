@@ -0,0 +1,165 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Keeps services deployed across configs, redeploying only the services whose configs changed.
+
+A deployment module opts in by declaring, with `service_config_keys`, the config keys each of its services depends on
+and by providing `setup_service(service)` and `teardown_service(service)`::
+
+  service_config_keys = [("zookeeper", ["zookeeper_heap"]), ("client", ["zookeeper_heap", "client_threads"])]
+
+The services are listed in the order they are deployed and torn down in the reverse order; None instead of a list of
+keys redeploys the service for every config. A service depending on another one should list the keys of the other
+service as well so that it is redeployed with it. `setup_suite` runs before the first config and `teardown_suite` after
+the last one.
+"""
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the number of configs order_configs picks the next config from
+DEFAULT_ORDER_WINDOW = 100
+
+
+def get_services(deployment_module):
+  """
+  :param deployment_module: the deployment module or ZTestSuite of the run
+  :return: list of (service, config keys or None) in deployment order, or None if the module does not declare its
+           services; a dict is ordered by service name
+  """
+  services = getattr(deployment_module, "service_config_keys", None)
+  if services is None:
+    return None
+  if callable(services):
+    services = services()
+  if isinstance(services, dict):
+    services = sorted(services.items())
+  for required in ["setup_service", "teardown_service"]:
+    if not hasattr(deployment_module, required):
+      raise ValueError("a deployment module declaring service_config_keys must define {0}(service)".format(required))
+  return [(service, list(keys) if keys is not None else None) for service, keys in services]
+
+
+def _values(keys, mapping):
+  return [mapping.get(key) for key in keys]
+
+
+def changed_services(services, previous_mapping, mapping):
+  """
+  :param services: list of (service, config keys or None)
+  :param previous_mapping: the mapping the services are deployed with, None if nothing is deployed
+  :param mapping: the mapping of the next config
+  :return: the services that have to be redeployed for mapping, in deployment order
+  """
+  return [service for service, keys in services
+          if previous_mapping is None or keys is None or _values(keys, previous_mapping) != _values(keys, mapping)]
+
+
+def order_configs(configs, services, window=DEFAULT_ORDER_WINDOW):
+  """
+  Orders configs so that consecutive configs redeploy as few services as possible: starting from the first config
+  each next config is the one needing the fewest redeploys among the next window configs, ties keep the original order
+
+  :param configs: list or iterable, e.g. a zopkio.config_matrix.ConfigMatrix, of configobj.Config, iterated once and
+                  lazily so that only window configs are held at a time
+  :param services: list of (service, config keys or None)
+  :param window: the number of configs the next config is picked from
+  :return: generator of the reordered configs
+  """
+  pending = iter(configs)
+  # candidates keeps the original order so that the lowest position breaks ties
+  candidates = list(itertools.islice(pending, window))
+  previous = None
+  while len(candidates) > 0:
+    best = 0
+    if previous is not None:
+      best = min(xrange(len(candidates)),
+                 key=lambda position: (len(changed_services(services, previous.mapping,
+                                                            candidates[position].mapping)), position))
+    previous = candidates.pop(best)
+    yield previous
+    candidates.extend(itertools.islice(pending, 1))
+
+
+class ServiceDeployments(object):
+  """
+  The services currently deployed by a deployment module and the config values they were deployed with
+  """
+  def __init__(self, deployment_module, services):
+    """
+    :param deployment_module: module or ZTestSuite defining setup_service and teardown_service
+    :param services: list of (service, config keys or None), see get_services
+    """
+    self.deployment_module = deployment_module
+    self.services = services
+    self.suite_set_up = False
+    # service -> the mapping of the config it was deployed for
+    self.deployed = {}
+
+  def deploy(self, config, call_phase):
+    """
+    Sets up the suite on first use, then tears down the services whose config keys changed since they were deployed,
+    in reverse order, and sets them up again for config
+
+    :param config: the config about to run
+    :param call_phase: function(phase, function, description) calling a phase, e.g. with its timeout
+    :return: (redeployed services, reused services)
+    """
+    module = self.deployment_module
+    if not self.suite_set_up:
+      if hasattr(module, "setup_suite"):
+        call_phase("setup_suite", module.setup_suite, "setup_suite()")
+      self.suite_set_up = True
+    changed = [service for service, keys in self.services
+               if service not in self.deployed or
+               len(changed_services([(service, keys)], self.deployed[service], config.mapping)) > 0]
+    for service in reversed(changed):
+      if service in self.deployed:
+        # forgotten first so that a service failing to tear down is deployed again rather than reused
+        del self.deployed[service]
+        call_phase("teardown_suite", lambda: module.teardown_service(service), "teardown_service({0})".format(service))
+    for service in changed:
+      call_phase("setup_suite", lambda: module.setup_service(service), "setup_service({0})".format(service))
+      self.deployed[service] = config.mapping
+    reused = [service for service, keys in self.services if service not in changed]
+    logger.info("Configuration {0}: redeployed {1}, reused {2}".format(config.name, changed, reused))
+    return changed, reused
+
+  def undeploy(self, call_phase):
+    """
+    Tears down every deployed service in reverse order, then the suite
+    """
+    module = self.deployment_module
+    error = None
+    for service, keys in reversed(self.services):
+      if service in self.deployed:
+        del self.deployed[service]
+        try:
+          call_phase("teardown_suite", lambda: module.teardown_service(service), "teardown_service({0})".format(service))
+        except BaseException as e:
+          logger.error("teardown_service({0}) failed: {1}".format(service, e))
+          error = error or e
+    if self.suite_set_up:
+      self.suite_set_up = False
+      if hasattr(module, "teardown_suite"):
+        call_phase("teardown_suite", module.teardown_suite, "teardown_suite()")
+    if error is not None:
+      raise error
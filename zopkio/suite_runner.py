@@ -0,0 +1,347 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Runs several ZTestSuites of a testfile and merges their results.
+
+Each suite gets its own TestRunner, report directory and a subdirectory of its logs directory named after it. By
+default the suites run one after the other. In parallel mode every suite runs in a separate process, with its own copy
+of the runtime state, as soon as it does not share a host with a suite that is running: the hosts of a suite are given
+by its `hosts` attribute, a suite without hosts runs alone. The merged results are written to
+OUTPUT_DIR/reports/<testfile>_<date>: suites.json with the results directory, counts and report of every suite,
+rewritten whenever a suite starts or finishes so that an interrupted run can be resumed from it, and, once every suite
+finished, suites.html linking to the reports and, for suites using the junit reporter, zopkio_junit_reports.xml holding
+the testsuites of all of them.
+"""
+import json
+import logging
+import os
+import Queue
+import time
+import traceback
+import xml.etree.ElementTree as ElementTree
+
+import zopkio.checkpoint as checkpoint
+import zopkio.constants as constants
+import zopkio.runtime as runtime
+from zopkio.test_runner import TestRunner
+import zopkio.test_runner_helper as test_runner_helper
+import zopkio.utils as utils
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = "suites.json"
+SUMMARY_PAGE = "suites.html"
+SUMMARY_PAGE_TEMPLATE = "suites_page.html"
+JUNIT_REPORT_FILE = "zopkio_junit_reports.xml"
+
+# seconds between two checks for finished suite processes
+_POLL_INTERVAL = 0.1
+
+
+def suite_names(ztestsuites):
+  """
+  :param ztestsuites: list of (attribute name, ZTestSuite) found in the testfile
+  :return: list of (suite name, ZTestSuite); suites are named after their class, and after the attribute holding them
+           as well when several suites share a class
+  """
+  class_names = [ztestsuite.__class__.__name__ for _, ztestsuite in ztestsuites]
+  return [(class_name if class_names.count(class_name) == 1 else "{0}_{1}".format(class_name, attr), ztestsuite)
+          for class_name, (attr, ztestsuite) in zip(class_names, ztestsuites)]
+
+
+def suite_hosts(ztestsuite):
+  """
+  :return: the set of physical hosts of the suite or None if it did not list them
+  """
+  hosts = getattr(ztestsuite, "hosts", None)
+  if hosts is None:
+    return None
+  physical_hosts = set()
+  for host in hosts:
+    try:
+      physical_hosts.add(runtime.get_machine(host))
+    except KeyError:
+      # not a logical name from the machine list
+      physical_hosts.add(host)
+  return physical_hosts
+
+
+def _run_suite(name, ztestsuite, testlist, config_overrides, resume_dir):
+  """
+  Runs a suite with a TestRunner
+
+  :return: dict summarizing the run of the suite
+  """
+  summary = {
+      "name": name,
+      "hosts": sorted(getattr(ztestsuite, "hosts", None) or []),
+      "start_time": time.time(),
+      "passed": 0,
+      "failed": 0,
+      "report": None,
+      "results_dir": None,
+      "logs_dir": None,
+      "error": None
+  }
+  try:
+    runner = TestRunner(ztestsuite=ztestsuite, testlist=testlist, config_overrides=config_overrides,
+                        resume_dir=resume_dir, suite_name=name)
+    summary["logs_dir"] = runner.get_logs_dir()
+    runner.run()
+    summary["passed"] = runner.success_count()
+    summary["failed"] = runner.fail_count()
+    summary["report"] = runner.reporter.get_report_location()
+    summary["results_dir"] = runner.directory_info["results_dir"]
+    summary["junit"] = runner.master_config.mapping.get("junit_reporter", False)
+  except Exception:
+    summary["error"] = traceback.format_exc()
+    logger.error("Suite {0} failed:\n{1}".format(name, summary["error"]))
+  summary["end_time"] = time.time()
+  return summary
+
+
+def _run_suite_in_process(queue, name, ztestsuite, testlist, config_overrides, resume_dir):
+  # the process starts with a copy of the runtime state of the parent, the deployers and results are its own
+  runtime.reset_deployers()
+  runtime.reset_collector()
+  queue.put(_run_suite(name, ztestsuite, testlist, config_overrides, resume_dir))
+
+
+class SuiteRunner(object):
+  """
+  Runs the ZTestSuites of a testfile, one after the other or in parallel
+  """
+  def __init__(self, testfile, ztestsuites, testlist=None, config_overrides=None, resume_dir=None, parallel=False,
+               max_parallel=None):
+    """
+    :param testfile: the path of the testfile, used to name the merged report
+    :param ztestsuites: list of (attribute name, ZTestSuite) found in the testfile
+    :param testlist: run only the named tests
+    :param config_overrides: config overrides applied to every suite
+    :param resume_dir: the merged results directory of an interrupted run to resume
+    :param parallel: run suites with disjoint hosts at the same time in separate processes
+    :param max_parallel: the maximum number of suites running at once in parallel mode, None for no limit
+    """
+    self.testfile = testfile
+    self.suites = suite_names(ztestsuites)
+    self.testlist = testlist
+    self.config_overrides = config_overrides or {}
+    self.resume_dir = resume_dir
+    self.parallel = parallel
+    self.max_parallel = max_parallel
+    self.summaries = []
+    # suite name -> the summary of a suite that started and did not finish yet
+    self._running = {}
+    self.results_dir = None
+    self._start_time = None
+
+  def success_count(self):
+    return sum(summary["passed"] for summary in self.summaries)
+
+  def fail_count(self):
+    # a suite that could not run at all counts as one failure
+    return sum(summary["failed"] or (1 if summary["error"] is not None else 0) for summary in self.summaries)
+
+  def _resume_dirs(self):
+    """
+    :return: dict of suite name to the results directory to resume the suite from, for the suites that checkpointed
+             their progress
+    """
+    if self.resume_dir is None:
+      return {}
+    summary_file = os.path.join(self.resume_dir, SUMMARY_FILE)
+    if not os.path.exists(summary_file):
+      raise ValueError("{0} is not the results directory of several suites, it has no {1}".format(self.resume_dir,
+                                                                                                   SUMMARY_FILE))
+    with open(summary_file) as f:
+      return dict((summary["name"], summary["results_dir"]) for summary in json.load(f)["suites"]
+                  if summary.get("results_dir") is not None and
+                  os.path.exists(os.path.join(summary["results_dir"], checkpoint.CHECKPOINT_FILE)))
+
+  def run(self):
+    """
+    Runs the suites and writes the merged report
+    """
+    if self.resume_dir is not None:
+      self.results_dir = os.path.abspath(self.resume_dir)
+    else:
+      report_name = os.path.splitext(os.path.basename(self.testfile))[0] + \
+          time.strftime("_%Y%m%d_%H%M%S", time.localtime(runtime.get_init_time()))
+      self.results_dir = os.path.join(runtime.get_reports_dir(), report_name)
+    resume_dirs = self._resume_dirs()
+    self._start_time = time.time()
+    if self.parallel:
+      self._run_parallel(resume_dirs)
+    else:
+      self._run_serial(resume_dirs)
+    order = [name for name, _ in self.suites]
+    self.summaries.sort(key=lambda summary: order.index(summary["name"]))
+    self._write_report(time.time())
+
+  def _suite_started(self, name, ztestsuite, resume_dir):
+    """
+    Records in the summary file that a suite started, with the results directory its TestRunner uses
+    """
+    self._running[name] = {
+        "name": name,
+        "hosts": sorted(getattr(ztestsuite, "hosts", None) or []),
+        "start_time": time.time(),
+        "passed": 0,
+        "failed": 0,
+        "report": None,
+        "results_dir": os.path.abspath(resume_dir) if resume_dir is not None else
+                       os.path.join(runtime.get_reports_dir(), test_runner_helper.get_report_name(name)),
+        "logs_dir": None,
+        "error": None,
+        "end_time": None
+    }
+    self._write_summary()
+
+  def _suite_finished(self, summary):
+    del self._running[summary["name"]]
+    self.summaries.append(summary)
+    self._write_summary()
+
+  def _run_serial(self, resume_dirs):
+    for index, (name, ztestsuite) in enumerate(self.suites):
+      if index > 0:
+        runtime.reset_deployers()
+        runtime.reset_collector()
+      logger.info("Running suite {0}".format(name))
+      self._suite_started(name, ztestsuite, resume_dirs.get(name))
+      self._suite_finished(_run_suite(name, ztestsuite, self.testlist, self.config_overrides, resume_dirs.get(name)))
+
+  def _can_start(self, hosts, running):
+    if self.max_parallel and len(running) >= self.max_parallel:
+      return False
+    if len(running) == 0:
+      return True
+    if hosts is None:
+      return False
+    for running_hosts in running.values():
+      if running_hosts is None or len(running_hosts & hosts) > 0:
+        return False
+    return True
+
+  def _run_parallel(self, resume_dirs):
+    # multiprocessing is slow to import and only needed in parallel mode
+    import multiprocessing
+    queue = multiprocessing.Queue()
+    pending = [(name, ztestsuite, suite_hosts(ztestsuite)) for name, ztestsuite in self.suites]
+    running = {}
+    processes = {}
+    while len(pending) > 0 or len(running) > 0:
+      # a suite may start before an earlier one that is waiting for its hosts, unless the earlier one runs alone
+      for name, ztestsuite, hosts in list(pending):
+        if self._can_start(hosts, running):
+          logger.info("Starting suite {0} on {1}".format(name, ", ".join(sorted(hosts)) if hosts else "any host"))
+          process = multiprocessing.Process(target=_run_suite_in_process, name="zopkio-suite-" + name,
+                                            args=(queue, name, ztestsuite, self.testlist, self.config_overrides,
+                                                  resume_dirs.get(name)))
+          self._suite_started(name, ztestsuite, resume_dirs.get(name))
+          process.start()
+          running[name] = hosts
+          processes[name] = process
+          pending.remove((name, ztestsuite, hosts))
+        elif hosts is None:
+          break
+      self._collect(queue, running, processes)
+
+  def _collect(self, queue, running, processes):
+    """
+    Waits for a suite process to report its summary or to die without one
+    """
+    try:
+      summary = queue.get(timeout=_POLL_INTERVAL)
+    except Queue.Empty:
+      # a suite process that exits normally put its summary in the queue first, the others crashed
+      for name, process in processes.items():
+        if not process.is_alive() and process.exitcode != 0:
+          del processes[name]
+          del running[name]
+          summary = dict(self._running[name])
+          summary["error"] = "the suite process exited with status {0}".format(process.exitcode)
+          self._suite_finished(summary)
+          logger.error("Suite {0} exited with status {1}".format(name, process.exitcode))
+      return
+    processes.pop(summary["name"]).join()
+    del running[summary["name"]]
+    self._suite_finished(summary)
+    logger.info("Suite {0} finished: {1} passed, {2} failed".format(summary["name"], summary["passed"],
+                                                                    summary["failed"]))
+
+  def _write_summary(self, end_time=None):
+    """
+    Atomically rewrites the summary file with the finished suites and those still running
+
+    :param end_time: when every suite finished, None while they run
+    :return: the summary
+    """
+    utils.makedirs(self.results_dir)
+    order = [name for name, _ in self.suites]
+    summary = {
+        "testfile": self.testfile,
+        "parallel": self.parallel,
+        "start_time": self._start_time,
+        "end_time": end_time,
+        "passed": self.success_count(),
+        "failed": self.fail_count(),
+        "suites": sorted(self.summaries + self._running.values(), key=lambda suite: order.index(suite["name"]))
+    }
+    path = os.path.join(self.results_dir, SUMMARY_FILE)
+    with open(path + ".tmp", "w") as f:
+      json.dump(summary, f, indent=2, sort_keys=True)
+    os.rename(path + ".tmp", path)
+    return summary
+
+  def _write_report(self, end_time):
+    summary = self._write_summary(end_time)
+    self._write_page(summary)
+    junit_reports = [suite["report"] for suite in self.summaries
+                     if suite.get("junit") and suite["report"] is not None and os.path.exists(suite["report"])]
+    if len(junit_reports) > 0:
+      merge_junit_reports(junit_reports, os.path.join(self.results_dir, JUNIT_REPORT_FILE))
+
+  def _write_page(self, summary):
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(constants.WEB_RESOURCE_DIR), autoescape=True)
+    links = dict((suite["name"], os.path.relpath(suite["report"], self.results_dir)) for suite in summary["suites"]
+                 if suite["report"] is not None)
+    page = env.get_template(SUMMARY_PAGE_TEMPLATE).render(page_title=os.path.basename(self.results_dir),
+                                                          summary=summary, links=links)
+    with open(os.path.join(self.results_dir, SUMMARY_PAGE), "w") as f:
+      f.write(page.encode("utf-8"))
+
+
+def merge_junit_reports(paths, output_path):
+  """
+  Writes the testsuites of several JUnit XML reports into one
+  """
+  merged = ElementTree.Element("testsuites")
+  for path in paths:
+    try:
+      root = ElementTree.parse(path).getroot()
+    except ElementTree.ParseError as e:
+      logger.error("Cannot merge the JUnit report {0}: {1}".format(path, e))
+      continue
+    testsuites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+    for testsuite in testsuites:
+      merged.append(testsuite)
+  ElementTree.ElementTree(merged).write(output_path, encoding="utf-8")
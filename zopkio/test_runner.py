@@ -21,21 +21,28 @@
 Runs tests.
 """
 
+import json
 import logging
+import os
 import threading
 import time
 import traceback
 import webbrowser
 from pkgutil import iter_modules
 
-from naarad import Naarad
-
+import zopkio.checkpoint as checkpoint
+from zopkio.config_matrix import ConfigMatrix, MATRIX_KEY
 import zopkio.constants as constants
 import zopkio.error_messages as error_messages
-from zopkio import html_reporter, junit_reporter
+import zopkio.events as events
+import zopkio.regression as regression
 import zopkio.runtime as runtime
+import zopkio.scheduler as scheduler
+from zopkio.service_deployments import ServiceDeployments, get_services, order_configs
 import zopkio.test_runner_helper as test_runner_helper
+import zopkio.tracing as tracing
 import zopkio.utils as utils
+import zopkio.watchdog as watchdog
 
 logger = logging.getLogger(__name__)
 
@@ -70,13 +77,20 @@ class TestRunner(object):
   """
   Runs tests with the information given in the testfile
   """
+  _checkpoint = None
+  _suite_name = None
+  # the configs run so far, in order; self.configs may be a lazy zopkio.config_matrix.ConfigMatrix
+  _executed_configs = ()
 
   def __init__(self, *args, **kwargs):
     """
 
-    :param kwargs:
+    :param kwargs: resume_dir, the results directory of an interrupted run to resume, is accepted by both constructors
+                   as is suite_name, set when several suites of a testfile run together: it names the reports instead
+                   of the testfile and is a subdirectory of the logs and measurements directories
     :return:
     """
+    self._suite_name = kwargs.get("suite_name")
     if ('ztestsuite' in kwargs):
       self._new_constuctor(**kwargs)
     elif (len(args) >= 3):
@@ -84,6 +98,10 @@ class TestRunner(object):
     #create logs dir
     self._logs_dir = self.master_config.mapping.get("LOGS_DIRECTORY") if "LOGS_DIRECTORY" in self.master_config.mapping else \
       self.dynamic_config_module.LOGS_DIRECTORY
+    if self._suite_name is not None:
+      self._logs_dir = os.path.join(self._logs_dir, self._suite_name)
+      # directory_setup reads the logs directory from the master config
+      self.master_config.mapping["LOGS_DIRECTORY"] = self._logs_dir
     try:
       utils.makedirs(self._logs_dir)
     except:
@@ -120,6 +138,8 @@ class TestRunner(object):
     self._output_dir = self.master_config.mapping.get("OUTPUT_DIRECTORY") or self.dynamic_config_module.OUTPUT_DIRECTORY
     self._failed_count = 0
     self._success_count = 0
+    self._regression_detector = None
+    self._resume_dir = kwargs.get("resume_dir")
 
   def _old_constructor(self, testfile, tests_to_run, config_overrides):
     self.testfile = testfile
@@ -131,7 +151,7 @@ class TestRunner(object):
 
   def _new_constuctor(self, **kwargs):
     ztestsuite = kwargs['ztestsuite']
-    self.testfile = ztestsuite.__class__.__name__
+    self.testfile = kwargs.get("suite_name") or ztestsuite.__class__.__name__
     self.deployment_module = ztestsuite
     self.dynamic_config_module = ztestsuite
     self.tests = ztestsuite.get_tests(**kwargs)
@@ -160,33 +180,76 @@ class TestRunner(object):
     """
     This is the main executable function that will run the test
     """
+    tracer = tracing.get_tracer()
+    tracer.reset()
+    tracer.enabled = self.master_config.mapping.get("tracing", True)
     self._setup()
+    service_deployments = None
+    services = get_services(self.deployment_module) if self.master_config.mapping.get("reuse_deployments", True) \
+        else None
+    configs = self.configs
+    if services is not None:
+      service_deployments = ServiceDeployments(self.deployment_module, services)
+      # ordered lazily, a config matrix is not materialized
+      configs = order_configs(self.configs, services)
+    stream = events.get_event_stream()
+    if self.master_config.mapping.get("events", True):
+      stream.open(os.path.join(self.directory_info["results_dir"], "events.jsonl"),
+                  self.master_config.mapping.get("events_socket"))
+    if isinstance(self.configs, ConfigMatrix):
+      # counting the configs of a matrix would generate all of them
+      stream.emit("run_started", report=self.directory_info["report_name"],
+                  config_matrix=self.master_config.mapping.get(MATRIX_KEY))
+    else:
+      stream.emit("run_started", report=self.directory_info["report_name"], configs=len(self.configs))
     failure_handler = FailureHandler(self.master_config.mapping.get("max_suite_failures_before_abort"))
-
-    naarad_obj = Naarad()
-    for config in self.configs:
+    if self._resume_dir is not None and self.master_config.mapping.get("resume_cleanup", True):
+      self._checkpoint.cleanup_processes()
+
+    naarad_obj = None
+    if not self._no_perf():
+      # naarad pulls in numpy and friends, so it is only imported when performance analysis is on
+      from naarad import Naarad
+      naarad_obj = Naarad()
+    self._executed_configs = []
+    for config in configs:
       config.mapping.iterkeys()
       self._reset_tests()
-      if not failure_handler.get_abort_status():
+      restored = self._checkpoint is not None and self._checkpoint.is_config_finished(config.name)
+      if restored:
+        self._checkpoint.restore_config(config, self._get_all_tests())
+        stream.emit("config_restored", config=config.name, result=config.result)
+        logger.info("Restored the results of configuration {0} from the checkpoint".format(config.name))
+      elif not failure_handler.get_abort_status():
         config.result = constants.SKIPPED
         config.message += error_messages.CONFIG_ABORT
         self._skip_all_tests()
+        stream.emit("config_skipped", config=config.name, reason="too many setup_suite/teardown_suite failures")
         logger.debug("Skipping " + config.name + "due to too many setup_suite/teardown_suite failures")
       else:
         runtime.set_active_config(config)
+        self._executed_configs.append(config)
         setup_fail = False
-        if not self.master_config.mapping.get("no_perf", False):
+        if not self._no_perf():
           try:
             naarad_config_file = self.dynamic_config_module.naarad_config()
           except TypeError: # Support backwards compatability
             naarad_config_file = self.dynamic_config_module.naarad_config(config.mapping)
-          config.naarad_id = naarad_obj.signal_start(naarad_config_file)
+          with tracing.span("naarad_signal_start", "runner", config=config.name):
+            config.naarad_id = naarad_obj.signal_start(naarad_config_file)
         config.start_time = time.time()
+        stream.emit("config_started", config=config.name)
 
         logger.info("Setting up configuration: " + config.name)
         try:
-          if hasattr(self.deployment_module, 'setup_suite'):
-            self.deployment_module.setup_suite()
+          if service_deployments is not None:
+            with tracing.span("deploy_services", "runner", config=config.name):
+              redeployed, reused = service_deployments.deploy(config, self._call_phase)
+            stream.emit("services_deployed", config=config.name, redeployed=redeployed, reused=reused)
+          elif hasattr(self.deployment_module, 'setup_suite'):
+            with tracing.span("setup_suite", "runner", config=config.name):
+              self._call_phase("setup_suite", self.deployment_module.setup_suite,
+                               "setup_suite() of {0}".format(config.name))
         except BaseException:
           config.result = constants.SKIPPED
           config.message += error_messages.SETUP_SUITE_FAILED + traceback.format_exc()
@@ -197,12 +260,16 @@ class TestRunner(object):
         else:
           try:
             logger.debug("Running tests for configuration: " + config.name)
-            self._execute_run(config, naarad_obj)
+            with tracing.span("execute_run", "runner", config=config.name):
+              self._execute_run(config, naarad_obj)
             logger.debug("Tearing down configuration: " + config.name)
           finally:
             try:
-              if hasattr(self.deployment_module, 'teardown_suite'):
-                self.deployment_module.teardown_suite()
+              # deployed services are kept for the next config, they are torn down after the last one
+              if service_deployments is None and hasattr(self.deployment_module, 'teardown_suite'):
+                with tracing.span("teardown_suite", "runner", config=config.name):
+                  self._call_phase("teardown_suite", self.deployment_module.teardown_suite,
+                                   "teardown_suite() of {0}".format(config.name))
               if not setup_fail:
                 failure_handler.notify_success()
             except BaseException:
@@ -212,8 +279,10 @@ class TestRunner(object):
               logger.error("{0} failed teardown_suite(). {1}".format(config.name, traceback.format_exc()))
         finally:
           # kill all orphaned process
-          for deployer in runtime.get_deployers():
-            deployer.kill_all_process()
+          if service_deployments is None:
+            with tracing.span("kill_all_process", "runner", config=config.name):
+              for deployer in runtime.get_deployers():
+                deployer.kill_all_process()
 
         config.end_time = time.time()
         logger.info("Execution of configuration: {0} complete".format(config.name))
@@ -221,15 +290,53 @@ class TestRunner(object):
       tests = [test for test in self.tests if not isinstance(test, list)] +\
             [individual_test for test in self.tests if isinstance(test, list) for individual_test in test]
       runtime.get_collector().collect(config, tests)
+      if self._checkpoint is not None and not restored:
+        self._checkpoint.config_finished(config, tests)
+      results = {}
+      for test in tests:
+        results[test.result] = results.get(test.result, 0) + 1
+      stream.emit("config_finished", config=config.name, result=config.result, results=results,
+                  duration=config.end_time - config.start_time if config.end_time and config.start_time else None)
+      if hasattr(self.reporter, "add_config"):
+        # reporters that can stream the results of a config get them as soon as it finished
+        self.reporter.add_config(config.name)
+      self._save_measurements(config, tests)
       # log results of tests so that it can be used easily via command-line
       self._log_results(tests)
 
+    if service_deployments is not None:
+      try:
+        with tracing.span("undeploy_services", "runner"):
+          service_deployments.undeploy(self._call_phase)
+      except BaseException:
+        logger.error("Failed to tear down the deployed services:\n{0}".format(traceback.format_exc()))
+      finally:
+        with tracing.span("kill_all_process", "runner"):
+          for deployer in runtime.get_deployers():
+            deployer.kill_all_process()
+
+    if self._regression_detector is not None:
+      self._regression_detector.history.save()
+
     # analysis.generate_diff_reports()
     self.reporter.data_source.end_time = time.time()
-    self.reporter.generate()
+    with tracing.span("generate_report", "runner"):
+      self.reporter.generate()
+    if tracer.enabled:
+      utils.makedirs(self.directory_info["results_dir"])
+      tracer.write_chrome_trace(os.path.join(self.directory_info["results_dir"], "trace.json"))
+    stream.emit("run_finished", passed=self._success_count, failed=self._failed_count,
+                report=self.reporter.get_report_location())
+    stream.close()
     if self.master_config.mapping.get("display", False) and not  self.master_config.mapping.get("junit_reporter", False):
       self._display_results()
 
+  def _no_perf(self):
+    """
+    :return: True if naarad analysis is disabled, by no_perf or its older spelling no-perf in the master config
+    """
+    return self.master_config.mapping.get("no_perf", False) or self.master_config.mapping.get("no-perf", False)
+
   def _convert_naarad_slas_to_list(self, naarad_sla_obj):
     """
     Returns a list of SLA objects
@@ -270,11 +377,11 @@ class TestRunner(object):
     """
     naarad_obj.analyze(self._logs_dir, self._output_dir)
 
-    if ('matplotlib' in [tuple_[1] for tuple_ in iter_modules()]) and len(self.configs) > 1:
-      prevConfig = self.configs[0]
+    if ('matplotlib' in [tuple_[1] for tuple_ in iter_modules()]) and len(self._executed_configs) > 1:
+      prevConfig = self._executed_configs[0]
       if naarad_obj._output_directory is None:
         naarad_obj._output_directory = self._output_dir
-      for curConfig in self.configs[1:]:
+      for curConfig in self._executed_configs[1:]:
         if not curConfig.naarad_id is None:
           naarad_obj.diff(curConfig.naarad_id, prevConfig.naarad_id)
           prevConfig = curConfig
@@ -285,6 +392,10 @@ class TestRunner(object):
       if test.naarad_id is not None:
         test.naarad_stats = naarad_obj.get_stats_data(test.naarad_id)
         test.sla_objs = self._convert_naarad_slas_to_list(naarad_obj.get_sla_data(test.naarad_id))
+        for sla in test.sla_objs:
+          self._emit_test_event("sla", test, metric=sla.metric, submetric=sla.sub_metric,
+                                rule="{0} {1} {2}".format(sla.stat_name, sla.sla_type, sla.threshold),
+                                value=sla.stat_value, passed=sla.sla_passed)
 
   def _execute_parallel_tests(self, config, failure_handler, naarad_obj, tests):
     """
@@ -299,26 +410,30 @@ class TestRunner(object):
       for test in tests:
         test.result = constants.SKIPPED
         test.message += error_messages.TEST_ABORT
+        self._emit_test_event("test_finished", test, result=test.result)
       logger.debug("Skipping {0} due to too many setup/teardown failures".format(test.name for test in tests))
     else:
       setup_fail = False
-      if not self.master_config.mapping.get("no-perf", False):
+      if not self._no_perf():
         for test in tests:
           try:
             naarad_config_file = self.dynamic_config_module.naarad_config()
           except TypeError: # Support backwards compatibility
             naarad_config_file = self.dynamic_config_module.naarad_config(config.mapping, test_name=test.name)
           test.naarad_config = naarad_config_file
-          test.naarad_id = naarad_obj.signal_start(test.naarad_config)
+          if not self._has_warmup(test):
+            test.naarad_id = naarad_obj.signal_start(test.naarad_config)
       for test in tests:
         test.start_time = time.time()
+        self._emit_test_event("test_started", test)
       logger.debug("Setting up tests: {0}".format([test.name for test in tests]))
       try:
-        if hasattr(self.deployment_module, 'setup'):
-          self.deployment_module.setup()
-        for test in tests:
-          if hasattr(test, 'setup'):
-            test.setup()
+        with tracing.span("setup", "runner", tests=[test.name for test in tests]):
+          if hasattr(self.deployment_module, 'setup'):
+            self._call_phase("setup", self.deployment_module.setup, "setup()")
+          for test in tests:
+            if hasattr(test, 'setup'):
+              self._call_phase("setup", test.setup, "setup() of {0}".format(test.name))
       except BaseException:
         for test in tests:
           test.result = constants.SKIPPED
@@ -329,21 +444,7 @@ class TestRunner(object):
           logger.debug("Aborting {0} due to setup failure:\n{1}".format(test.name, traceback.format_exc()))
       else:
         logger.debug("Executing tests: {0}".format([test.name for test in tests]))
-        def run_test_command(test):
-          while (test.current_iteration < test.total_number_iterations):
-            test.current_iteration = test.current_iteration + 1
-            #verify if the test has previously failed. If so then don't try to run again
-            #unless the config asks for it
-            if (  (test.result != constants.FAILED)
-              or (runtime.get_active_config("consecutive_failures_per_test",0) > test.consecutive_failures)
-             ):
-              self._run_and_verify_test(test)
-            #if each test is run for number of required iterations before moving to next test
-            #test.total_number_iterations can be 4 if TEST_ITER for test module is set to 2 and loop_all_test is 2
-            #in that case each test will be run twice before moving to next test and the whole suite twice
-            if ((test.current_iteration % (test.total_number_iterations/int(runtime.get_active_config("loop_all_tests",1))))== 0):
-              break
-        threads = [threading.Thread(target=run_test_command, args=[test]) for test in tests]
+        threads = [threading.Thread(target=self._iterate_test, args=[test, naarad_obj]) for test in tests]
         for thread in threads:
           thread.start()
         for thread in threads:
@@ -351,11 +452,12 @@ class TestRunner(object):
 
         logger.debug("Tearing down tests: {0}".format([test.name for test in tests]))
       try:
-        if hasattr(self.deployment_module, 'teardown'):
-          self.deployment_module.teardown()
-        for test in tests:
-          if hasattr(test, 'teardown'):
-            test.teardown()
+        with tracing.span("teardown", "runner", tests=[test.name for test in tests]):
+          if hasattr(self.deployment_module, 'teardown'):
+            self._call_phase("teardown", self.deployment_module.teardown, "teardown()")
+          for test in tests:
+            if hasattr(test, 'teardown'):
+              self._call_phase("teardown", test.teardown, "teardown() of {0}".format(test.name))
         if not setup_fail:
           failure_handler.notify_success()
       except BaseException:
@@ -366,7 +468,8 @@ class TestRunner(object):
         logger.debug("{0} failed teardown():\n{1}".format([test.name for test in tests], traceback.format_exc()))
       for test in tests:
         test.end_time = time.time()
-      if self.master_config.mapping.get("display", False):
+        self._emit_test_event("test_finished", test, result=test.result, duration=test.end_time - test.start_time)
+      if self.master_config.mapping.get("display", False) and naarad_obj is not None and test.naarad_id is not None:
         naarad_obj.signal_stop(test.naarad_id)
       logger.debug("Execution of test: {0} complete".format([test.name for test in tests]))
 
@@ -382,23 +485,27 @@ class TestRunner(object):
     if not failure_handler.get_abort_status():
       test.result = constants.SKIPPED
       test.message += error_messages.TEST_ABORT
+      self._emit_test_event("test_finished", test, result=test.result)
       logger.debug("Skipping" + test.name + "due to too many setup/teardown failures")
     else:
       setup_fail = False
-      if not self.master_config.mapping.get("no-perf", False):
+      if not self._no_perf():
         try:
           naarad_config_file = self.dynamic_config_module.naarad_config()
         except TypeError: # Support backwards compatability
           naarad_config_file = self.dynamic_config_module.naarad_config(config.mapping, test_name=test.name)
         test.naarad_config = naarad_config_file
-        test.naarad_id = naarad_obj.signal_start(test.naarad_config)
+        if not self._has_warmup(test):
+          test.naarad_id = naarad_obj.signal_start(test.naarad_config)
       test.start_time = time.time()
+      self._emit_test_event("test_started", test)
       logger.debug("Setting up test: " + test.name)
       try:
-        if hasattr(test, 'setup'):
-          test.setup()
-        elif hasattr(self.deployment_module, 'setup'):
-          self.deployment_module.setup()
+        with tracing.span("setup", "runner", test=test.name):
+          if hasattr(test, 'setup'):
+            self._call_phase("setup", test.setup, "setup() of {0}".format(test.name))
+          elif hasattr(self.deployment_module, 'setup'):
+            self._call_phase("setup", self.deployment_module.setup, "setup() of {0}".format(test.name))
       except BaseException:
         test.result = constants.SKIPPED
         test.message += error_messages.SETUP_FAILED + traceback.format_exc()
@@ -408,27 +515,15 @@ class TestRunner(object):
       else:
         logger.debug("Executing test: " + test.name)
 
-        # 2 ways of loop 1. loop each test (Default) or 2.loop after the entire suite
-        while (test.current_iteration < test.total_number_iterations):
-          test.current_iteration = test.current_iteration + 1
-          #verify if the test has previously failed. If so then don't try to run again
-          #unless the config asks for it
-          if (  (test.result != constants.FAILED)
-             or (runtime.get_active_config("consecutive_failures_per_test",0) > test.consecutive_failures)
-             ):
-            self._run_and_verify_test(test)
-          #if each test is run for number of required iterations before moving to next test
-          #test.total_number_iterations can be 4 if TEST_ITER for test module is set to 2 and loop_all_test is 2
-          #in that case each test will be run twice before moving to next test and the whole suite twice
-          if ((test.current_iteration % (test.total_number_iterations/int(runtime.get_active_config("loop_all_tests",1))))== 0):
-            break
+        self._iterate_test(test, naarad_obj)
 
       logger.debug("Tearing down test: " + test.name)
       try:
-        if (hasattr(test, 'teardown')):
-          test.teardown()
-        elif hasattr(self.deployment_module, 'teardown'):
-          self.deployment_module.teardown()
+        with tracing.span("teardown", "runner", test=test.name):
+          if (hasattr(test, 'teardown')):
+            self._call_phase("teardown", test.teardown, "teardown() of {0}".format(test.name))
+          elif hasattr(self.deployment_module, 'teardown'):
+            self._call_phase("teardown", self.deployment_module.teardown, "teardown() of {0}".format(test.name))
         if not setup_fail:
           failure_handler.notify_success()
       except BaseException:
@@ -438,68 +533,321 @@ class TestRunner(object):
         logger.debug(test.name + "failed teardown():\n{0}".format(traceback.format_exc()))
 
       test.end_time = time.time()
-      if self.master_config.mapping.get("display", False):
+      self._emit_test_event("test_finished", test, result=test.result, duration=test.end_time - test.start_time)
+      if self.master_config.mapping.get("display", False) and naarad_obj is not None and test.naarad_id is not None:
         naarad_obj.signal_stop(test.naarad_id)
       logger.debug("Execution of test: " + test.name + " complete")
 
-  def _run_and_verify_test(self,test):
+  def _iterate_test(self, test, naarad_obj):
+    """
+    Runs the iterations of a test for one pass over the suite: its share of total_number_iterations or, for a test
+    with a duration, as many iterations as fit in the duration. A test with pacing starts its iterations that many
+    seconds apart.
+    """
+    pass_start = time.time()
+    pass_iterations = 0
+    # 2 ways of loop 1. loop each test (Default) or 2.loop after the entire suite
+    while self._next_iteration(test, pass_start, pass_iterations):
+      #verify if the test has previously failed. If so then don't try to run again
+      #unless the config asks for it
+      rerun = (  (test.result != constants.FAILED)
+              or (runtime.get_active_config("consecutive_failures_per_test",0) > test.consecutive_failures)
+              )
+      if not rerun and test.duration is not None:
+        # there is no point in counting skipped iterations until the duration elapsed
+        break
+      pass_iterations += 1
+      test.current_iteration = test.current_iteration + 1
+      if test.duration is not None:
+        # the number of iterations of a test with a duration is only known once it ran them
+        test.total_number_iterations = test.current_iteration
+      if rerun:
+        self._run_and_verify_test(test, naarad_obj)
+        if self._checkpoint is not None:
+          checkpoint_start = time.time()
+          if self._checkpoint.iteration_finished(test):
+            # the time spent saving the checkpoint counts neither towards the duration nor the pacing of the test
+            pass_start += time.time() - checkpoint_start
+        if self._stop_iterating(test):
+          break
+      #if each test is run for number of required iterations before moving to next test
+      #test.total_number_iterations can be 4 if TEST_ITER for test module is set to 2 and loop_all_test is 2
+      #in that case each test will be run twice before moving to next test and the whole suite twice
+      if test.duration is None and \
+          ((test.current_iteration % (test.total_number_iterations/int(runtime.get_active_config("loop_all_tests",1))))== 0):
+        break
+    if test.duration is not None:
+      self._record_duration_summary(test, pass_iterations, time.time() - pass_start)
+
+  @staticmethod
+  def _next_iteration(test, pass_start, pass_iterations):
+    """
+    Waits until the next iteration of a paced test is due
+
+    :param pass_start: when the test started iterating in the current pass over the suite
+    :param pass_iterations: the number of iterations the test started in the current pass
+    :return: True if the test should run another iteration
+    """
+    if test.confidence is not None and test.confidence["stop_reason"] is not None:
+      return False
+    if test.duration is None and test.current_iteration >= test.total_number_iterations:
+      return False
+    start = time.time()
+    if test.pacing:
+      start = max(start, pass_start + pass_iterations * test.pacing)
+    if test.duration is not None and start >= pass_start + test.duration:
+      # a paced test waits for the end of its duration so that its throughput reflects the pacing
+      delay = pass_start + test.duration - time.time()
+      if delay > 0:
+        time.sleep(delay)
+      return False
+    delay = start - time.time()
+    if delay > 0:
+      time.sleep(delay)
+    return True
+
+  @staticmethod
+  def _record_duration_summary(test, iterations, duration):
+    """
+    Adds a pass over the suite of a test with a duration to test.duration_summary
+    """
+    summary = test.duration_summary or {"iterations": 0, "duration": 0.0, "target_duration": 0.0}
+    summary["iterations"] += iterations
+    summary["duration"] += duration
+    summary["target_duration"] += test.duration
+    summary["pacing"] = test.pacing
+    summary["throughput"] = summary["iterations"] / summary["duration"] if summary["duration"] > 0 else 0.0
+    test.duration_summary = summary
+
+  @staticmethod
+  def _is_repeated(test):
+    """
+    :return: True if the test runs several iterations, each validated on its own
+    """
+    return test.total_number_iterations > 1 or test.duration is not None
+
+  def _run_and_verify_test(self, test, naarad_obj=None):
     """
-    Runs a test and performs validation
+    Runs a test and performs validation; a warmup iteration is not validated and its failure does not fail the test
     :param test:
+    :param naarad_obj: the Naarad object the metric window of the test is started with at the end of its warmup
     :return:
     """
-    if(test.total_number_iterations > 1):
+    if self._is_repeated(test):
       logger.debug("Executing iteration:" + str(test.current_iteration))
+    if test.iterations_start_time is None:
+      test.iterations_start_time = time.time()
+    self._update_warmup(test, naarad_obj)
     try:
-      test.func_start_time = time.time()
-      test.function()
-      test.func_end_time = time.time()
-      test.iteration_results[test.current_iteration] = constants.PASSED
+      with tracing.span("test", "test", test=test.name, iteration=test.current_iteration, warmup=test.in_warmup):
+        test.func_start_time = time.time()
+        self._call_phase("test", test.function, "{0} iteration {1}".format(test.name, test.current_iteration), test)
+        test.func_end_time = time.time()
+      durations = test.warmup_durations if test.in_warmup else test.iteration_durations
+      durations.add(test.func_end_time - test.func_start_time, test.current_iteration)
+      test.iteration_results[test.current_iteration] = constants.WARMUP if test.in_warmup else constants.PASSED
       #The final iteration result. Useful to make sure the tests recover in case of error injection
       test.result = constants.PASSED
     except BaseException as e:
-      test.result = constants.FAILED
-      test.iteration_results[test.current_iteration] = constants.FAILED
-      test.exception = e
-      test.message = traceback.format_exc()
+      error = type(e).__name__
+      if test.in_warmup:
+        test.iteration_results[test.current_iteration] = constants.WARMUP
+        logger.warning("Warmup iteration {0} of {1} failed:\n{2}".format(test.current_iteration, test.name,
+                                                                        traceback.format_exc()))
+      else:
+        test.result = constants.FAILED
+        test.iteration_results[test.current_iteration] = constants.FAILED
+        test.exception = e
+        test.message = traceback.format_exc()
     else:
+      error = None
       #If verify_after_each_test flag is set we can verify after each test even for single iteration
-      if ((test.total_number_iterations > 1) or (runtime.get_active_config("verify_after_each_test",False))):
+      #warmup iterations are not validated
+      if not test.in_warmup and \
+          (self._is_repeated(test) or (runtime.get_active_config("verify_after_each_test",False))):
         test.end_time = time.time()
-        self._copy_logs()
-        self._execute_singletest_verification(test)
-
+        with tracing.span("copy_logs", "runner", test=test.name):
+          self._copy_logs()
+        with tracing.span("validation", "runner", test=test.name):
+          self._execute_singletest_verification(test)
+
+    iteration_result = test.iteration_results.get(test.current_iteration)
+    durations = test.warmup_durations if test.in_warmup else test.iteration_durations
+    if iteration_result == constants.FAILED:
+      error = self._error_name(test)
+    self._emit_test_event("iteration_finished", test, iteration=test.current_iteration, result=iteration_result,
+                          duration=durations.get(test.current_iteration), warmup=test.in_warmup, error=error)
+
+    if test.in_warmup:
+      # warmup iterations count neither as failures nor as successes towards consecutive_failures_per_test
+      return
     if (test.result == constants.FAILED):
       test.consecutive_failures += 1
     else:
       test.consecutive_failures = 0
 
+  @staticmethod
+  def _has_warmup(test):
+    return test.warmup_iterations > 0 or bool(test.warmup_duration)
+
+  def _update_warmup(self, test, naarad_obj):
+    """
+    Decides whether the iteration about to run is a warmup iteration; the first iteration after the warmup starts the
+    metric window of the test: its start time for runtime.get_active_test_start_time and its naarad signal
+    """
+    if not self._has_warmup(test) or test.warmup_end_time is not None:
+      test.in_warmup = False
+      return
+    now = time.time()
+    test.in_warmup = test.current_iteration <= test.warmup_iterations or \
+        (bool(test.warmup_duration) and now - test.iterations_start_time < test.warmup_duration)
+    if test.in_warmup:
+      test.last_warmup_iteration = test.current_iteration
+      return
+    test.warmup_end_time = now
+    logger.debug("{0} warmed up after {1} iterations".format(test.name, test.last_warmup_iteration))
+    self._emit_test_event("warmup_finished", test, iterations=test.last_warmup_iteration,
+                          duration=now - test.iterations_start_time)
+    if naarad_obj is not None and test.naarad_config is not None:
+      test.naarad_id = naarad_obj.signal_start(test.naarad_config)
+
+  @staticmethod
+  def _stop_iterating(test):
+    """
+    Evaluates the stopping rule of a test after one of its iterations, see zopkio.adaptive; a test that stopped runs
+    no more iterations in the current config
+
+    :return: True if the test should not run more iterations
+    """
+    if test.stopping_rule is None:
+      return False
+    last_iteration = test.duration is None and test.current_iteration >= test.total_number_iterations
+    if test.stopping_rule.evaluate(test, last_iteration):
+      test.total_number_iterations = test.current_iteration
+      return True
+    return False
+
   def _execute_run(self, config, naarad_obj):
     """
     Executes tests for a single config
     """
     failure_handler = FailureHandler(config.mapping.get("max_failures_per_suite_before_abort"))
     loop_all_tests = int(runtime.get_active_config("loop_all_tests",1))
+    max_parallel_tests = int(runtime.get_active_config("max_parallel_tests", 0))
 
     self.compute_total_iterations_per_test()
+    if self._checkpoint is not None and self._checkpoint.config_started(config, self._get_all_tests()):
+      logger.info("Resuming configuration {0} from the checkpoint".format(config.name))
 
     #iterate through the test_suite based on config settings
     for i in xrange(loop_all_tests):
+      if max_parallel_tests > 0:
+        self._execute_scheduled_tests(config, failure_handler, naarad_obj, i, max_parallel_tests)
+        continue
       for tests in self.tests:
-        if not isinstance(tests, list) or len(tests) == 1:
-          if isinstance(tests, list):
-            test = tests[0]
-          else:
-            test = tests
-          self._execute_single_test(config, failure_handler, naarad_obj, test)
+        group = tests if isinstance(tests, list) else [tests]
+        # a unit is a test or a group of parallel tests in one pass over the suite
+        unit = "{0}/{1}".format(i, ",".join(test.name for test in group))
+        if self._checkpoint is not None and self._checkpoint.is_unit_finished(unit):
+          logger.debug("Skipping {0}, finished before the run was resumed".format(unit))
+          continue
+        if len(group) == 1:
+          self._execute_single_test(config, failure_handler, naarad_obj, group[0])
         else:
           self._execute_parallel_tests(config, failure_handler, naarad_obj, tests)
+        if self._checkpoint is not None:
+          self._checkpoint.unit_finished(unit, group)
           
-    self._copy_logs()
-    if not self.master_config.mapping.get("no_perf", False):
+    with tracing.span("copy_logs", "runner", config=config.name):
+      self._copy_logs()
+    if not self._no_perf():
       naarad_obj.signal_stop(config.naarad_id)
-      self._execute_performance(naarad_obj)
-    self._execute_verification()
+      with tracing.span("naarad_analyze", "runner", config=config.name):
+        self._execute_performance(naarad_obj)
+    with tracing.span("validation", "runner", config=config.name):
+      self._execute_verification()
+    with tracing.span("regression_detection", "runner", config=config.name):
+      self._detect_regressions(config)
+
+  def _execute_scheduled_tests(self, config, failure_handler, naarad_obj, loop_index, max_workers):
+    """
+    Runs one pass over the tests on a pool of max_workers threads: each test starts as soon as the tests it depends on
+    passed and its resources are available, see zopkio.scheduler. A test that does not declare its dependencies
+    runs after the tests before it, i.e. after the previous serial test or all the tests of the previous phase, whether
+    they passed or not
+    """
+    tests = self._get_all_tests()
+    by_name = dict((test.name, test) for test in tests)
+    dependencies = {}
+    after = {}
+    previous = []
+    for entry in self.tests:
+      group = entry if isinstance(entry, list) else [entry]
+      for test in group:
+        if test.depends_on is not None:
+          dependencies[test.name] = test.depends_on
+        else:
+          after[test.name] = [earlier.name for earlier in previous]
+      previous = group
+
+    def execute(name):
+      test = by_name[name]
+      unit = "{0}/{1}".format(loop_index, name)
+      if self._checkpoint is not None and self._checkpoint.is_unit_finished(unit):
+        logger.debug("Skipping {0}, finished before the run was resumed".format(unit))
+      else:
+        self._execute_single_test(config, failure_handler, naarad_obj, test)
+        if self._checkpoint is not None:
+          self._checkpoint.unit_finished(unit, [test])
+      return test.result == constants.PASSED
+
+    def skip(name, dependency):
+      test = by_name[name]
+      test.result = constants.SKIPPED
+      test.message += error_messages.DEPENDENCY_FAILED.format(dependency)
+      self._emit_test_event("test_finished", test, result=test.result)
+      logger.debug("Skipping {0} because {1} did not pass".format(name, dependency))
+
+    try:
+      dag = scheduler.DagScheduler([test.name for test in tests], dependencies,
+                                   dict((test.name, test.resources) for test in tests), max_workers,
+                                   scheduler.parse_resource_limits(runtime.get_active_config("resource_limits", {})),
+                                   after)
+    except ValueError as e:
+      # the declared dependencies have a cycle, the tests fail rather than the whole run
+      logger.error("Unable to schedule the tests of {0}: {1}".format(config.name, e))
+      for test in tests:
+        test.result = constants.FAILED
+        test.message += error_messages.DEPENDENCY_CYCLE.format(e)
+      return
+    dag.run(execute, skip)
+
+  def _detect_regressions(self, config):
+    """
+    Compares the metrics of each passed test with the rolling baseline of earlier runs. Regressions are stored on the
+    test and, if fail_on_regression is set, fail the test
+
+    :param config:
+    :return:
+    """
+    if self._regression_detector is None:
+      return
+    tests = [test for test in self.tests if not isinstance(test, list)] +\
+            [individual_test for test in self.tests if isinstance(test, list) for individual_test in test]
+    for test in tests:
+      if test.result != constants.PASSED:
+        continue
+      test.regressions = self._regression_detector.check(config.name, test)
+      if len(test.regressions) > 0:
+        details = "\n".join(str(found) for found in test.regressions)
+        for found in test.regressions:
+          self._emit_test_event("regression", test, metric=found.metric, value=found.value, baseline=found.baseline,
+                                relative_change=found.relative_change)
+        logger.warning("{0} regressed in {1}:\n{2}".format(test.name, config.name, details))
+        if self.master_config.mapping.get("fail_on_regression", False):
+          test.result = constants.FAILED
+          test.exception = regression.PerformanceRegressionError(details)
+          test.message += error_messages.PERFORMANCE_REGRESSION + details
 
   def _execute_verification(self):
     """
@@ -512,14 +860,16 @@ class TestRunner(object):
     for test in tests:
       if (test.result != constants.SKIPPED
               and test.validation_function is not None
-              and (test.total_number_iterations <= 1)
+              and not self._is_repeated(test)
               and not (runtime.get_active_config("verify_after_each_test",False))
               and hasattr(test.validation_function, '__call__')):
         try:
-          test.validation_function()
+          self._call_phase("validation", test.validation_function, "validation of {0}".format(test.name))
         except BaseException as e:
           test.result = constants.FAILED
           test.exception = e
+        self._emit_test_event("test_validated", test, result=test.result,
+                              error=self._error_name(test) if test.result == constants.FAILED else None)
 
   def _execute_singletest_verification(self,test):
     """
@@ -531,12 +881,34 @@ class TestRunner(object):
             and test.validation_function is not None
             and hasattr(test.validation_function, '__call__')):
       try:
-        test.validation_function()
+        self._call_phase("validation", test.validation_function, "validation of {0}".format(test.name))
       except BaseException as e:
         test.result = constants.FAILED
         test.exception = e
-        if (test.total_number_iterations > 1):
+        if self._is_repeated(test):
           test.iteration_results[test.current_iteration] = constants.FAILED
+      self._emit_test_event("test_validated", test, iteration=test.current_iteration, result=test.result,
+                            error=self._error_name(test) if test.result == constants.FAILED else None)
+
+  @staticmethod
+  def _call_phase(phase, function, description, test=None):
+    """
+    Calls the function of a phase under the timeout configured for the phase, see zopkio.watchdog
+    """
+    return watchdog.call_with_timeout(function, watchdog.get_timeout(phase, test), description)
+
+  @staticmethod
+  def _emit_test_event(event, test, **fields):
+    """
+    Emits an event about test, tagged with the active config
+    """
+    stream = events.get_event_stream()
+    if stream.enabled:
+      stream.emit(event, config=runtime.get_active_config_name(), test=test.name, **fields)
+
+  @staticmethod
+  def _error_name(test):
+    return type(test.exception).__name__ if test.exception is not None else None
 
   def compute_total_iterations_per_test(self):
     """
@@ -574,11 +946,19 @@ class TestRunner(object):
     """
     junit_xml_reporter =  self.master_config.mapping.get("junit_reporter", False)
 
+    # the reporters are imported on use as the html and json reporters need jinja2
+    if self.master_config.mapping.get("json_reporter", False):
+      from zopkio import json_reporter
+      reporter = json_reporter.Reporter(self.directory_info["report_name"], self.directory_info["results_dir"],
+                          self.directory_info["logs_dir"], self._output_dir)
     # default to html
-    if junit_xml_reporter is False:
+    elif junit_xml_reporter is False:
+      from zopkio import html_reporter
       reporter = html_reporter.Reporter(self.directory_info["report_name"], self.directory_info["results_dir"],
-                          self.directory_info["logs_dir"], self._output_dir)
+                          self.directory_info["logs_dir"], self._output_dir,
+                          processes=self.master_config.mapping.get("report_processes"))
     else:
+      from zopkio import junit_reporter
       reporter = junit_reporter.Reporter(self.directory_info["report_name"], self.directory_info["results_dir"],
                           self.directory_info["logs_dir"], self._output_dir)
 
@@ -593,6 +973,31 @@ class TestRunner(object):
         logger.info(traceback.format_exception_only(type(test.exception), test.exception))
         self._failed_count += 1
 
+  def _save_measurements(self, config, tests):
+    """
+    Writes the histograms and latency recorders of the tests of config to OUTPUT_DIRECTORY/measurements/<config>.json
+    so that they can be merged with other runs; see zopkio.histogram.Histogram.from_dict
+    """
+    measurements = {}
+    for test in tests:
+      if len(test.histograms) == 0 and len(test.latency_recorders) == 0:
+        continue
+      measurements[test.name] = {
+          "histograms": dict((metric, histogram.to_dict()) for metric, histogram in test.histograms.items()),
+          "latencies": dict((name, {"uncorrected": recorder.raw.to_dict(), "corrected": recorder.corrected.to_dict()})
+                            for name, recorder in test.latency_recorders.items())
+      }
+    if len(measurements) == 0:
+      return
+    measurements_dir = os.path.join(runtime.get_output_dir(), "measurements", self._suite_name or "")
+    utils.makedirs(measurements_dir)
+    with open(os.path.join(measurements_dir, config.name + ".json"), "w") as measurements_file:
+      json.dump(measurements, measurements_file)
+
+  def _get_all_tests(self):
+    return [test for test in self.tests if not isinstance(test, list)] +\
+           [individual_test for test in self.tests if isinstance(test, list) for individual_test in test]
+
   def _reset_tests(self):
     for test in self.tests:
       if isinstance(test, list):
@@ -609,9 +1014,39 @@ class TestRunner(object):
     """
     self.directory_info = test_runner_helper.directory_setup(self.testfile,
                                                              self.dynamic_config_module,
-                                                             self.master_config)
+                                                             self.master_config,
+                                                             self._resume_dir)
+    if self._resume_dir is not None:
+      self._checkpoint = checkpoint.Checkpoint.load(self._resume_dir, self.testfile, self._checkpoint_interval())
+    elif self.master_config.mapping.get("checkpoint", True):
+      self._checkpoint = checkpoint.Checkpoint(os.path.join(self.directory_info["results_dir"],
+                                                            checkpoint.CHECKPOINT_FILE), self.testfile,
+                                               self._checkpoint_interval())
     self.reporter = self._get_reporter()
     runtime.set_active_tests(self.tests)
+    self._regression_detector = self._get_regression_detector()
+
+  def _checkpoint_interval(self):
+    return float(self.master_config.mapping.get("checkpoint_interval", checkpoint.DEFAULT_INTERVAL))
+
+  def _get_regression_detector(self):
+    """
+    Creates the regression detector if regression_detection is set in the master config
+
+    :return: a RegressionDetector or None
+    """
+    mapping = self.master_config.mapping
+    if not mapping.get("regression_detection", False):
+      return None
+    history_file = mapping.get("regression_history_file") or os.path.join(self._output_dir, "regression_history.json")
+    history = regression.RegressionHistory(history_file, int(mapping.get("regression_history_size", 50)))
+    return regression.RegressionDetector(history,
+                                         window=int(mapping.get("regression_window", 10)),
+                                         min_runs=int(mapping.get("regression_min_runs", 3)),
+                                         threshold=float(mapping.get("regression_threshold", 3.5)),
+                                         min_relative_change=float(mapping.get("regression_min_change", 0.05)),
+                                         stats=mapping.get("regression_stats"),
+                                         higher_is_better=mapping.get("regression_higher_is_better"))
 
   def _skip_all_tests(self):
     for test in self.tests:
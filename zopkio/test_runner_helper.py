@@ -27,6 +27,7 @@ import os
 import sys
 import time
 
+from zopkio.config_matrix import ConfigMatrix, DEFAULT_MATRIX_NAME, MATRIX_KEY
 from zopkio.configobj import Config
 import zopkio.constants as constants
 import zopkio.runtime as runtime
@@ -50,10 +51,26 @@ def _determine_tests(test_modules):
       tests_iteration = module.tests_iteration
     else:
       tests_iteration = constants.DEFAULT_ITERATION
+
+    tests_timeout = getattr(module, "tests_timeout", None)
+    # {test function name: [names]} used when the tests are run by zopkio.scheduler
+    test_dependencies = getattr(module, "test_dependencies", {})
+    test_resources = getattr(module, "test_resources", {})
+    # iterate until a metric is stable instead of tests_iteration times, see zopkio.adaptive
+    tests_stopping_rule = getattr(module, "tests_stopping_rule", None)
+    tests_warmup_iterations = getattr(module, "tests_warmup_iterations", 0)
+    tests_warmup_duration = getattr(module, "tests_warmup_duration", None)
+    tests_duration = getattr(module, "tests_duration", None)
+    tests_pacing = getattr(module, "tests_pacing", None)
     # The following is a way to extract the names of all functions in a module
     # An alternative is to use inspect.isfunction but this has better support for 'duck typing'
     functions = set([fun for fun in attrs if hasattr(getattr(module, fun), '__call__')])
-    tests = dict([(fun.lower(), Test(fun, getattr(module, fun), phase=test_phase, iteration=tests_iteration))
+    tests = dict([(fun.lower(), Test(fun, getattr(module, fun), phase=test_phase, iteration=tests_iteration,
+                                     timeout=tests_timeout, depends_on=test_dependencies.get(fun),
+                                     resources=test_resources.get(fun, []), stopping_rule=tests_stopping_rule,
+                                     warmup_iterations=tests_warmup_iterations,
+                                     warmup_duration=tests_warmup_duration, duration=tests_duration,
+                                     pacing=tests_pacing))
                   for fun in functions if "test" in fun.lower()])
     for fun in functions:
       if "validate" in fun.lower():
@@ -72,23 +89,35 @@ def _determine_tests(test_modules):
       yield test
 
 
-def directory_setup(testfile, perf_module, configs):
+def get_report_name(testfile):
+  """
+  :param testfile: the testfile, test suite or suite name of the run
+  :return: the name of the results directory of the run, the file name of testfile followed by the start time of zopkio
+  """
+  report_name = os.path.splitext(os.path.basename(testfile))[0]  # getting the file name without extension
+  return report_name + time.strftime("_%Y%m%d_%H%M%S", time.localtime(runtime.get_init_time()))
+
+
+def directory_setup(testfile, perf_module, configs, results_dir=None):
   """
   Sets up the output directories.
 
   :param testfile: the main testfile used in run_test(); only used here for its file name
+  :param results_dir: the results directory of an earlier run to reuse, e.g. when resuming it
   :returns: dict with keys ["report_name", "report_dir", "logs_dir"]
   """
   dir_info = {}
 
   utils.makedirs(runtime.get_reports_dir())
 
-  report_name = os.path.splitext(os.path.basename(testfile))[0]  # getting the file name without extension
-  date_time = time.strftime("_%Y%m%d_%H%M%S", time.localtime(runtime.get_init_time()))
-  report_name += date_time
+  if results_dir is not None:
+    results_dir = os.path.abspath(results_dir)
+    report_name = os.path.basename(results_dir)
+  else:
+    report_name = get_report_name(testfile)
+    results_dir = os.path.join(runtime.get_reports_dir(), report_name)
   dir_info["report_name"] = report_name
 
-  results_dir = os.path.join(runtime.get_reports_dir(), report_name)
   utils.makedirs(results_dir)
   dir_info["results_dir"] = results_dir
 
@@ -114,12 +143,12 @@ def get_modules(testfile, tests_to_run, config_overrides):
   test_dic = _parse_input(testfile)
   master_config, configs = load_configs_from_directory(test_dic["configs_directory"], config_overrides)
   _setup_paths(master_config.mapping.get("additional_paths", []))
-  deployment_module = utils.load_module(test_dic["deployment_code"])
+  deployment_module = utils.load_module(test_dic["deployment_code"], importable=True)
   if  "dynamic_configuration_code" in test_dic:
-    perf_module = utils.load_module(test_dic["dynamic_configuration_code"])
+    perf_module = utils.load_module(test_dic["dynamic_configuration_code"], importable=True)
   else:
-    perf_module = utils.load_module(test_dic["perf_code"])
-  test_modules = [utils.load_module(testcode) for testcode in test_dic["test_code"]]
+    perf_module = utils.load_module(test_dic["perf_code"], importable=True)
+  test_modules = [utils.load_module(testcode, importable=True) for testcode in test_dic["test_code"]]
   if tests_to_run is not None:
     tests = [test for test in _determine_tests(test_modules) if test.name in tests_to_run]
   else:
@@ -136,7 +165,8 @@ def get_modules(testfile, tests_to_run, config_overrides):
 
 def load_configs_from_directory(config_dir, overrides):
   """
-  Returns a master configuration object and a list of configuration objects
+  Returns a master configuration object and a list of configuration objects, or a lazily expanded
+  config_matrix.ConfigMatrix if the master configuration declares a config_matrix
 
   :param config_dir: the directory where the configuration files are located
   :param overrides: mapping of the command line overrides
@@ -189,6 +219,10 @@ def load_configs_from_directory(config_dir, overrides):
       subdir_mapping.update(overrides)
       config_objs.append(Config(config_name, subdir_mapping))
 
+  matrix_spec = master_config.mapping.get(MATRIX_KEY)
+  if matrix_spec:
+    name = matrix_spec.get("name") or (DEFAULT_MATRIX_NAME if len(config_subdirs) == 0 else None)
+    return master_config, ConfigMatrix(matrix_spec, config_objs, overrides, name)
   return master_config, config_objs
 
 
@@ -198,7 +232,7 @@ def _parse_input(testfile):
   """
   ext = os.path.splitext(testfile)[-1].lower()
   if ext == ".py":
-    test_dic = utils.load_module(testfile).test
+    test_dic = utils.load_module(testfile, importable=True).test
   elif ext == ".json":
     json_data = open(testfile).read()
     test_dic = json.loads(json_data)
@@ -16,7 +16,9 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from zopkio.adaptive import StoppingRule
 import zopkio.constants as constants
+from zopkio.timings import TimingSeries
 
 class Test(object):
   """
@@ -31,13 +33,34 @@ class Test(object):
 
     self.phase = kwargs.get("phase", constants.DEFAULT_TEST_PHASE)
 
-    self.repeat_per_loop = kwargs.get("iteration", constants.DEFAULT_ITERATION)
+    # with a stopping rule the test iterates until the metric is stable, up to max_iterations, see zopkio.adaptive
+    self.stopping_rule = StoppingRule.create(kwargs.get("stopping_rule", None))
+    if self.stopping_rule is not None:
+      self.repeat_per_loop = self.stopping_rule.max_iterations
+    else:
+      self.repeat_per_loop = kwargs.get("iteration", constants.DEFAULT_ITERATION)
     self.total_number_iterations = self.repeat_per_loop
     self.current_iteration = 0
     self.consecutive_failures = 0
+    # the first iterations, until both warmup_iterations ran and warmup_duration seconds passed, warm the services up
+    # and are excluded from the statistics and the metric window of the test
+    self.warmup_iterations = kwargs.get("warmup_iterations", 0) or 0
+    self.warmup_duration = kwargs.get("warmup_duration", None)
+    # a test with a duration runs as many iterations as fit in that many seconds instead of a number of iterations;
+    # with pacing its iterations start that many seconds apart
+    self.duration = kwargs.get("duration", None)
+    self.pacing = kwargs.get("pacing", None)
+    if self.duration is not None and self.duration <= 0:
+      raise ValueError("the duration of {0} must be positive".format(name))
 
     self.function = function
     self.validation_function = kwargs.get("validate", None)
+    # seconds the test function may run for, see zopkio.watchdog
+    self.timeout = kwargs.get("timeout", None)
+    # names of the tests that must pass before this one and resources it uses, see zopkio.scheduler; None means the
+    # test depends on the tests before it in the suite
+    self.depends_on = kwargs.get("depends_on", None)
+    self.resources = kwargs.get("resources", [])
 
     if 'setup' in kwargs:
       self.setup = kwargs.get('setup')
@@ -58,12 +81,25 @@ class Test(object):
 
     self.result = None
     self.iteration_results = {}
+    self.iteration_durations = TimingSeries()
+    self.iteration_metrics = {}
+    self.iterations_start_time = None
+    self.confidence = None
+    self.in_warmup = False
+    self.last_warmup_iteration = 0
+    self.warmup_end_time = None
+    self.warmup_durations = TimingSeries()
+    self.warmup_measurements = {}
+    self.duration_summary = None
+    self.latency_recorders = {}
+    self.histograms = {}
     self.exception = None
 
     self.naarad_config = None
     self.naarad_id = None
     self.naarad_stats = None
     self.sla_objs = None
+    self.regressions = []
 
     self.message = ""
 
@@ -83,11 +119,24 @@ class Test(object):
     self.result = None
     self.exception = None
     self.consecutive_failures = 0
+    self.iteration_durations = TimingSeries()
+    self.iteration_metrics = {}
+    self.iterations_start_time = None
+    self.confidence = None
+    self.in_warmup = False
+    self.last_warmup_iteration = 0
+    self.warmup_end_time = None
+    self.warmup_durations = TimingSeries()
+    self.warmup_measurements = {}
+    self.duration_summary = None
+    self.latency_recorders = {}
+    self.histograms = {}
 
     self.naarad_config = None
     self.naarad_id = None
     self.naarad_stats = None
     self.sla_objs = None
+    self.regressions = []
 
     self.message = ""
     self.current_iteration = 0
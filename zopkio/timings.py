@@ -0,0 +1,248 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Compact storage and statistics for series of durations such as the per-iteration timings of a test
+"""
+from array import array
+import math
+
+DEFAULT_PERCENTILES = [50, 90, 95, 99, 99.9]
+
+
+def _incomplete_beta(a, b, x):
+  """
+  :return: the regularized incomplete beta function I_x(a, b), evaluated with its continued fraction
+  """
+  if x <= 0.0:
+    return 0.0
+  if x >= 1.0:
+    return 1.0
+  if x > (a + 1.0) / (a + b + 2.0):
+    # the continued fraction converges quickly only below this point
+    return 1.0 - _incomplete_beta(b, a, 1.0 - x)
+  front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x)) / a
+  tiny = 1e-300
+  c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+  d = 1.0 / (d if abs(d) > tiny else tiny)
+  fraction = d
+  for m in xrange(1, 300):
+    for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                      -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+      d = 1.0 + numerator * d
+      d = 1.0 / (d if abs(d) > tiny else tiny)
+      c = 1.0 + numerator / c
+      c = c if abs(c) > tiny else tiny
+      fraction *= c * d
+    if abs(c * d - 1.0) < 1e-12:
+      break
+  return front * fraction
+
+
+def student_t_cdf(t, degrees_of_freedom):
+  """
+  :return: the probability that a Student's t distributed variable is below t
+  """
+  tail = 0.5 * _incomplete_beta(degrees_of_freedom / 2.0, 0.5, degrees_of_freedom / (degrees_of_freedom + t * t))
+  return 1.0 - tail if t >= 0 else tail
+
+
+def student_t_quantile(probability, degrees_of_freedom):
+  """
+  :param probability: a probability strictly between 0.5 and 1
+  :return: the t such that student_t_cdf(t, degrees_of_freedom) is probability
+  """
+  low, high = 0.0, 1.0
+  while student_t_cdf(high, degrees_of_freedom) < probability:
+    high *= 2
+  for _ in xrange(100):
+    middle = (low + high) / 2
+    if student_t_cdf(middle, degrees_of_freedom) < probability:
+      low = middle
+    else:
+      high = middle
+  return (low + high) / 2
+
+
+class TimingSeries(object):
+  """
+  Stores durations in an array of doubles, optionally tagged with an integer id (e.g. the iteration number), and
+  computes summary statistics over them. The sorted copy used for percentiles is cached until the next add.
+  """
+  def __init__(self, values=None, sample_ids=None):
+    """
+    :param values: initial durations
+    :param sample_ids: ids of the initial durations, must have the same length as values if given
+    """
+    self._values = array('d', values or [])
+    self._sample_ids = array('l', sample_ids) if sample_ids is not None else None
+    self._sorted = None
+    # sample id to the index of its latest duration, built on the first get and kept up to date by add
+    self._index = None
+
+  def add(self, value, sample_id=None):
+    """
+    Records a duration
+
+    :param value: the duration in seconds
+    :param sample_id: optional id of the sample, once an id is given every later sample should have one as well
+    """
+    if sample_id is not None and self._sample_ids is None:
+      self._sample_ids = array('l', [-1] * len(self._values))
+    self._values.append(value)
+    if self._sample_ids is not None:
+      self._sample_ids.append(-1 if sample_id is None else sample_id)
+    if self._index is not None and sample_id is not None:
+      self._index[sample_id] = len(self._values) - 1
+    self._sorted = None
+
+  def __len__(self):
+    return len(self._values)
+
+  def __iter__(self):
+    return iter(self._values)
+
+  def values(self):
+    return self._values.tolist()
+
+  def items(self):
+    """
+    :return: list of (sample id, duration) in insertion order; the id is None if it was not recorded
+    """
+    if self._sample_ids is None:
+      return [(None, value) for value in self._values]
+    return [(sample_id if sample_id >= 0 else None, value) for sample_id, value in zip(self._sample_ids, self._values)]
+
+  def get(self, sample_id, default=None):
+    """
+    :return: the duration recorded with sample_id
+    """
+    if self._sample_ids is None:
+      return default
+    if self._index is None:
+      # later samples with the same id overwrite earlier ones
+      self._index = dict((recorded_id, index) for index, recorded_id in enumerate(self._sample_ids) if recorded_id >= 0)
+    index = self._index.get(sample_id)
+    return self._values[index] if index is not None else default
+
+  def _get_sorted(self):
+    if self._sorted is None:
+      self._sorted = array('d', sorted(self._values))
+    return self._sorted
+
+  def min(self):
+    return self._get_sorted()[0] if len(self._values) > 0 else None
+
+  def max(self):
+    return self._get_sorted()[-1] if len(self._values) > 0 else None
+
+  def total(self):
+    return math.fsum(self._values)
+
+  def mean(self):
+    if len(self._values) == 0:
+      return None
+    return self.total() / len(self._values)
+
+  def stddev(self):
+    """
+    :return: the sample standard deviation, 0 for less than two samples
+    """
+    count = len(self._values)
+    if count < 2:
+      return 0.0 if count == 1 else None
+    mean = self.mean()
+    return math.sqrt(math.fsum((value - mean) ** 2 for value in self._values) / (count - 1))
+
+  def confidence_interval(self, confidence=0.95):
+    """
+    :param confidence: the probability that the interval contains the true mean
+    :return: (mean, half width) of the Student's t confidence interval of the mean, None for less than two durations
+    """
+    count = len(self._values)
+    if count < 2:
+      return None
+    half_width = student_t_quantile((1 + confidence) / 2.0, count - 1) * self.stddev() / math.sqrt(count)
+    return self.mean(), half_width
+
+  def percentile(self, percentile):
+    """
+    :param percentile: a number between 0 and 100
+    :return: the percentile using linear interpolation between the closest ranks
+    """
+    ordered = self._get_sorted()
+    if len(ordered) == 0:
+      return None
+    rank = (len(ordered) - 1) * percentile / 100.0
+    lower = int(math.floor(rank))
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+  def percentiles(self, percentiles=None):
+    """
+    :return: list of (percentile, value) for each of percentiles, defaults to DEFAULT_PERCENTILES
+    """
+    percentiles = DEFAULT_PERCENTILES if percentiles is None else percentiles
+    return [(percentile, self.percentile(percentile)) for percentile in percentiles]
+
+  def histogram(self, bins=10):
+    """
+    :param bins: the number of equal width buckets between the minimum and maximum
+    :return: list of (lower bound, upper bound, count)
+    """
+    if len(self._values) == 0:
+      return []
+    low, high = self.min(), self.max()
+    if high == low:
+      return [(low, high, len(self._values))]
+    width = (high - low) / float(bins)
+    counts = [0] * bins
+    for value in self._values:
+      counts[min(int((value - low) / width), bins - 1)] += 1
+    return [(low + width * index, low + width * (index + 1), count) for index, count in enumerate(counts)]
+
+  def outliers(self, k=1.5):
+    """
+    Counts the durations outside the Tukey fences [Q1 - k * IQR, Q3 + k * IQR]
+
+    :param k: multiple of the inter quartile range defining the fences
+    :return: the number of outliers
+    """
+    if len(self._values) < 4:
+      return 0
+    first_quartile, third_quartile = self.percentile(25), self.percentile(75)
+    spread = k * (third_quartile - first_quartile)
+    low_fence, high_fence = first_quartile - spread, third_quartile + spread
+    return sum(1 for value in self._values if value < low_fence or value > high_fence)
+
+  def summary(self):
+    """
+    :return: dict with the count, min, max, mean, stddev, outliers and the DEFAULT_PERCENTILES as p50, p90, ...
+    """
+    summary = {
+        "count": len(self._values),
+        "min": self.min(),
+        "max": self.max(),
+        "mean": self.mean(),
+        "stddev": self.stddev(),
+        "outliers": self.outliers()
+    }
+    for percentile, value in self.percentiles():
+      summary["p{0:g}".format(percentile)] = value
+    return summary
@@ -0,0 +1,212 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Lightweight spans timing the phases of a zopkio run, deployer operations and remote commands.
+
+Spans are kept in memory by a module level tracer, exported as a Chrome trace-event json file that can be opened in
+chrome://tracing or https://ui.perfetto.dev, and summarized as a per phase breakdown shown in the report.
+"""
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+import zopkio.events as events
+
+# keeps a runaway loop of remote commands from growing the trace without bound
+DEFAULT_MAX_SPANS = 100000
+
+
+class Span(object):
+  """
+  A named interval of time on a thread
+  """
+  def __init__(self, name, category, args):
+    self.name = name
+    self.category = category
+    self.args = args
+    self.thread_id = threading.current_thread().ident
+    self.thread_name = threading.current_thread().name
+    self.start = time.time()
+    self.end = None
+
+  def duration(self):
+    return (self.end if self.end is not None else time.time()) - self.start
+
+
+class Tracer(object):
+  """
+  Collects spans from any thread
+  """
+  def __init__(self, max_spans=DEFAULT_MAX_SPANS):
+    self.enabled = True
+    self.max_spans = max_spans
+    self.spans = []
+    self.dropped = 0
+    self._lock = threading.Lock()
+
+  def reset(self):
+    with self._lock:
+      self.spans = []
+      self.dropped = 0
+
+  @contextmanager
+  def span(self, name, category="zopkio", **args):
+    """
+    Times the body of a with statement. The yielded span's args can be updated inside the body, e.g. once the host of
+    an operation is known. Spans are recorded even if the body raises, with the exception type in the args.
+
+    :param name: the name of the span e.g. setup_suite
+    :param category: the group of the span e.g. runner, deployer or remote
+    :param args: values shown with the span in the trace viewer
+    """
+    if not self.enabled:
+      yield None
+      return
+    span = Span(name, category, args)
+    try:
+      yield span
+    except BaseException as e:
+      span.args["error"] = type(e).__name__
+      raise
+    finally:
+      span.end = time.time()
+      with self._lock:
+        if len(self.spans) < self.max_spans:
+          self.spans.append(span)
+        else:
+          self.dropped += 1
+
+  def to_chrome_trace(self):
+    """
+    :return: the spans as a dict in the Chrome trace-event format, using complete ("X") events in microseconds
+    """
+    with self._lock:
+      spans = list(self.spans)
+    pid = os.getpid()
+    events = []
+    thread_names = {}
+    for span in spans:
+      thread_names[span.thread_id] = span.thread_name
+      events.append({
+          "name": span.name,
+          "cat": span.category,
+          "ph": "X",
+          "ts": int(span.start * 1e6),
+          "dur": int(span.duration() * 1e6),
+          "pid": pid,
+          "tid": span.thread_id,
+          "args": dict((key, str(value)) for key, value in span.args.items())
+      })
+    for thread_id, thread_name in thread_names.items():
+      events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+  def write_chrome_trace(self, path):
+    with open(path, "w") as trace_file:
+      json.dump(self.to_chrome_trace(), trace_file)
+
+  def breakdown(self):
+    """
+    Summarizes the time spent per phase. The self time of a span excludes the time of the spans nested in it on the same
+    thread, so the self times of a thread add up to the time covered by its outermost spans.
+
+    :return: list of dicts with category, name, count, total, self and max time, sorted by decreasing self time
+    """
+    with self._lock:
+      spans = [span for span in self.spans if span.end is not None]
+    self_times = {}
+    by_thread = {}
+    for span in spans:
+      by_thread.setdefault(span.thread_id, []).append(span)
+    for thread_spans in by_thread.values():
+      # parents start no later and last no shorter than their children
+      thread_spans.sort(key=lambda span: (span.start, -span.end))
+      stack = []
+      for span in thread_spans:
+        while stack and stack[-1].end <= span.start:
+          stack.pop()
+        if stack:
+          self_times[id(stack[-1])] -= span.end - span.start
+        self_times[id(span)] = span.end - span.start
+        stack.append(span)
+    phases = {}
+    for span in spans:
+      phase = phases.setdefault((span.category, span.name), {
+          "category": span.category, "name": span.name, "count": 0, "total": 0.0, "self": 0.0, "max": 0.0})
+      duration = span.end - span.start
+      phase["count"] += 1
+      phase["total"] += duration
+      phase["self"] += max(self_times[id(span)], 0.0)
+      phase["max"] = max(phase["max"], duration)
+    return sorted(phases.values(), key=lambda phase: phase["self"], reverse=True)
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+  return _tracer
+
+
+def span(name, category="zopkio", **args):
+  """
+  Times the body of a with statement with the global tracer, see Tracer.span
+  """
+  return _tracer.span(name, category, **args)
+
+
+def _deployer_host(deployer, unique_id, configs):
+  process = deployer.processes.get(unique_id)
+  if process is not None:
+    return process.hostname
+  if configs is not None and "hostname" in configs:
+    return configs["hostname"]
+  return getattr(deployer, "default_configs", {}).get("hostname")
+
+
+def traced_deployer_operation(function):
+  """
+  Decorates a Deployer method taking a unique_id (and optionally configs) so that every call is recorded as a span
+  and a deploy event tagged with the service, unique_id and host
+  """
+  @functools.wraps(function)
+  def wrapper(self, unique_id, *args, **kwargs):
+    configs = kwargs.get("configs", args[0] if len(args) > 0 and isinstance(args[0], dict) else None)
+    service = getattr(self, "service_name", type(self).__name__)
+    stream = events.get_event_stream()
+    start = time.time()
+    error = None
+    with _tracer.span(function.__name__, "deployer", service=service, unique_id=unique_id) as current_span:
+      try:
+        return function(self, unique_id, *args, **kwargs)
+      except BaseException as e:
+        error = type(e).__name__
+        raise
+      finally:
+        if current_span is not None or stream.enabled:
+          host = _deployer_host(self, unique_id, configs)
+          if current_span is not None:
+            current_span.args["host"] = host
+          stream.emit("deploy", operation=function.__name__, service=service, unique_id=unique_id, host=host,
+                      duration=time.time() - start, error=error)
+  return wrapper
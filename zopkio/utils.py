@@ -21,15 +21,22 @@
 Utilities class provides general-use functions for all modules
 """
 
+import hashlib
+import imp
 import logging
 import json
 import os
 import sys
+import threading
 
 import zopkio.constants as constants
 
 logger = logging.getLogger(__name__)
 
+# absolute path -> (modification time, module) of the modules loaded by load_module
+_module_cache = {}
+_module_cache_lock = threading.Lock()
+
 def check_dir_with_exception(dirname):
   """
   Checks if the directory exists; if not, throw an exception
@@ -55,15 +62,37 @@ def check_testfile_dir_structure(filename):
     raise ValueError('incorrect dir structure testfile:%s exist in same level as dir:%s' %(filename,dirname))
 
 
-def load_module(filename):
-  """
-  Loads a module by filename
-  """
-  basename = os.path.basename(filename)
-  path = os.path.dirname(filename)
-  sys.path.append(path)
-  # TODO(tlan) need to figure out how to handle errors thrown here
-  return __import__(os.path.splitext(basename)[0])
+def load_module(filename, importable=False):
+  """
+  Loads a module by filename. Modules are cached by path and modification time, so loading an unchanged file again
+  returns the same module without executing it again.
+
+  :param filename: path of the python file
+  :param importable: if True the module is registered under its file name in sys.modules and its directory is added
+                     to sys.path (once), so that other modules can import it and its neighbours by name, as test
+                     and deployment code do; otherwise the module gets a name unique to its path so that files with
+                     the same name in different directories, e.g. configs, do not collide, and sys.path is unchanged
+  """
+  path = os.path.abspath(filename)
+  if not os.path.isfile(path):
+    raise ImportError("No module file {0}".format(filename))
+  mtime = os.path.getmtime(path)
+  with _module_cache_lock:
+    cached = _module_cache.get(path)
+    if cached is not None and cached[0] == mtime and (not importable or sys.modules.get(cached[1].__name__) is
+                                                      cached[1]):
+      return cached[1]
+    if importable:
+      directory = os.path.dirname(path)
+      if directory not in sys.path:
+        sys.path.append(directory)
+      name = os.path.splitext(os.path.basename(path))[0]
+    else:
+      name = "zopkio_module_" + hashlib.md5(path).hexdigest()
+    # TODO(tlan) need to figure out how to handle errors thrown here
+    module = imp.load_source(name, path)
+    _module_cache[path] = (mtime, module)
+    return module
 
 
 def makedirs(path):
@@ -141,3 +170,20 @@ def parse_config_file(config_file_path):
       mapping = parse_config_list(lines)
 
   return mapping
+
+
+def build_zopkio_package(path, extra_files=()):
+  """
+  Writes a tarball of the zopkio package, to be extracted on a remote host and run with python -m, e.g. by an
+  SSHDeployer with extract set
+  :param path: the path of the tarball
+  :param extra_files: other files to add next to the package, by base name
+  :return: path
+  """
+  import tarfile
+  zopkio_dir = os.path.dirname(os.path.abspath(__file__))
+  with tarfile.open(path, "w") as tar:
+    tar.add(zopkio_dir, arcname="zopkio", filter=lambda info: None if info.name.endswith(".pyc") else info)
+    for extra_file in extra_files:
+      tar.add(extra_file, arcname=os.path.basename(extra_file))
+  return path
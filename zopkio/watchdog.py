@@ -0,0 +1,105 @@
+# Copyright 2015 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Runs the phases of a test (setup_suite, setup, the test function, validation, teardown and teardown_suite) under a
+time limit so that a single hung test cannot stall the whole run.
+
+A phase with a timeout runs on a separate thread watched by the calling thread. When the timeout expires the ssh
+connections the phase opened through zopkio.remote_host_helper are closed, which fails the remote commands it is
+blocked on, and a TimeoutExpiredError is raised in the phase thread in case it is running python code. The caller gets
+a TimeoutExpiredError and moves on, e.g. fails the test and runs its teardown; a phase that ignores the interruption
+(e.g. blocked in time.sleep) is abandoned on a daemon thread.
+"""
+import ctypes
+import logging
+import sys
+import threading
+
+import zopkio.remote_host_helper as remote_host_helper
+import zopkio.runtime as runtime
+
+logger = logging.getLogger(__name__)
+
+# seconds given to an interrupted phase to unwind before the caller moves on
+_GRACE_PERIOD = 1.0
+
+PHASES = ["setup_suite", "setup", "test", "validation", "teardown", "teardown_suite"]
+
+
+class TimeoutExpiredError(Exception):
+  """
+  Raised when a phase did not finish within its timeout
+  """
+  pass
+
+
+def get_timeout(phase, test=None):
+  """
+  Gets the timeout of a phase: the timeout of the test for the test phase if it has one, else <phase>_timeout in the
+  active config
+
+  :param phase: one of PHASES
+  :param test: the test the phase belongs to, if any
+  :return: the timeout in seconds, 0 if the phase is not limited
+  """
+  if phase == "test" and test is not None and test.timeout is not None:
+    return float(test.timeout)
+  return float(runtime.get_active_config("{0}_timeout".format(phase), 0))
+
+
+def _interrupt(thread):
+  remote_host_helper.close_ssh_clients(thread.ident)
+  ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(thread.ident), ctypes.py_object(TimeoutExpiredError))
+
+
+def call_with_timeout(function, timeout, description):
+  """
+  Calls function, raising TimeoutExpiredError if it did not return within timeout seconds
+
+  :param function: callable taking no arguments
+  :param timeout: seconds, None or a value <= 0 calls function directly on the calling thread
+  :param description: what is called, used in the error message e.g. "setup() of test_foo"
+  :return: the return value of function
+  """
+  if timeout is None or timeout <= 0:
+    return function()
+  outcome = {}
+
+  def run():
+    try:
+      outcome["value"] = function()
+    except BaseException:
+      outcome["error"] = sys.exc_info()
+
+  thread = threading.Thread(target=run, name="zopkio-watchdog-{0}".format(description))
+  thread.daemon = True
+  thread.start()
+  thread.join(timeout)
+  if thread.is_alive():
+    logger.error("{0} timed out after {1:g} seconds, interrupting it".format(description, timeout))
+    _interrupt(thread)
+    thread.join(_GRACE_PERIOD)
+    if thread.is_alive():
+      logger.error("{0} did not stop after being interrupted, abandoning it".format(description))
+    raise TimeoutExpiredError("{0} timed out after {1:g} seconds".format(description, timeout))
+  if "error" in outcome:
+    exc_type, exc_value, exc_traceback = outcome["error"]
+    raise exc_type, exc_value, exc_traceback
+  return outcome.get("value")
@@ -0,0 +1,231 @@
+/*
+#Copyright 2014 LinkedIn Corp.
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+* */
+/*
+ * Single page report: data/index.js calls zopkioReport.index with the summary and one row per test, the details of
+ * the tests are loaded on demand from data/shard_NNNNN.js which call zopkioReport.shard.
+ */
+var zopkioReport = (function() {
+  var PAGE_SIZE = 100;
+  var data = null;
+  var shards = {};
+  var waiting = {};
+  var rows = [];
+  var page = 0;
+
+  function escape(value) {
+    if (value === null || value === undefined) {
+      return "";
+    }
+    return String(value).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+  }
+
+  function seconds(value) {
+    return value === null || value === undefined ? "-" : value.toFixed(6) + " sec";
+  }
+
+  function cells(values) {
+    return values.map(function(value) { return "<td>" + value + "</td>"; }).join("");
+  }
+
+  function rowClass(result) {
+    return result === "failed" ? "test_fail" : (result === "passed" ? "test_pass" : "");
+  }
+
+  function table(headers, body) {
+    return "<table class=\"table table-fitcontent table-striped table-bordered\"><thead><tr>" +
+        headers.map(function(header) { return "<th>" + escape(header) + "</th>"; }).join("") +
+        "</tr></thead><tbody>" + body.map(function(row) { return "<tr>" + cells(row) + "</tr>"; }).join("") +
+        "</tbody></table>";
+  }
+
+  function index(indexData) {
+    data = indexData;
+    var summary = data.summary;
+    document.querySelector("#summaryTable tbody").innerHTML = "<tr>" + cells([summary.tests, summary.counts.passed,
+        summary.counts.failed, summary.counts.skipped, escape(summary.exec_time) + " sec",
+        escape(summary.start_time), escape(summary.end_time)]) + "</tr>";
+
+    var configRows = [];
+    var configFilter = document.getElementById("configFilter");
+    data.configs.forEach(function(config) {
+      var skipped = config.result === "skipped";
+      configRows.push("<tr class=\"" + (config.counts.failed > 0 ? "test_fail" : (skipped ? "" : "test_pass")) + "\">" +
+          cells(["<a href=\"#\" onclick=\"return zopkioReport.showConfig('" + escape(config.name) + "')\">" +
+                 escape(config.name) + "</a>", skipped ? "Yes" : "No", config.tests, config.counts.passed,
+                 config.counts.failed, config.counts.skipped, escape(config.exec_time) + " sec"]) + "</tr>");
+      var option = document.createElement("option");
+      option.value = config.name;
+      option.text = config.name;
+      configFilter.appendChild(option);
+    });
+    document.querySelector("#configTable tbody").innerHTML = configRows.join("");
+
+    if (data.regressions.length > 0) {
+      document.querySelector("#regressionTable tbody").innerHTML = data.regressions.map(function(entry) {
+        var regression = entry[2];
+        var change = regression.relative_change === null ? "-" : (regression.relative_change * 100).toFixed(1) + "%";
+        return "<tr class=\"test_fail\">" + cells([escape(entry[0]), escape(entry[1]), escape(regression.metric),
+            escape(regression.value), escape(regression.baseline), change]) + "</tr>";
+      }).join("");
+      document.getElementById("regressionTable").style.display = "";
+    }
+    filter();
+  }
+
+  function filter() {
+    var config = document.getElementById("configFilter").value;
+    var result = document.getElementById("resultFilter").value;
+    var name = document.getElementById("nameFilter").value.toLowerCase();
+    rows = [];
+    for (var i = 0; i < data.tests.length; ++i) {
+      var test = data.tests[i];
+      if ((config === "" || test[0] === config) && (result === "" || test[2] === result) &&
+          (name === "" || test[1].toLowerCase().indexOf(name) >= 0)) {
+        rows.push(i);
+      }
+    }
+    page = 0;
+    render();
+  }
+
+  function render() {
+    var pages = Math.max(1, Math.ceil(rows.length / PAGE_SIZE));
+    page = Math.min(Math.max(page, 0), pages - 1);
+    var html = [];
+    for (var i = page * PAGE_SIZE; i < Math.min(rows.length, (page + 1) * PAGE_SIZE); ++i) {
+      var test = data.tests[rows[i]];
+      html.push("<tr class=\"" + rowClass(test[2]) + "\">" + cells([escape(test[0]),
+          "<a href=\"#\" onclick=\"return zopkioReport.showTest(" + rows[i] + ")\">" + escape(test[1]) + "</a>",
+          escape(test[2]), seconds(test[3])]) + "</tr>");
+    }
+    document.querySelector("#testTable tbody").innerHTML = html.join("");
+    document.getElementById("pageInfo").innerHTML = rows.length === 0 ? "no tests" :
+        (page * PAGE_SIZE + 1) + "-" + Math.min(rows.length, (page + 1) * PAGE_SIZE) + " of " + rows.length;
+  }
+
+  function loadShard(number, callback) {
+    if (shards[number] !== undefined) {
+      callback(shards[number]);
+      return;
+    }
+    if (waiting[number] === undefined) {
+      waiting[number] = [];
+      var script = document.createElement("script");
+      script.src = "data/shard_" + ("0000" + number).slice(-5) + ".js";
+      document.body.appendChild(script);
+    }
+    waiting[number].push(callback);
+  }
+
+  function shard(number, shardData) {
+    shards[number] = shardData;
+    (waiting[number] || []).forEach(function(callback) { callback(shardData); });
+    delete waiting[number];
+  }
+
+  function summaryRow(summary, percentiles) {
+    return [summary.count, seconds(summary.mean)].concat(percentiles.map(function(percentile) {
+      return seconds(summary["p" + percentile]);
+    })).concat([seconds(summary.max)]);
+  }
+
+  function details(test) {
+    var html = ["<hr /><h3>" + escape(test.config) + " : " + escape(test.name) + "</h3>"];
+    if (test.description) {
+      html.push("<p>" + escape(test.description) + "</p>");
+    }
+    html.push(table(["Result", "Function execution time", "Total execution time"],
+                    [[escape(test.result), seconds(test.function_time), seconds(test.total_time)]]));
+    if (test.exception) {
+      html.push("<p>Error message:</p><p class=\"error-msg\">" + escape(test.exception) + "</p>");
+    }
+    if (test.message) {
+      html.push("<p>Other messages:</p><pre class=\"error-msg\">" + escape(test.message) + "</pre>");
+    }
+    if (test.iteration_summary) {
+      var timing = test.iteration_summary;
+      html.push("<h4>Iteration timings</h4>" + table(["Iterations", "Min", "Mean", "Stddev", "p50", "p90", "p99", "Max",
+          "Outliers"], [[timing.count, seconds(timing.min), seconds(timing.mean), seconds(timing.stddev),
+          seconds(timing.p50), seconds(timing.p90), seconds(timing.p99), seconds(timing.max), timing.outliers]]));
+    }
+    var percentiles = data.latency_percentiles;
+    var percentileHeaders = percentiles.map(function(percentile) { return "p" + percentile; });
+    var latencyRows = [];
+    Object.keys(test.latencies).sort().forEach(function(name) {
+      ["uncorrected", "corrected"].forEach(function(label) {
+        latencyRows.push([escape(name), label].concat(summaryRow(test.latencies[name][label], percentiles)));
+      });
+    });
+    if (latencyRows.length > 0) {
+      html.push("<h4>Latencies</h4>" + table(["Recorder", "", "Samples", "Mean"].concat(percentileHeaders, ["Max"]),
+                                               latencyRows));
+    }
+    var histogramRows = Object.keys(test.histograms).sort().map(function(metric) {
+      var summary = test.histograms[metric];
+      return [escape(metric), summary.count, escape(summary.min), escape(summary.mean)].concat(
+          percentiles.map(function(percentile) { return escape(summary["p" + percentile]); }), [escape(summary.max)]);
+    });
+    if (histogramRows.length > 0) {
+      html.push("<h4>Histograms</h4>" + table(["Metric", "Samples", "Min", "Mean"].concat(percentileHeaders, ["Max"]),
+                                                histogramRows));
+    }
+    if (test.naarad_report) {
+      html.push("<p><a href=\"" + escape(test.naarad_report) + "\">Naarad report</a></p>");
+    }
+    if (test.slas) {
+      html.push("<h4>SLAs</h4>" + table(["metric", "submetric", "sla rule", "value"], test.slas.map(function(sla) {
+        return [escape(sla.metric), escape(sla.submetric), escape(sla.rule), escape(sla.value)];
+      })));
+    }
+    if (test.regressions.length > 0) {
+      html.push("<h4>Regressions</h4>" + table(["Metric", "Value", "Baseline median"],
+          test.regressions.map(function(regression) {
+            return [escape(regression.metric), escape(regression.value), escape(regression.baseline)];
+          })));
+    }
+    return html.join("");
+  }
+
+  function showTest(row) {
+    var test = data.tests[row];
+    document.getElementById("testDetails").innerHTML = "<p>Loading...</p>";
+    loadShard(test[4], function(shardData) {
+      document.getElementById("testDetails").innerHTML = details(shardData[test[0] + "/" + test[1]]);
+    });
+    return false;
+  }
+
+  function showConfig(name) {
+    document.getElementById("configFilter").value = name;
+    filter();
+    return false;
+  }
+
+  return {
+    index: index,
+    shard: shard,
+    filter: filter,
+    showTest: showTest,
+    showConfig: showConfig,
+    nextPage: function() { page += 1; render(); },
+    previousPage: function() { page -= 1; render(); }
+  };
+})();
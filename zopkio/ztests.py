@@ -30,11 +30,34 @@ class ZTest(object):
     phase: the test phase that this test should be executed in. This defaults to the DEFAULT_TEST_PHASE which means it will
            be executed sequentially before any other test phase
     iteration: the number of times to run this test. This defaults to 1.
+    timeout: the number of seconds each iteration of the test may run for. This defaults to None, in which case the
+             test_timeout config applies
+    depends_on: the names of the tests that must pass before this test runs when max_parallel_tests is set. This
+                defaults to None, in which case the test runs after the tests before it in the suite
+    resources: the resources this test uses, limiting how many tests using them run at once when max_parallel_tests
+               is set
+    stopping_rule: a dict of the arguments of zopkio.adaptive.StoppingRule to iterate until a metric is stable instead
+                   of `iteration` times. This defaults to None
+    warmup_iterations, warmup_duration: the first iterations, until both this many iterations ran and this many
+                                        seconds passed, are warmup iterations excluded from the statistics and the
+                                        metric window of the test. These default to no warmup
+    duration: the number of seconds to run iterations of the test for, instead of `iteration` times. This defaults
+              to None
+    pacing: the number of seconds between the starts of two iterations. This defaults to None, in which case each
+            iteration starts as soon as the previous one finished
 
   """
 
   phase = constants.DEFAULT_TEST_PHASE
   iteration = constants.DEFAULT_ITERATION
+  timeout = None
+  depends_on = None
+  resources = []
+  stopping_rule = None
+  warmup_iterations = 0
+  warmup_duration = None
+  duration = None
+  pacing = None
 
   def setup(self):
     """
@@ -73,9 +96,13 @@ class ZTestSuite(object):
 
   Attributes:
     config_dir: The location of the config directory
+    hosts: The logical names of the hosts the suite deploys to. When a testfile has several suites, those whose hosts
+           are disjoint may run at the same time with --parallel-suites. This defaults to None, in which case the
+           suite always runs alone
   """
 
   config_dir="config"
+  hosts = None
 
   def setup_suite(self):
     """
@@ -157,7 +184,10 @@ class ZTestSuite(object):
       ztests = [(attr, getattr(self, attr)) for attr in attrs if isinstance(getattr(self, attr), ZTest) and attr in testlist]
     else:
       ztests = [(attr, getattr(self, attr)) for attr in attrs if isinstance(getattr(self, attr), ZTest)]
-    tests = [Test(name, ztest.test, phase=ztest.phase, iteration=ztest.iteration, validate=ztest.validate, setup=ztest.setup, teardown=ztest.teardown)
+    tests = [Test(name, ztest.test, phase=ztest.phase, iteration=ztest.iteration, validate=ztest.validate, setup=ztest.setup, teardown=ztest.teardown,
+                  timeout=ztest.timeout, depends_on=ztest.depends_on, resources=ztest.resources,
+                  stopping_rule=ztest.stopping_rule, warmup_iterations=ztest.warmup_iterations,
+                  warmup_duration=ztest.warmup_duration, duration=ztest.duration, pacing=ztest.pacing)
              for (name, ztest) in ztests]
     return tests
 